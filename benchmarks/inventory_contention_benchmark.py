@@ -0,0 +1,364 @@
+"""
+Stress the update_inventory path with concurrent workers against a local
+PostgreSQL and report throughput, latency, deadlocks, lock waits and
+oversell violations.
+
+Each worker plays the inventory step of the order workflow: it builds a
+random cart and calls update_inventory.lambda_handler (optionally after
+reserving the stock the way POST /orders does). Carts mix a small shared
+set of hot products (--overlap) with products private to the worker, so
+contention can be dialled from none to every order fighting for the same
+rows.
+
+    DB_HOST=localhost DB_NAME=orders_db DB_USER=postgres DB_PASSWORD=postgres \\
+        python benchmarks/inventory_contention_benchmark.py --workers 16 --orders 200 \\
+        --overlap 0.8 --cart-size 1-4 [--reserve] [--hot-shards 8]
+
+The schema is created with init_database (no sample data); the benchmark
+only touches BENCH-* products, orders and one BENCH customer, and removes
+the products and orders before each run.
+"""
+import argparse
+import contextlib
+import importlib.util
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'shared', 'python'))
+
+for name, value in (('DB_HOST', 'localhost'), ('DB_NAME', 'orders_db'), ('DB_USER', 'postgres'),
+                    ('DB_PASSWORD', 'postgres'), ('AWS_DEFAULT_REGION', 'us-east-1'),
+                    ('METRICS_ENABLED', 'false'), ('QUERY_MAX_EXPLAINS', '0')):
+    os.environ.setdefault(name, value)
+
+import psycopg2  # noqa: E402
+from psycopg2 import errors  # noqa: E402
+from psycopg2.extras import execute_values  # noqa: E402
+
+from stock_reservations import release_reservations, reserve_stock  # noqa: E402
+from stock_shards import refresh_inventory, shard_product  # noqa: E402
+
+PREFIX = 'BENCH-'
+CUSTOMER_ID = f'{PREFIX}CUSTOMER'
+PRICE = 10
+
+
+def load_lambda(name):
+    """Import lambda/<name>/lambda_function.py under a unique module name"""
+    path = os.path.join(ROOT, 'lambda', name, 'lambda_function.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_handler', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class NullEvents:
+    """Stands in for the EventBridge client so low-stock alerts stay local"""
+
+    def put_events(self, Entries):
+        return {'FailedEntryCount': 0, 'Entries': [{} for _ in Entries]}
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.environ['DB_HOST'],
+        database=os.environ['DB_NAME'],
+        user=os.environ['DB_USER'],
+        password=os.environ['DB_PASSWORD']
+    )
+
+
+def parse_range(value):
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def setup_products(args):
+    hot = [f'{PREFIX}HOT-{i:03d}' for i in range(args.hot_products)]
+    private = {
+        worker: [f'{PREFIX}W{worker:03d}-{i:03d}' for i in range(args.private_products)]
+        for worker in range(args.workers)
+    }
+    products = hot + [p for worker_products in private.values() for p in worker_products]
+
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM stock_reservations WHERE product_id LIKE %s", (PREFIX + '%',))
+    cur.execute("DELETE FROM order_items WHERE product_id LIKE %s", (PREFIX + '%',))
+    cur.execute("DELETE FROM order_events WHERE order_id LIKE %s", (PREFIX + '%',))
+    cur.execute("DELETE FROM orders WHERE order_id LIKE %s", (PREFIX + '%',))
+    cur.execute("DELETE FROM inventory WHERE product_id LIKE %s", (PREFIX + '%',))
+    cur.execute("""
+        INSERT INTO customers (customer_id, customer_name, email)
+        VALUES (%s, 'Benchmark', 'benchmark@example.invalid')
+        ON CONFLICT (customer_id) DO NOTHING
+    """, (CUSTOMER_ID,))
+    execute_values(cur, """
+        INSERT INTO inventory (product_id, product_name, description, price, stock_quantity)
+        VALUES %s
+    """, [(p, p, 'benchmark product', PRICE, args.stock) for p in products])
+    for product_id in hot if args.hot_shards else []:
+        shard_product(cur, product_id, args.hot_shards)
+    conn.commit()
+    cur.close()
+    conn.close()
+    return hot, private, products
+
+
+def make_cart(rng, hot, private_products, args):
+    low, high = parse_range(args.cart_size)
+    cart = {}
+    for _ in range(rng.randint(low, high)):
+        pool = hot if hot and rng.random() < args.overlap else private_products
+        product_id = rng.choice(pool)
+        cart[product_id] = cart.get(product_id, 0) + rng.randint(*parse_range(args.quantity))
+    # Unsorted on purpose: the order the workflow receives is arbitrary
+    return [{'productId': p, 'productName': p, 'quantity': q} for p, q in cart.items()]
+
+
+def create_order(order_id, items):
+    """The pending orders row POST /orders writes, so order_events land on it"""
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO orders (order_id, customer_id, total_amount, status)
+        VALUES (%s, %s, %s, 'pending')
+    """, (order_id, CUSTOMER_ID, sum(i['quantity'] for i in items) * PRICE))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def reserve(order_id, items):
+    """POST /orders stock reservation in its own transaction"""
+    conn = connect()
+    cur = conn.cursor()
+    try:
+        shortages = reserve_stock(cur, order_id, [(i['productId'], i['quantity']) for i in items], 15)
+        if shortages:
+            conn.rollback()
+            return 'rejected'
+        conn.commit()
+        return 'reserved'
+    except errors.DeadlockDetected:
+        conn.rollback()
+        return 'deadlock'
+    finally:
+        cur.close()
+        conn.close()
+
+
+def release(order_id):
+    conn = connect()
+    cur = conn.cursor()
+    release_reservations(cur, [order_id])
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+class LockSampler(threading.Thread):
+    """Polls pg_locks / pg_stat_activity for sessions waiting on a lock"""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stop = threading.Event()
+        self.samples = 0
+        self.lock_wait_seconds = 0.0
+        self.peak_waiting = 0
+        self.longest_wait = 0.0
+
+    def run(self):
+        conn = connect()
+        conn.autocommit = True
+        cur = conn.cursor()
+        last = time.perf_counter()
+        while not self.stop.is_set():
+            cur.execute("""
+                SELECT COUNT(DISTINCT l.pid),
+                       COALESCE(EXTRACT(EPOCH FROM MAX(now() - a.state_change)), 0)
+                FROM pg_locks l
+                JOIN pg_stat_activity a ON a.pid = l.pid
+                WHERE NOT l.granted
+                AND a.datname = current_database()
+                AND a.wait_event_type = 'Lock'
+            """)
+            waiting, longest = cur.fetchone()
+            now = time.perf_counter()
+            self.samples += 1
+            # session-seconds spent waiting, integrated over the samples
+            self.lock_wait_seconds += waiting * (now - last)
+            last = now
+            self.peak_waiting = max(self.peak_waiting, waiting)
+            self.longest_wait = max(self.longest_wait, float(longest))
+            time.sleep(self.interval)
+        cur.close()
+        conn.close()
+
+
+def database_deadlocks():
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("SELECT pg_stat_clear_snapshot()")
+    cur.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+    count = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+    return count
+
+
+def worker(worker_id, handler, hot, private_products, args, run_id, results, start):
+    rng = random.Random(args.seed + worker_id)
+    start.wait()
+    for n in range(args.orders):
+        order_id = f'{PREFIX}{run_id}-{worker_id}-{n}'
+        items = make_cart(rng, hot, private_products, args)
+        create_order(order_id, items)
+        began = time.perf_counter()
+
+        outcome = 'success'
+        if args.reserve:
+            reserved = reserve(order_id, items)
+            if reserved != 'reserved':
+                results.append({'outcome': reserved, 'latency': time.perf_counter() - began, 'items': items})
+                continue
+
+        result = handler.lambda_handler({'order_id': order_id, 'items': items}, None)
+        latency = time.perf_counter() - began
+        if result.get('inventoryStatus') != 'success':
+            message = result.get('message', '')
+            outcome = 'deadlock' if 'deadlock detected' in message else (
+                'rejected' if 'Insufficient stock' in message else 'error')
+            if args.reserve:
+                release(order_id)
+        results.append({
+            'outcome': outcome,
+            'latency': latency,
+            'items': items,
+            'message': result.get('message')
+        })
+
+
+def check_oversell(products, hot, args, results):
+    """Units sold per product vs the stock that was there and what is left"""
+    sold = {p: 0 for p in products}
+    for result in results:
+        if result['outcome'] == 'success':
+            for item in result['items']:
+                sold[item['productId']] += item['quantity']
+
+    conn = connect()
+    cur = conn.cursor()
+    if args.hot_shards:
+        refresh_inventory(cur, hot)
+        conn.commit()
+    cur.execute("""
+        SELECT product_id, stock_quantity, reserved_quantity
+        FROM inventory WHERE product_id = ANY(%s)
+    """, (products,))
+    remaining = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+
+    violations = []
+    for product_id, units in sold.items():
+        stock, reserved = remaining[product_id]
+        if units > args.stock:
+            violations.append(f'{product_id}: sold {units} of {args.stock}')
+        elif stock != args.stock - units:
+            violations.append(f'{product_id}: {stock} left, expected {args.stock - units}')
+        elif reserved:
+            violations.append(f'{product_id}: {reserved} units still reserved')
+    return sold, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=100, help='orders per worker')
+    parser.add_argument('--cart-size', default='1-4', help='items per order, e.g. 3 or 1-4')
+    parser.add_argument('--quantity', default='1-2', help='units per item, e.g. 1 or 1-3')
+    parser.add_argument('--overlap', type=float, default=0.5,
+                        help='probability that an item is drawn from the shared hot products')
+    parser.add_argument('--hot-products', type=int, default=3)
+    parser.add_argument('--private-products', type=int, default=20, help='non-shared products per worker')
+    parser.add_argument('--stock', type=int, default=500, help='initial stock per product')
+    parser.add_argument('--reserve', action='store_true', help='reserve stock first, like POST /orders')
+    parser.add_argument('--hot-shards', type=int, default=0, help='run the hot products in sharded mode')
+    parser.add_argument('--sample-interval', type=float, default=0.01, help='lock sampler interval (s)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help="keep the handler's own logging")
+    args = parser.parse_args()
+
+    init_database = load_lambda('init_database')
+    handler = load_lambda('update_inventory')
+    handler.eventbridge = NullEvents()
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with quiet:
+        init_database.lambda_handler({'insert_sample_data': False}, None)
+    hot, private, products = setup_products(args)
+
+    run_id = uuid.uuid4().hex[:8]
+    results = []
+    start = threading.Barrier(args.workers + 1)
+    threads = [
+        threading.Thread(target=worker, args=(w, handler, hot, private[w], args, run_id, results, start))
+        for w in range(args.workers)
+    ]
+    sampler = LockSampler(args.sample_interval)
+    deadlocks_before = database_deadlocks()
+
+    with quiet:
+        for thread in threads:
+            thread.start()
+        sampler.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+        sampler.stop.set()
+        sampler.join()
+
+    time.sleep(1)  # let the statistics collector catch up
+    deadlocks = database_deadlocks() - deadlocks_before
+    sold, violations = check_oversell(products, hot, args, results)
+
+    outcomes = {}
+    for result in results:
+        outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+    latencies = [r['latency'] * 1000 for r in results if r['outcome'] == 'success']
+
+    mode = ('reserved' if args.reserve else 'row locks') + (f', {args.hot_shards} shards' if args.hot_shards else '')
+    print(f'{args.workers} workers x {args.orders} orders, cart {args.cart_size}, '
+          f'overlap {args.overlap:.0%} over {args.hot_products} hot products, mode {mode}')
+    print(f'  wall time          {elapsed:10.2f} s')
+    print(f'  throughput         {outcomes.get("success", 0) / elapsed:10.1f} orders/s')
+    print(f'  latency p50 / p99  {percentile(latencies, 50):10.1f} / {percentile(latencies, 99):.1f} ms')
+    print(f'  outcomes           {", ".join(f"{k}={v}" for k, v in sorted(outcomes.items()))}')
+    print(f'  deadlocks          {deadlocks:10d} (pg_stat_database)')
+    print(f'  lock wait          {sampler.lock_wait_seconds:10.2f} session-s, '
+          f'peak {sampler.peak_waiting} waiting, longest {sampler.longest_wait * 1000:.0f} ms')
+    print(f'  hot units sold     {sum(sold[p] for p in hot):10d} of {args.stock * len(hot)}')
+    print(f'  oversell checks    {"OK" if not violations else f"{len(violations)} VIOLATIONS"}')
+    for violation in violations[:20]:
+        print(f'    {violation}')
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
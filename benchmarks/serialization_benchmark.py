@@ -0,0 +1,85 @@
+"""
+Compare the legacy list-response path (per-field float()/isoformat() into
+a dict, then json.dumps) with lambda/order_management/serialization.py.
+
+    python benchmarks/serialization_benchmark.py --rows 5000 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'order_management'))
+
+import serialization  # noqa: E402
+
+COLUMNS = ['order_id', 'customer_id', 'total_amount', 'status', 'created_at']
+
+
+def make_rows(count):
+    start = datetime(2024, 1, 1, 10, 30)
+    return [
+        (f'order-{i:08d}', f'CUST{i % 500:03d}', Decimal(f'{(i * 7) % 2000}.{i % 100:02d}'),
+         'pending' if i % 3 else 'processing', start + timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+
+def make_float_rows(rows):
+    # what the driver returns once the SQL casts amounts to float8
+    return [(r[0], r[1], float(r[2]), r[3], r[4]) for r in rows]
+
+
+def legacy(rows):
+    orders = []
+    for row in rows:
+        orders.append({
+            'order_id': row[0],
+            'customer_id': row[1],
+            'total_amount': float(row[2]),
+            'status': row[3],
+            'created_at': row[4].isoformat()
+        })
+    return json.dumps({'orders': orders})
+
+
+def records(rows):
+    return serialization.dumps({'orders': serialization.rows_payload(COLUMNS, rows)})
+
+
+def columnar(rows):
+    return serialization.dumps({'orders': serialization.rows_payload(COLUMNS, rows, columnar=True)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    decimal_rows = make_rows(args.rows)
+    float_rows = make_float_rows(decimal_rows)
+
+    cases = [
+        ('legacy dict + json.dumps', legacy, decimal_rows),
+        (f'records ({serialization.BACKEND}, Decimal rows)', records, decimal_rows),
+        (f'records ({serialization.BACKEND}, float8 rows)', records, float_rows),
+        (f'columnar ({serialization.BACKEND}, float8 rows)', columnar, float_rows),
+    ]
+
+    assert json.loads(legacy(decimal_rows)) == json.loads(records(decimal_rows))
+
+    print(f'{args.rows} rows, best of {args.repeat} runs')
+    baseline = None
+    for name, fn, rows in cases:
+        best = min(timeit.repeat(lambda: fn(rows), number=1, repeat=args.repeat))
+        baseline = baseline or best
+        size = len(fn(rows).encode('utf-8'))
+        print(f'  {name:<40} {best * 1000:8.2f} ms  {baseline / best:5.2f}x  {size / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -138,7 +138,7 @@ function showConfigurationWarning() {
 }
 
 // API Helper
-async function apiCall(endpoint, method = 'GET', body = null) {
+async function apiCall(endpoint, method = 'GET', body = null, extraHeaders = {}) {
     console.log(`=== API CALL START: ${method} ${endpoint} ===`);
     
     // Check if API is configured
@@ -164,7 +164,8 @@ async function apiCall(endpoint, method = 'GET', body = null) {
             headers: {
                 'Content-Type': 'application/json',
                 'x-api-key': API_KEY,
-                'Accept': 'application/json'
+                'Accept': 'application/json',
+                ...extraHeaders
             },
             mode: 'cors'
         };
@@ -355,7 +356,7 @@ async function loadOrders() {
         // Show loading state
         const tableBody = document.getElementById('orders-table');
         if (tableBody) {
-            tableBody.innerHTML = '<tr><td colspan="7" class="text-center"><div class="spinner-border spinner-border-sm"></div> Loading orders...</td></tr>';
+            tableBody.innerHTML = '<tr><td colspan="8" class="text-center"><div class="spinner-border spinner-border-sm"></div> Loading orders...</td></tr>';
         }
         
         const data = await apiCall(`/orders?page=${currentPage}&limit=10`);
@@ -365,10 +366,11 @@ async function loadOrders() {
         console.log(`Found ${orders.length} orders`);
         
         if (orders.length === 0) {
-            tableBody.innerHTML = '<tr><td colspan="7" class="text-center">No orders found</td></tr>';
+            tableBody.innerHTML = '<tr><td colspan="8" class="text-center">No orders found</td></tr>';
         } else {
             tableBody.innerHTML = orders.map(order => `
                 <tr>
+                    <td><input type="checkbox" class="form-check-input order-select" value="${order.order_id}"></td>
                     <td><code>${order.order_id || 'N/A'}</code></td>
                     <td>${order.customer_id || 'Customer'}</td>
                     <td>${order.customer_id ? `${order.customer_id}@customer.com` : 'N/A'}</td>
@@ -392,6 +394,9 @@ async function loadOrders() {
             `).join('');
         }
         
+        const selectAll = document.getElementById('select-all-orders');
+        if (selectAll) selectAll.checked = false;
+        
         // Update pagination
         const pagination = data.pagination || {};
         document.getElementById('current-page').textContent = pagination.page || currentPage;
@@ -403,7 +408,7 @@ async function loadOrders() {
         console.error('Error loading orders:', error);
         const tableBody = document.getElementById('orders-table');
         if (tableBody) {
-            tableBody.innerHTML = '<tr><td colspan="7" class="text-center text-danger">Error: ' + error.message + '</td></tr>';
+            tableBody.innerHTML = '<tr><td colspan="8" class="text-center text-danger">Error: ' + error.message + '</td></tr>';
         }
     }
 }
@@ -426,7 +431,7 @@ async function viewOrder(orderId) {
                         <table class="table table-sm">
                             <thead>
                                 <tr>
-                                    <th>Product ID</th>
+                                    <th>Product</th>
                                     <th>Quantity</th>
                                     <th>Price</th>
                                     <th>Subtotal</th>
@@ -435,7 +440,7 @@ async function viewOrder(orderId) {
                             <tbody>
                                 ${order.items.map(item => `
                                     <tr>
-                                        <td>${item.product_id || 'N/A'}</td>
+                                        <td>${item.product_name || 'N/A'}<br><small class="text-muted">${item.product_id || ''}</small></td>
                                         <td>${item.quantity || 0}</td>
                                         <td>$${(item.price || 0).toFixed(2)}</td>
                                         <td>$${((item.quantity || 0) * (item.price || 0)).toFixed(2)}</td>
@@ -638,6 +643,13 @@ async function checkWorkflowStatus(orderId) {
         // Update modal content
         document.getElementById('order-detail-content').innerHTML = content;
         
+        // Wait for the next transition instead of polling
+        if (workflowStatus.status.toUpperCase() === 'RUNNING') {
+            watchWorkflowStatus(orderId);
+        } else {
+            stopWorkflowWatch();
+        }
+        
     } catch (error) {
         console.error('Error checking workflow status:', error);
         
@@ -680,73 +692,127 @@ async function refreshWorkflowStatus(orderId) {
     await checkWorkflowStatus(orderId);
 }
 
-// Fungsi baru untuk melihat semua executions
-// Fungsi baru untuk melihat semua executions
-// Fungsi untuk melihat semua executions
+// Workflow status pushed by the backend long-poll (GET /status/{id}/wait):
+// each request is held open until the order or workflow status changes
+const STATUS_WAIT_SECONDS = 25;
+let workflowWatchId = 0;
+
+function stopWorkflowWatch() {
+    workflowWatchId++;
+}
+
+async function watchWorkflowStatus(orderId) {
+    const watchId = ++workflowWatchId;
+    let version = null;
+    let failures = 0;
+    
+    while (watchId === workflowWatchId) {
+        try {
+            let endpoint = `/status/${orderId}/wait?timeout=${STATUS_WAIT_SECONDS}`;
+            if (version) {
+                endpoint += `&since=${encodeURIComponent(version)}`;
+            }
+            const state = await apiCall(endpoint);
+            failures = 0;
+            if (watchId !== workflowWatchId) return;
+            
+            if (version && state.changed) {
+                // Re-render once per transition; a new watch starts if still running
+                await refreshWorkflowStatus(orderId);
+                return;
+            }
+            version = state.version;
+            if (state.workflow_status && state.workflow_status !== 'RUNNING') {
+                await refreshWorkflowStatus(orderId);
+                return;
+            }
+        } catch (error) {
+            console.error('Error waiting for workflow status:', error);
+            if (++failures >= 3) return;
+            await new Promise(resolve => setTimeout(resolve, 5000));
+        }
+    }
+}
+
 // Fungsi untuk melihat semua executions
-async function listAllExecutions() {
+// Executions are listed from the backend index one page at a time
+const EXECUTION_PAGE_SIZE = 25;
+let executionsCursor = null;
+let executionsStatus = 'ALL';
+
+async function listAllExecutions(status = 'ALL') {
+    stopWorkflowWatch();
+    executionsStatus = status;
+    executionsCursor = null;
+    
+    document.querySelector('#order-detail-modal .modal-title').textContent = 'Executions List';
+    document.getElementById('order-detail-content').innerHTML = `
+        <div class="d-flex align-items-center mb-3">
+            <label class="me-2 small text-muted" for="executions-status">Status</label>
+            <select id="executions-status" class="form-select form-select-sm w-auto" onchange="listAllExecutions(this.value)">
+                ${['ALL', 'RUNNING', 'SUCCEEDED', 'FAILED', 'TIMED_OUT', 'ABORTED'].map(s =>
+                    `<option value="${s}" ${s === status ? 'selected' : ''}>${s}</option>`).join('')}
+            </select>
+        </div>
+        <div class="table-responsive">
+            <table class="table table-sm align-middle">
+                <thead>
+                    <tr><th>Order</th><th>Status</th><th>Started</th><th>Stopped</th><th></th></tr>
+                </thead>
+                <tbody id="executions-body"></tbody>
+            </table>
+        </div>
+        <div class="mt-3">
+            <button id="executions-more" class="btn btn-outline-primary d-none" onclick="loadMoreExecutions()">
+                <i class="bi bi-chevron-down me-1"></i>Load More
+            </button>
+            <button class="btn btn-outline-secondary ms-2" onclick="closeCurrentModal()">
+                <i class="bi bi-x-circle me-1"></i>Close
+            </button>
+        </div>
+    `;
+    
+    await loadMoreExecutions();
+}
+
+async function loadMoreExecutions() {
+    const tbody = document.getElementById('executions-body');
+    const moreButton = document.getElementById('executions-more');
+    if (!tbody) return;
+    
     try {
-        showToast('📋 Loading all executions...', 'info');
-        
-        // Tampilkan pesan bahwa fitur ini belum tersedia
-        let content = `
-            <div class="alert alert-warning">
-                <h5><i class="bi bi-exclamation-triangle me-2"></i>Feature Not Available</h5>
-                <p class="mt-3">
-                    The "View All Executions" feature requires additional configuration on the backend.
-                </p>
-                <p class="mb-0">
-                    <small class="text-muted">
-                        To enable this feature, you need to:<br>
-                        1. Add CORS configuration for /executions endpoint in API Gateway<br>
-                        2. Deploy the updated API<br>
-                        3. Configure the Lambda function to handle /executions route
-                    </small>
-                </p>
-            </div>
-            
-            <div class="card mt-4">
-                <div class="card-body">
-                    <h6><i class="bi bi-lightbulb me-2"></i>Alternative Solution</h6>
-                    <p>You can check individual workflow status by:</p>
-                    <ol class="small">
-                        <li>Click the <i class="bi bi-lightning-charge text-info"></i> button next to any order</li>
-                        <li>Or go to AWS Console > Step Functions</li>
-                        <li>Look for state machine: <code>lks-stepfunctions-order-workflow</code></li>
-                    </ol>
-                </div>
-            </div>
-            
-            <div class="mt-4">
-                <button class="btn btn-outline-secondary" onclick="closeCurrentModal()">
-                    <i class="bi bi-x-circle me-1"></i>Close
-                </button>
-                <button class="btn btn-outline-primary ms-2" onclick="showSettings()">
-                    <i class="bi bi-gear me-1"></i>Check API Settings
-                </button>
-            </div>
-        `;
+        let endpoint = `/executions?limit=${EXECUTION_PAGE_SIZE}&status=${executionsStatus}`;
+        if (executionsCursor) {
+            endpoint += `&cursor=${encodeURIComponent(executionsCursor)}`;
+        }
+        const data = await apiCall(endpoint);
+        executionsCursor = data.next_cursor;
+        
+        const statusColors = { RUNNING: 'info', SUCCEEDED: 'success', FAILED: 'danger', TIMED_OUT: 'warning', ABORTED: 'secondary' };
+        tbody.insertAdjacentHTML('beforeend', (data.executions || []).map(execution => `
+            <tr>
+                <td><code class="small">${execution.order_id}</code></td>
+                <td><span class="badge bg-${statusColors[execution.status] || 'secondary'}">${execution.status}</span></td>
+                <td class="small">${execution.start_date ? new Date(execution.start_date).toLocaleString() : '-'}</td>
+                <td class="small">${execution.stop_date ? new Date(execution.stop_date).toLocaleString() : '-'}</td>
+                <td>
+                    <button class="btn btn-sm btn-outline-info" onclick="checkWorkflowStatus('${execution.order_id}')">
+                        <i class="bi bi-lightning-charge"></i>
+                    </button>
+                </td>
+            </tr>
+        `).join(''));
         
-        document.getElementById('order-detail-content').innerHTML = content;
-        document.querySelector('#order-detail-modal .modal-title').textContent = 'Executions List';
+        if (!tbody.children.length) {
+            tbody.innerHTML = '<tr><td colspan="5" class="text-center text-muted">No executions found</td></tr>';
+        }
+        moreButton.classList.toggle('d-none', !executionsCursor);
         
     } catch (error) {
-        console.error('Error:', error);
-        
-        document.getElementById('order-detail-content').innerHTML = `
-            <div class="alert alert-danger">
-                <h5><i class="bi bi-exclamation-triangle me-2"></i>Configuration Required</h5>
-                <p class="mt-3">The /executions endpoint is not configured.</p>
-                <div class="mt-4">
-                    <button class="btn btn-outline-danger" onclick="closeCurrentModal()">
-                        <i class="bi bi-x-circle me-1"></i>Close
-                    </button>
-                    <button class="btn btn-info ms-2" onclick="showSettings()">
-                        <i class="bi bi-gear me-1"></i>API Settings
-                    </button>
-                </div>
-            </div>
-        `;
+        console.error('Error listing executions:', error);
+        tbody.insertAdjacentHTML('beforeend', `
+            <tr><td colspan="5" class="text-danger">Failed to load executions: ${error.message}</td></tr>
+        `);
     }
 }
 
@@ -757,6 +823,7 @@ document.addEventListener('DOMContentLoaded', function() {
     if (orderDetailModal) {
         // Clean up when modal is hidden
         orderDetailModal.addEventListener('hidden.bs.modal', function() {
+            stopWorkflowWatch();
             // Clear content
             document.getElementById('order-detail-content').innerHTML = 'Loading...';
             // Reset title
@@ -782,7 +849,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // Update Order Status
 async function updateOrderStatus(orderId) {
-    const currentStatus = prompt('Current status is: [current]\n\nEnter new status:\n- pending\n- processing\n- completed\n- cancelled\n\nEnter new status:'.replace('[current]', 'unknown'));
+    const currentStatus = prompt('Current status is: [current]\n\nEnter new status:\n- pending\n- processing\n- shipped\n- delivered\n- completed\n- cancelled\n\nEnter new status:'.replace('[current]', 'unknown'));
     if (!currentStatus) return;
     
     console.log(`Updating order ${orderId} status to ${currentStatus}`);
@@ -798,6 +865,45 @@ async function updateOrderStatus(orderId) {
     }
 }
 
+// Select / deselect every order on the current page
+function toggleSelectAllOrders(checkbox) {
+    document.querySelectorAll('.order-select').forEach(el => {
+        el.checked = checkbox.checked;
+    });
+}
+
+// Bulk Update Order Status
+async function bulkUpdateStatus(status) {
+    const orderIds = Array.from(document.querySelectorAll('.order-select:checked')).map(el => el.value);
+    if (orderIds.length === 0) {
+        showToast('⚠️ Select at least one order', 'warning');
+        return;
+    }
+    if (!confirm(`Change ${orderIds.length} order(s) to "${status}"?`)) return;
+    
+    console.log(`Bulk updating ${orderIds.length} orders to ${status}`);
+    
+    try {
+        const result = await apiCall('/orders/status', 'PUT', {
+            order_ids: orderIds,
+            status: status,
+            notify: status === 'shipped'
+        });
+        const skipped = (result.results || []).filter(r => r.outcome !== 'updated');
+        if (skipped.length > 0) {
+            console.warn('Orders not updated:', skipped);
+            showToast(`⚠️ ${result.message}. ${skipped.length} skipped (see console)`, 'warning');
+        } else {
+            showToast(`✓ ${result.message}`, 'success');
+        }
+        loadOrders();
+        loadDashboard();
+    } catch (error) {
+        console.error('Error updating orders:', error);
+        showToast('❌ Failed to update orders: ' + error.message, 'error');
+    }
+}
+
 // Delete Order
 async function deleteOrder(orderId) {
     if (!confirm(`Are you sure you want to delete order ${orderId}? This action cannot be undone.`)) return;
@@ -847,13 +953,27 @@ async function setupCreateOrderForm() {
     }
 }
 
-async function loadCustomers() {
-    console.log('Loading customers...');
+const CUSTOMER_SEARCH_LIMIT = 20;
+let customerSearchTimer = null;
+let customerSearchSeq = 0;
+
+// Debounce typeahead input so only the last keystroke hits the API
+function onCustomerSearchInput(value) {
+    clearTimeout(customerSearchTimer);
+    customerSearchTimer = setTimeout(() => loadCustomers(value.trim()), 250);
+}
+
+async function loadCustomers(query = '') {
+    console.log('Loading customers...', query);
+    const seq = ++customerSearchSeq;
     
     try {
-        const data = await apiCall('/customers');
+        const data = await apiCall(`/customers?q=${encodeURIComponent(query)}&limit=${CUSTOMER_SEARCH_LIMIT}`);
         console.log('Customers loaded:', data);
         
+        // A newer search has started; drop this stale result
+        if (seq !== customerSearchSeq) return;
+        
         const customers = data.customers || [];
         const customerSelect = document.getElementById('customer-select');
         
@@ -863,18 +983,26 @@ async function loadCustomers() {
         }
         
         // Clear existing options
-        customerSelect.innerHTML = '<option value="">Select Customer</option>';
+        customerSelect.innerHTML = customers.length > 0
+            ? '<option value="">Select Customer</option>'
+            : '<option value="">No matching customers</option>';
         
         // Add customer options
         customers.forEach(customer => {
             const option = document.createElement('option');
             option.value = customer.customer_id;
-            option.textContent = `${customer.customer_name} (${customer.customer_id})`;
+            option.textContent = customer.label || `${customer.customer_name} (${customer.customer_id})`;
             option.dataset.email = customer.email;
-            option.dataset.phone = customer.phone;
             customerSelect.appendChild(option);
         });
         
+        if (data.has_more) {
+            const option = document.createElement('option');
+            option.disabled = true;
+            option.textContent = 'Keep typing to narrow results...';
+            customerSelect.appendChild(option);
+        }
+        
         console.log(`Loaded ${customers.length} customers`);
         
     } catch (error) {
@@ -883,6 +1011,10 @@ async function loadCustomers() {
     }
 }
 
+const PRODUCT_PICKER_FIELDS = 'product_id,product_name,price,stock_quantity,category';
+const PRODUCT_PAGE_SIZE = 200;
+const PRODUCT_MAX_PAGES = 25;
+
 async function loadProducts() {
     console.log('Loading products...');
     
@@ -896,10 +1028,19 @@ async function loadProducts() {
             }
         });
         
-        const data = await apiCall('/products');
-        console.log('Products loaded:', data);
-        
-        const products = data.products || [];
+        // Page through the catalog with only the fields the pickers need
+        const products = [];
+        let cursor = null;
+        let pages = 0;
+        do {
+            const query = `fields=${PRODUCT_PICKER_FIELDS}&limit=${PRODUCT_PAGE_SIZE}` +
+                (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+            const data = await apiCall(`/products?${query}`);
+            products.push(...(data.products || []));
+            cursor = data.next_cursor;
+            pages++;
+        } while (cursor && pages < PRODUCT_MAX_PAGES);
+        console.log(`Products loaded: ${products.length} in ${pages} page(s)`);
         
         if (products.length === 0) {
             console.warn('No products found in database');
@@ -984,22 +1125,33 @@ async function loadProducts() {
     }
 }
 
+// Build the option list once and clone it into each select
+function buildProductOptions() {
+    const fragment = document.createDocumentFragment();
+    const placeholder = document.createElement('option');
+    placeholder.value = '';
+    placeholder.textContent = 'Select Product';
+    fragment.appendChild(placeholder);
+    
+    Object.values(window.products || {}).forEach(product => {
+        const option = document.createElement('option');
+        option.value = product.product_id;
+        option.textContent = `${product.product_name} - $${product.price.toFixed(2)} (Stock: ${product.stock_quantity})`;
+        option.dataset.price = product.price;
+        option.dataset.stock = product.stock_quantity;
+        option.dataset.description = product.description || product.category || '';
+        fragment.appendChild(option);
+    });
+    return fragment;
+}
+
 function updateProductSelects() {
     const productSelects = document.querySelectorAll('.product-select');
+    const options = buildProductOptions();
     
     productSelects.forEach(select => {
-        // Clear existing options
-        select.innerHTML = '<option value="">Select Product</option>';
-        
-        // Add product options
-        Object.values(window.products || {}).forEach(product => {
-            const option = document.createElement('option');
-            option.value = product.product_id;
-            option.textContent = `${product.product_name} - $${product.price.toFixed(2)} (Stock: ${product.stock_quantity})`;
-            option.dataset.price = product.price;
-            option.dataset.stock = product.stock_quantity;
-            select.appendChild(option);
-        });
+        select.replaceChildren(options.cloneNode(true));
+        select.disabled = false;
     });
 }
 
@@ -1071,19 +1223,7 @@ function addOrderItem() {
 }
 
 function updateProductSelect(selectElement) {
-    // Clear existing options
-    selectElement.innerHTML = '<option value="">Select Product</option>';
-    
-    // Add product options
-    Object.values(window.products || {}).forEach(product => {
-        const option = document.createElement('option');
-        option.value = product.product_id;
-        option.textContent = `${product.product_name} - $${product.price.toFixed(2)}`;
-        option.dataset.price = product.price;
-        option.dataset.stock = product.stock_quantity;
-        option.dataset.description = product.description || '';
-        selectElement.appendChild(option);
-    });
+    selectElement.replaceChildren(buildProductOptions());
 }
 
 function updateProductPrice(selectElement) {
@@ -1223,6 +1363,8 @@ function calculateTotal() {
 }
 
 // Create Order
+let pendingOrderRequest = null;
+
 async function createOrder(event) {
     event.preventDefault();
     console.log('Creating order...');
@@ -1299,7 +1441,17 @@ async function createOrder(event) {
             submitButton.innerHTML = '<span class="spinner-border spinner-border-sm"></span> Creating...';
         }
         
-        const result = await apiCall('/orders', 'POST', orderPayload);
+        // Reuse the same Idempotency-Key while retrying an identical payload,
+        // so a retry after a timeout returns the original order
+        const payloadJson = JSON.stringify(orderPayload);
+        if (!pendingOrderRequest || pendingOrderRequest.payload !== payloadJson) {
+            pendingOrderRequest = { payload: payloadJson, key: crypto.randomUUID() };
+        }
+        
+        const result = await apiCall('/orders', 'POST', orderPayload, {
+            'Idempotency-Key': pendingOrderRequest.key
+        });
+        pendingOrderRequest = null;
         console.log('Order created:', result);
         
         // Show success message
@@ -1309,7 +1461,7 @@ async function createOrder(event) {
                 <small>
                     Order ID: ${result.order_id}<br>
                     Total: $${result.total_amount}<br>
-                    Status: ${result.status}<br>
+                    Status: ${result.workflow ? `${result.workflow.order_status} (payment: ${result.workflow.payment_status})` : result.status}<br>
                     <button class="btn btn-sm btn-info mt-2" onclick="checkWorkflowStatus('${result.order_id}')">
                         <i class="bi bi-lightning-charge"></i> Check Workflow Status
                     </button>
@@ -1349,6 +1501,10 @@ function resetCreateOrderForm() {
         if (customerSelect) {
             customerSelect.selectedIndex = 0;
         }
+        const customerSearch = document.getElementById('customer-search');
+        if (customerSearch) {
+            customerSearch.value = '';
+        }
         
         // Reset customer details
         const customerDetails = document.getElementById('customer-details');
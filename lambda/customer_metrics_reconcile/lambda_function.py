@@ -0,0 +1,84 @@
+import os
+import traceback
+from datetime import datetime
+
+import psycopg2
+from instrumentation import Metrics
+from customer_metrics import reconcile_batch
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+RECONCILE_BATCH_SIZE = int(os.environ.get("RECONCILE_BATCH_SIZE", "500"))
+RECONCILE_MAX_BATCHES = int(os.environ.get("RECONCILE_MAX_BATCHES", "200"))
+
+metrics = Metrics("customer_metrics_reconcile")
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Scheduled re-derivation of customer_metrics from orders, batch by batch
+    over customer_id. Repairs what the trigger cannot keep exact (first/last
+    order date after deletes) and any drift. A run that hits max_batches
+    returns next_after; pass it back as "after" to continue.
+    """
+    print("🧮 CUSTOMER METRICS RECONCILE STARTED")
+
+    event = event or {}
+    after = event.get("after", "")
+    batch_size = int(event.get("batch_size", RECONCILE_BATCH_SIZE))
+    max_batches = int(event.get("max_batches", RECONCILE_MAX_BATCHES))
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        corrected = 0
+        batches = 0
+        # Short transactions: each batch commits before the next one
+        while after is not None and batches < max_batches:
+            after, count = reconcile_batch(cur, after, batch_size)
+            conn.commit()
+            batches += 1
+            corrected += count
+
+        metrics.count("CustomerMetricsCorrected", corrected)
+        print(f"🎉 CUSTOMER METRICS RECONCILE DONE ({corrected} corrected in {batches} batches)")
+
+        return {
+            "status": "success",
+            "corrected": corrected,
+            "batches": batches,
+            "has_more": after is not None,
+            "next_after": after,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        conn.rollback()
+        print("🔥 CUSTOMER METRICS RECONCILE FAILED")
+        print(traceback.format_exc())
+        return {
+            "status": "error",
+            "message": f"Customer metrics reconcile failed: {str(e)}"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
@@ -0,0 +1,154 @@
+import os
+import traceback
+from datetime import datetime, timedelta
+
+import boto3
+import psycopg2
+from instrumentation import Metrics
+from workflow_executions import execution_row, to_timestamp, upsert_executions
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+STATE_MACHINE_ARN = os.environ.get("STATE_MACHINE_ARN")
+# Scheduled sync walks ListExecutions back to this far before the newest indexed start
+SYNC_LOOKBACK_HOURS = int(os.environ.get("SYNC_LOOKBACK_HOURS", "24"))
+SYNC_MAX_PAGES = int(os.environ.get("SYNC_MAX_PAGES", "20"))
+# RUNNING rows older than the lookback are re-checked with DescribeExecution
+SYNC_MAX_DESCRIBES = int(os.environ.get("SYNC_MAX_DESCRIBES", "50"))
+
+metrics = Metrics("execution_sync")
+sfn_client = metrics.instrument_client(boto3.client("stepfunctions"))
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+def is_status_change(event):
+    return event.get("detail-type") == "Step Functions Execution Status Change"
+
+
+def apply_status_change(cur, conn, detail):
+    """One execution from an EventBridge status-change event"""
+    written = upsert_executions(cur, [execution_row(detail)])
+    conn.commit()
+    print(f"🔔 {detail['name']} -> {detail['status']} ({written} row written)")
+    return {"status": "success", "source": "event", "written": written}
+
+
+def sync_recent(cur, conn, full, max_pages):
+    """
+    Page through ListExecutions (newest first) until executions start
+    before the lookback window, or through everything when full.
+    """
+    cutoff = None
+    if not full:
+        cur.execute("SELECT MAX(start_date) FROM workflow_executions")
+        newest = cur.fetchone()[0]
+        if newest:
+            cutoff = newest - timedelta(hours=SYNC_LOOKBACK_HOURS)
+
+    written = 0
+    pages = 0
+    next_token = None
+    while pages < max_pages:
+        params = {"stateMachineArn": STATE_MACHINE_ARN, "maxResults": 1000}
+        if next_token:
+            params["nextToken"] = next_token
+        page = sfn_client.list_executions(**params)
+        pages += 1
+
+        executions = page.get("executions", [])
+        written += upsert_executions(cur, [execution_row(e) for e in executions])
+        conn.commit()
+
+        next_token = page.get("nextToken")
+        oldest = to_timestamp(executions[-1]["startDate"]) if executions else None
+        if not next_token or (cutoff and oldest and oldest < cutoff):
+            break
+
+    return written, pages, bool(next_token) and pages >= max_pages
+
+
+def refresh_stale_running(cur, conn, max_describes):
+    """RUNNING rows the paged sync no longer reaches"""
+    cur.execute("""
+        SELECT execution_arn FROM workflow_executions
+        WHERE status = 'RUNNING'
+        AND start_date < (SELECT MAX(start_date) FROM workflow_executions) - %s
+        ORDER BY start_date
+        LIMIT %s
+    """, (timedelta(hours=SYNC_LOOKBACK_HOURS), max_describes))
+    rows = []
+    for (execution_arn,) in cur.fetchall():
+        try:
+            rows.append(execution_row(sfn_client.describe_execution(executionArn=execution_arn)))
+        except sfn_client.exceptions.ExecutionDoesNotExist:
+            print(f"⚠️ Execution no longer exists: {execution_arn}")
+    written = upsert_executions(cur, rows)
+    conn.commit()
+    return written
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Keeps workflow_executions current.
+    - EventBridge "Step Functions Execution Status Change": upsert that execution
+    - Scheduled run: page ListExecutions back over the lookback window and
+      re-check old RUNNING rows. {"full": true} backfills every execution.
+    """
+    print("🔄 EXECUTION SYNC STARTED")
+    event = event or {}
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        if is_status_change(event):
+            return apply_status_change(cur, conn, event["detail"])
+
+        if not STATE_MACHINE_ARN:
+            return {"status": "error", "message": "STATE_MACHINE_ARN is not configured"}
+
+        full = bool(event.get("full", False))
+        max_pages = int(event.get("max_pages", SYNC_MAX_PAGES))
+        written, pages, has_more = sync_recent(cur, conn, full, max_pages)
+        refreshed = refresh_stale_running(cur, conn, SYNC_MAX_DESCRIBES)
+        metrics.count("ExecutionsWritten", written + refreshed)
+
+        print(f"🎉 EXECUTION SYNC DONE ({written} written from {pages} pages, {refreshed} refreshed)")
+        return {
+            "status": "success",
+            "source": "sync",
+            "pages": pages,
+            "written": written,
+            "refreshed": refreshed,
+            "has_more": has_more,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        conn.rollback()
+        print("🔥 EXECUTION SYNC FAILED")
+        print(traceback.format_exc())
+        return {
+            "status": "error",
+            "message": f"Execution sync failed: {str(e)}"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
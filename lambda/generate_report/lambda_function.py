@@ -5,6 +5,9 @@ import psycopg2
 from datetime import datetime, timedelta
 import pandas as pd
 from io import BytesIO
+from instrumentation import Metrics
+from query_profiler import QueryProfiler
+from report_engine import extract_facts, metric, run_report, section, stock_status
 
 DB_HOST = os.environ.get('DB_HOST')
 DB_NAME = os.environ.get('DB_NAME')
@@ -12,16 +15,60 @@ DB_USER = os.environ.get('DB_USER')
 DB_PASSWORD = os.environ.get('DB_PASSWORD')
 S3_BUCKET = os.environ.get('S3_BUCKET')
 
-s3_client = boto3.client('s3')
+metrics = Metrics('generate_report')
+s3_client = metrics.instrument_client(boto3.client('s3'))
 
 def get_db_connection():
-    return psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
+    with metrics.timer('DbConnect'):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+metrics.profiler = QueryProfiler('generate_report', connect=get_db_connection)
+
+# ==============================
+# REPORT SECTIONS (one sheet each, in this order)
+# ==============================
+@section('Daily Summary', summary_key='orders_by_status')
+def daily_summary(views):
+    return views['orders'].groupby('status', as_index=False).agg(
+        order_count=('order_id', 'size'),
+        total_revenue=('total_amount', 'sum')
+    )
+
+@section('Top Products', summary_key='top_products', summary_rows=5)
+def top_products(views):
+    return views['lines'].groupby('product_name', as_index=False).agg(
+        total_quantity=('quantity', 'sum'),
+        total_revenue=('revenue', 'sum')
+    ).nlargest(10, 'total_revenue')
+
+@section('Inventory Status', summary_key='low_stock_items',
+         summary_filter=lambda df: df['stock_status'] != 'Normal')
+def inventory_status(views):
+    # Closest to their own low threshold first, not lowest absolute stock
+    inventory = views['inventory'].assign(
+        cover=lambda df: df['stock_quantity'] / df['low_threshold'].clip(lower=1)
     )
+    return inventory.nsmallest(20, 'cover')[[
+        'product_name', 'stock_quantity', 'critical_threshold', 'low_threshold', 'days_until_stockout'
+    ]].assign(
+        stock_status=lambda df: stock_status(df['stock_quantity'], df['critical_threshold'], df['low_threshold'])
+    )
+
+@metric('total_orders')
+def total_orders(views, sheets):
+    return int(len(views['orders']))
 
+@metric('total_revenue')
+def total_revenue(views, sheets):
+    return float(views['orders']['total_amount'].sum())
+
+@metrics.handler
 def lambda_handler(event, context):
     """
     Generate daily order report
@@ -30,63 +77,22 @@ def lambda_handler(event, context):
         report_date = datetime.now().date()
         start_date = report_date - timedelta(days=1)
         
+        # One extract for the whole report; sections are computed from it
         conn = get_db_connection()
+        try:
+            facts = extract_facts(conn, start_date, report_date)
+        finally:
+            conn.close()
         
-        # Daily orders summary
-        query = """
-            SELECT 
-                o.status,
-                COUNT(*) as order_count,
-                SUM(o.total_amount) as total_revenue
-            FROM orders o
-            WHERE DATE(o.order_date) = %s
-            GROUP BY o.status
-        """
-        
-        df_summary = pd.read_sql_query(query, conn, params=(start_date,))
-        
-        # Top products
-        query = """
-            SELECT 
-                i.product_name,
-                SUM(oi.quantity) as total_quantity,
-                SUM(oi.quantity * oi.price) as total_revenue
-            FROM order_items oi
-            JOIN orders o ON oi.order_id = o.order_id
-            JOIN inventory i ON oi.product_id = i.product_id
-            WHERE DATE(o.order_date) = %s
-            GROUP BY i.product_name
-            ORDER BY total_revenue DESC
-            LIMIT 10
-        """
-        
-        df_products = pd.read_sql_query(query, conn, params=(start_date,))
-        
-        # Inventory status
-        query = """
-            SELECT 
-                product_name,
-                stock_quantity,
-                CASE 
-                    WHEN stock_quantity < 10 THEN 'Critical'
-                    WHEN stock_quantity < 50 THEN 'Low'
-                    ELSE 'Normal'
-                END as stock_status
-            FROM inventory
-            ORDER BY stock_quantity ASC
-            LIMIT 20
-        """
-        
-        df_inventory = pd.read_sql_query(query, conn)
-        
-        conn.close()
+        with metrics.timer('ReportCompute'):
+            sheets, sections_summary = run_report(facts)
+        metrics.count('ReportFactRows', len(facts))
         
         # Create Excel report
         output = BytesIO()
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df_summary.to_excel(writer, sheet_name='Daily Summary', index=False)
-            df_products.to_excel(writer, sheet_name='Top Products', index=False)
-            df_inventory.to_excel(writer, sheet_name='Inventory Status', index=False)
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
         
         output.seek(0)
         
@@ -102,11 +108,7 @@ def lambda_handler(event, context):
         # Create JSON summary
         summary = {
             'report_date': str(start_date),
-            'total_orders': int(df_summary['order_count'].sum()),
-            'total_revenue': float(df_summary['total_revenue'].sum()),
-            'orders_by_status': df_summary.to_dict('records'),
-            'top_products': df_products.head(5).to_dict('records'),
-            'low_stock_items': df_inventory[df_inventory['stock_status'] != 'Normal'].to_dict('records')
+            **sections_summary
         }
         
         # Save JSON summary
@@ -0,0 +1,133 @@
+"""
+Report engine for generate_report.
+
+The day's facts are read with one query: every order line of the report
+window joined to its order, full-joined to inventory (with each product's
+restock_forecast thresholds) so unsold products are there too. Shared views (orders, order lines, inventory) are derived from
+that frame once, and every registered section is a vectorized pass over the
+views. A new sheet is one @section function; it never adds a query.
+
+    @section('Top Products', summary_key='top_products', summary_rows=5)
+    def top_products(views):
+        return views['lines'].groupby(...)...
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from stock_thresholds import DEFAULT_CRITICAL_THRESHOLD, DEFAULT_LOW_THRESHOLD
+
+# Range predicate on created_at (not DATE(...)) so partitioned orders prune
+# to the report day's partition
+FACTS_QUERY = """
+    WITH lines AS (
+        SELECT o.order_id, o.status, o.total_amount::float8 AS total_amount,
+               oi.product_id, oi.quantity, oi.price::float8 AS price
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE o.created_at >= %s AND o.created_at < %s
+    )
+    SELECT l.order_id, l.status, l.total_amount, l.quantity, l.price,
+           COALESCE(i.product_id, l.product_id) AS product_id,
+           i.product_name, i.stock_quantity,
+           f.critical_threshold, f.low_threshold, f.days_until_stockout::float8 AS days_until_stockout
+    FROM lines l
+    FULL JOIN (
+        inventory i LEFT JOIN restock_forecast f ON f.product_id = i.product_id
+    ) ON i.product_id = l.product_id
+"""
+
+Section = namedtuple('Section', 'sheet_name build summary_key summary_rows summary_filter')
+Metric = namedtuple('Metric', 'name build')
+
+SECTIONS = []
+METRICS = []
+
+
+def section(sheet_name, summary_key=None, summary_rows=None, summary_filter=None):
+    """
+    Register a sheet. build(views) returns its DataFrame. With summary_key
+    the sheet (first summary_rows rows, or the rows summary_filter(df)
+    selects) is also put in the JSON summary.
+    """
+    def register(build):
+        SECTIONS.append(Section(sheet_name, build, summary_key, summary_rows, summary_filter))
+        return build
+    return register
+
+
+def metric(name):
+    """Register a JSON summary value; build(views, sheets) returns it"""
+    def register(build):
+        METRICS.append(Metric(name, build))
+        return build
+    return register
+
+
+def extract_facts(conn, start, end):
+    return pd.read_sql_query(FACTS_QUERY, conn, params=(start, end))
+
+
+NUMERIC_COLUMNS = [
+    'total_amount', 'quantity', 'price', 'stock_quantity',
+    'critical_threshold', 'low_threshold', 'days_until_stockout'
+]
+
+
+def build_views(facts):
+    """The frames every section works on, each derived from facts once"""
+    # A column that is all NULL (no orders that day) arrives as object dtype
+    facts = facts.astype({column: 'float64' for column in NUMERIC_COLUMNS})
+    ordered = facts[facts['order_id'].notna()]
+    lines = ordered[ordered['quantity'].notna()].assign(
+        revenue=lambda df: df['quantity'] * df['price']
+    )
+    inventory = facts[facts['stock_quantity'].notna()].drop_duplicates('product_id')
+    return {
+        'orders': ordered.drop_duplicates('order_id')[['order_id', 'status', 'total_amount']],
+        # NULLs from the outer joins made these float; back to integers
+        'lines': lines.astype({'quantity': 'int64'}),
+        'inventory': inventory[[
+            'product_id', 'product_name', 'stock_quantity',
+            'critical_threshold', 'low_threshold', 'days_until_stockout'
+        ]].fillna({
+            # Products the forecast has not covered yet
+            'critical_threshold': DEFAULT_CRITICAL_THRESHOLD,
+            'low_threshold': DEFAULT_LOW_THRESHOLD
+        }).astype({'stock_quantity': 'int64', 'critical_threshold': 'int64', 'low_threshold': 'int64'})
+    }
+
+
+def stock_status(stock_quantity, critical=DEFAULT_CRITICAL_THRESHOLD, low=DEFAULT_LOW_THRESHOLD):
+    """Critical / Low / Normal per row; thresholds may be scalars or arrays"""
+    return np.select(
+        [stock_quantity < critical, stock_quantity < low],
+        ['Critical', 'Low'],
+        default='Normal'
+    )
+
+
+def records(df):
+    """DataFrame -> JSON-ready list of dicts (numpy scalars become Python)"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def run_report(facts):
+    """
+    Compute every registered section and metric.
+    Returns ({sheet_name: DataFrame}, summary dict).
+    """
+    views = build_views(facts)
+    sheets = {}
+    summary = {}
+    for entry in SECTIONS:
+        df = entry.build(views)
+        sheets[entry.sheet_name] = df
+        if entry.summary_key:
+            selected = df[entry.summary_filter(df)] if entry.summary_filter else df
+            if entry.summary_rows is not None:
+                selected = selected.head(entry.summary_rows)
+            summary[entry.summary_key] = records(selected)
+    for entry in METRICS:
+        summary[entry.name] = entry.build(views, sheets)
+    return sheets, summary
@@ -0,0 +1,95 @@
+import os
+import traceback
+from datetime import datetime
+
+import psycopg2
+from instrumentation import Metrics
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+PURGE_BATCH_SIZE = int(os.environ.get("PURGE_BATCH_SIZE", "1000"))
+PURGE_MAX_BATCHES = int(os.environ.get("PURGE_MAX_BATCHES", "50"))
+
+metrics = Metrics("idempotency_purge")
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+def purge_batch(cur, ttl_hours, batch_size):
+    """Delete up to batch_size expired keys; returns the number deleted"""
+    cur.execute("""
+        DELETE FROM idempotency_keys
+        WHERE idempotency_key IN (
+            SELECT idempotency_key FROM idempotency_keys
+            WHERE created_at < NOW() - make_interval(hours => %s)
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        );
+    """, (ttl_hours, batch_size))
+    return cur.rowcount
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Scheduled purge of stored POST /orders responses (idempotency_keys)
+    older than IDEMPOTENCY_TTL_HOURS, in short batches.
+    """
+    print("🧹 IDEMPOTENCY PURGE STARTED")
+
+    event = event or {}
+    ttl_hours = int(event.get("ttl_hours", IDEMPOTENCY_TTL_HOURS))
+    batch_size = int(event.get("batch_size", PURGE_BATCH_SIZE))
+    max_batches = int(event.get("max_batches", PURGE_MAX_BATCHES))
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        purged = 0
+        batches = 0
+        deleted = batch_size
+        while deleted == batch_size and batches < max_batches:
+            deleted = purge_batch(cur, ttl_hours, batch_size)
+            conn.commit()
+            batches += 1
+            purged += deleted
+
+        metrics.count("IdempotencyKeysPurged", purged)
+        print(f"🎉 IDEMPOTENCY PURGE DONE ({purged} keys in {batches} batches)")
+
+        return {
+            "status": "success",
+            "purged": purged,
+            "batches": batches,
+            "has_more": deleted == batch_size,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        conn.rollback()
+        print("🔥 IDEMPOTENCY PURGE FAILED")
+        print(traceback.format_exc())
+        return {
+            "status": "error",
+            "message": f"Idempotency purge failed: {str(e)}"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
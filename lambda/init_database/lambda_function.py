@@ -1,8 +1,11 @@
 import json
 import os
 import psycopg2
+from psycopg2 import sql
 from datetime import datetime
 import traceback
+from instrumentation import Metrics
+from customer_metrics import TRACK_FUNCTION_SQL, reconcile_batch
 
 # ==============================
 # ENV VARIABLES
@@ -12,21 +15,28 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 
+metrics = Metrics("init_database")
+
 
 def get_db_connection():
-    return psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
 
 
+@metrics.handler
 def lambda_handler(event, context):
     print("🚀 INIT DATABASE STARTED")
 
     insert_sample_data = event.get("insert_sample_data", True)
     drop_existing = event.get("drop_existing", False)
+    partition_orders = event.get("partition_orders", False)
+    partition_months_ahead = int(event.get("partition_months_ahead", 3))
 
     conn = get_db_connection()
     cur = conn.cursor()
@@ -38,8 +48,16 @@ def lambda_handler(event, context):
         if drop_existing:
             print("⚠️ Dropping existing tables")
             cur.execute("""
+                DROP TABLE IF EXISTS idempotency_keys CASCADE;
+                DROP TABLE IF EXISTS stock_reservations CASCADE;
+                DROP TABLE IF EXISTS inventory_stock_shards CASCADE;
+                DROP TABLE IF EXISTS workflow_executions CASCADE;
+                DROP TABLE IF EXISTS order_events CASCADE;
+                DROP TABLE IF EXISTS customer_metrics CASCADE;
+                DROP TABLE IF EXISTS restock_forecast CASCADE;
                 DROP TABLE IF EXISTS order_items CASCADE;
                 DROP TABLE IF EXISTS orders CASCADE;
+                DROP TABLE IF EXISTS order_ids CASCADE;
                 DROP TABLE IF EXISTS inventory CASCADE;
                 DROP TABLE IF EXISTS customers CASCADE;
             """)
@@ -74,40 +92,166 @@ def lambda_handler(event, context):
             );
         """)
 
+        if partition_orders:
+            create_partitioned_order_tables(cur)
+        else:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS orders (
+                    order_id VARCHAR(50) PRIMARY KEY,
+                    customer_id VARCHAR(50) NOT NULL,
+                    total_amount DECIMAL(10,2) NOT NULL CHECK (total_amount >= 0),
+                    status VARCHAR(50) DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (customer_id)
+                        REFERENCES customers(customer_id)
+                        ON DELETE CASCADE
+                );
+            """)
+
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS order_items (
+                    id SERIAL PRIMARY KEY,
+                    order_id VARCHAR(50) NOT NULL,
+                    product_id VARCHAR(50) NOT NULL,
+                    quantity INTEGER NOT NULL CHECK (quantity > 0),
+                    price DECIMAL(10,2) NOT NULL CHECK (price >= 0),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (order_id)
+                        REFERENCES orders(order_id)
+                        ON DELETE CASCADE,
+                    FOREIGN KEY (product_id)
+                        REFERENCES inventory(product_id)
+                        ON DELETE CASCADE
+                );
+            """)
+
+        # Stored responses for POST /orders retries (Idempotency-Key header)
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                order_id VARCHAR(50) PRIMARY KEY,
-                customer_id VARCHAR(50) NOT NULL,
-                total_amount DECIMAL(10,2) NOT NULL CHECK (total_amount >= 0),
-                status VARCHAR(50) DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id)
-                    REFERENCES customers(customer_id)
-                    ON DELETE CASCADE
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                idempotency_key VARCHAR(255) PRIMARY KEY,
+                request_hash VARCHAR(64) NOT NULL,
+                status_code INTEGER,
+                response_body JSONB,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP
+            );
+        """)
+
+        # Slow-query samples written by query_profiler (QUERY_SAMPLE_TABLE)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS query_samples (
+                id BIGSERIAL PRIMARY KEY,
+                function_name VARCHAR(100) NOT NULL,
+                query TEXT NOT NULL,
+                duration_ms DOUBLE PRECISION NOT NULL,
+                row_count INTEGER,
+                analyzed BOOLEAN NOT NULL DEFAULT FALSE,
+                plan JSONB,
+                captured_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
             );
         """)
 
+        # Stock held for orders until the workflow confirms or releases it
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS order_items (
-                id SERIAL PRIMARY KEY,
+            CREATE TABLE IF NOT EXISTS stock_reservations (
+                reservation_id BIGSERIAL PRIMARY KEY,
                 order_id VARCHAR(50) NOT NULL,
-                product_id VARCHAR(50) NOT NULL,
+                product_id VARCHAR(50) NOT NULL
+                    REFERENCES inventory(product_id) ON DELETE CASCADE,
                 quantity INTEGER NOT NULL CHECK (quantity > 0),
-                price DECIMAL(10,2) NOT NULL CHECK (price >= 0),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id)
-                    REFERENCES orders(order_id)
-                    ON DELETE CASCADE,
-                FOREIGN KEY (product_id)
-                    REFERENCES inventory(product_id)
-                    ON DELETE CASCADE
+                status VARCHAR(20) NOT NULL DEFAULT 'reserved'
+                    CHECK (status IN ('reserved', 'confirmed', 'released', 'expired')),
+                expires_at TIMESTAMP NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+        # Orderable stock of hot products, split so orders don't share one row lock
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS inventory_stock_shards (
+                product_id VARCHAR(50) NOT NULL
+                    REFERENCES inventory(product_id) ON DELETE CASCADE,
+                shard_id INTEGER NOT NULL,
+                stock_quantity INTEGER NOT NULL DEFAULT 0 CHECK (stock_quantity >= 0),
+                PRIMARY KEY (product_id, shard_id)
+            );
+        """)
+
+        # Step Functions execution per order, kept current by execution_sync
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS workflow_executions (
+                order_id VARCHAR(50) PRIMARY KEY,
+                execution_arn VARCHAR(2048) NOT NULL,
+                execution_name VARCHAR(80) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                start_date TIMESTAMP NOT NULL,
+                stop_date TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+        # Append-only history written by the workflow Lambdas (order_events.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS order_events (
+                event_id BIGSERIAL PRIMARY KEY,
+                order_id VARCHAR(50) NOT NULL,
+                event_type VARCHAR(50) NOT NULL,
+                source VARCHAR(50) NOT NULL,
+                status VARCHAR(50),
+                payment_status VARCHAR(50),
+                transaction_id VARCHAR(100),
+                notification_status VARCHAR(100),
+                detail JSONB,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+        # Lifetime metrics per customer, maintained by a trigger on orders
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS customer_metrics (
+                customer_id VARCHAR(50) PRIMARY KEY
+                    REFERENCES customers(customer_id) ON DELETE CASCADE,
+                order_count INTEGER NOT NULL DEFAULT 0,
+                lifetime_value DECIMAL(12,2) NOT NULL DEFAULT 0,
+                first_order_at TIMESTAMP,
+                last_order_at TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                reconciled_at TIMESTAMP,
+                archived_order_count INTEGER NOT NULL DEFAULT 0,
+                archived_lifetime_value DECIMAL(12,2) NOT NULL DEFAULT 0,
+                archived_first_order_at TIMESTAMP,
+                archived_last_order_at TIMESTAMP
+            );
+        """)
+
+        # Per-product sales velocity and stock thresholds (restock_forecast Lambda)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS restock_forecast (
+                product_id VARCHAR(50) PRIMARY KEY
+                    REFERENCES inventory(product_id) ON DELETE CASCADE,
+                window_days INTEGER NOT NULL,
+                units_sold INTEGER NOT NULL DEFAULT 0,
+                daily_velocity DECIMAL(12,3) NOT NULL DEFAULT 0,
+                stock_quantity INTEGER NOT NULL,
+                days_until_stockout DECIMAL(10,1),
+                critical_threshold INTEGER NOT NULL,
+                low_threshold INTEGER NOT NULL,
+                computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
             );
         """)
 
         conn.commit()
         print("✅ Base tables ready")
 
+        orders_partitioned = is_partitioned(cur, "orders")
+        if partition_orders and not orders_partitioned:
+            print("⚠️ orders already exists as a plain table; "
+                  "run with drop_existing to recreate it partitioned")
+        if orders_partitioned:
+            setup_order_partitions(cur, conn, partition_months_ahead)
+
         # =====================================================
         # SAFE ALTER (ENSURE COLUMNS EXIST)
         # =====================================================
@@ -200,6 +344,24 @@ def lambda_handler(event, context):
             END $;
             """,
 
+            # inventory.search_vector (full-text search for GET /products?q=)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='inventory'
+                    AND column_name='search_vector'
+                ) THEN
+                    ALTER TABLE inventory ADD COLUMN search_vector tsvector
+                    GENERATED ALWAYS AS (
+                        to_tsvector('simple',
+                            COALESCE(product_name, '') || ' ' || COALESCE(description, ''))
+                    ) STORED;
+                END IF;
+            END $$;
+            """,
+
             # orders.updated_at
             """
             DO $$
@@ -241,12 +403,128 @@ def lambda_handler(event, context):
                     ALTER TABLE orders ADD COLUMN transaction_id VARCHAR(100);
                 END IF;
             END $$;
+            """,
+
+            # order_items.order_created_at
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='order_items'
+                    AND column_name='order_created_at'
+                ) THEN
+                    ALTER TABLE order_items ADD COLUMN order_created_at TIMESTAMP;
+                END IF;
+            END $$;
+            """,
+
+            # inventory.reserved_quantity (stock held by stock_reservations)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='inventory'
+                    AND column_name='reserved_quantity'
+                ) THEN
+                    ALTER TABLE inventory ADD COLUMN reserved_quantity INTEGER NOT NULL DEFAULT 0
+                    CHECK (reserved_quantity >= 0);
+                END IF;
+            END $$;
+            """,
+
+            # inventory.stock_shards (> 0 = hot product, stock in inventory_stock_shards)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='inventory'
+                    AND column_name='stock_shards'
+                ) THEN
+                    ALTER TABLE inventory ADD COLUMN stock_shards INTEGER NOT NULL DEFAULT 0;
+                END IF;
+            END $$;
+            """,
+
+            # stock_reservations.shard_id (shard a hot product's reservation came from)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='stock_reservations'
+                    AND column_name='shard_id'
+                ) THEN
+                    ALTER TABLE stock_reservations ADD COLUMN shard_id INTEGER;
+                END IF;
+            END $$;
+            """,
+
+            # orders.notification_status (latest send_notification result)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='orders'
+                    AND column_name='notification_status'
+                ) THEN
+                    ALTER TABLE orders ADD COLUMN notification_status VARCHAR(100);
+                END IF;
+            END $$;
+            """,
+
+            # orders.last_event / last_event_at (latest order_events entry)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='orders'
+                    AND column_name='last_event'
+                ) THEN
+                    ALTER TABLE orders ADD COLUMN last_event VARCHAR(50);
+                END IF;
+            END $$;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='orders'
+                    AND column_name='last_event_at'
+                ) THEN
+                    ALTER TABLE orders ADD COLUMN last_event_at TIMESTAMP;
+                END IF;
+            END $$;
+            """,
+
+            # customer_metrics.archived_* (orders of retired partitions)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name='customer_metrics'
+                    AND column_name='archived_order_count'
+                ) THEN
+                    ALTER TABLE customer_metrics
+                    ADD COLUMN archived_order_count INTEGER NOT NULL DEFAULT 0,
+                    ADD COLUMN archived_lifetime_value DECIMAL(12,2) NOT NULL DEFAULT 0,
+                    ADD COLUMN archived_first_order_at TIMESTAMP,
+                    ADD COLUMN archived_last_order_at TIMESTAMP;
+                END IF;
+            END $$;
             """
         ]
 
-        for idx, sql in enumerate(safe_alters):
+        for idx, statement in enumerate(safe_alters):
             try:
-                cur.execute(sql)
+                cur.execute(statement)
                 conn.commit()
                 print(f"✅ Column check/add completed ({idx + 1}/{len(safe_alters)})")
             except Exception as e:
@@ -259,6 +537,39 @@ def lambda_handler(event, context):
         print("⚡ Creating indexes")
 
         safe_indexes = [
+            # pg_trgm backs the customer typeahead search
+            """
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='customers'
+                    AND indexname='idx_customers_name_trgm'
+                ) THEN
+                    CREATE INDEX idx_customers_name_trgm
+                    ON customers USING GIN (customer_name gin_trgm_ops);
+                END IF;
+            END $$;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='customers'
+                    AND indexname='idx_customers_email_trgm'
+                ) THEN
+                    CREATE INDEX idx_customers_email_trgm
+                    ON customers USING GIN (email gin_trgm_ops);
+                END IF;
+            END $$;
+            """,
+
             """
             DO $$
             BEGIN
@@ -287,6 +598,35 @@ def lambda_handler(event, context):
             END $$;
             """,
 
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='inventory'
+                    AND indexname='idx_inventory_search'
+                ) THEN
+                    CREATE INDEX idx_inventory_search
+                    ON inventory USING GIN (search_vector);
+                END IF;
+            END $$;
+            """,
+
+            # keyset pagination order for GET /products
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='inventory'
+                    AND indexname='idx_inventory_name'
+                ) THEN
+                    CREATE INDEX idx_inventory_name
+                    ON inventory(product_name, product_id);
+                END IF;
+            END $$;
+            """,
+
             """
             DO $$
             BEGIN
@@ -299,18 +639,210 @@ def lambda_handler(event, context):
                     ON customers(email);
                 END IF;
             END $$;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='idempotency_keys'
+                    AND indexname='idx_idempotency_keys_created_at'
+                ) THEN
+                    CREATE INDEX idx_idempotency_keys_created_at
+                    ON idempotency_keys(created_at);
+                END IF;
+            END $$;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='orders'
+                    AND indexname='idx_orders_created_at'
+                ) THEN
+                    CREATE INDEX idx_orders_created_at
+                    ON orders(created_at);
+                END IF;
+            END $$;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='order_items'
+                    AND indexname='idx_order_items_order_id'
+                ) THEN
+                    CREATE INDEX idx_order_items_order_id
+                    ON order_items(order_id);
+                END IF;
+            END $$;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='stock_reservations'
+                    AND indexname='idx_stock_reservations_order_id'
+                ) THEN
+                    CREATE INDEX idx_stock_reservations_order_id
+                    ON stock_reservations(order_id);
+                END IF;
+            END $$;
+            """,
+
+            # Only active reservations are scanned by reservation_reaper
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='stock_reservations'
+                    AND indexname='idx_stock_reservations_expires_at'
+                ) THEN
+                    CREATE INDEX idx_stock_reservations_expires_at
+                    ON stock_reservations(expires_at)
+                    WHERE status = 'reserved';
+                END IF;
+            END $$;
+            """,
+
+            # Active reservations per product (stock_rebalancer totals)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='stock_reservations'
+                    AND indexname='idx_stock_reservations_product_active'
+                ) THEN
+                    CREATE INDEX idx_stock_reservations_product_active
+                    ON stock_reservations(product_id)
+                    WHERE status = 'reserved';
+                END IF;
+            END $$;
+            """,
+
+            # GET /executions: newest first, optionally filtered by status
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='workflow_executions'
+                    AND indexname='idx_workflow_executions_start'
+                ) THEN
+                    CREATE INDEX idx_workflow_executions_start
+                    ON workflow_executions(start_date DESC, order_id DESC);
+                END IF;
+            END $$;
+            """,
+
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='workflow_executions'
+                    AND indexname='idx_workflow_executions_status_start'
+                ) THEN
+                    CREATE INDEX idx_workflow_executions_status_start
+                    ON workflow_executions(status, start_date DESC, order_id DESC);
+                END IF;
+            END $$;
+            """,
+
+            # Order history in event order (GET /orders/{id}/events)
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes
+                    WHERE tablename='order_events'
+                    AND indexname='idx_order_events_order_id'
+                ) THEN
+                    CREATE INDEX idx_order_events_order_id
+                    ON order_events(order_id, event_id);
+                END IF;
+            END $$;
             """
         ]
 
-        for idx, sql in enumerate(safe_indexes):
+        for idx, statement in enumerate(safe_indexes):
             try:
-                cur.execute(sql)
+                cur.execute(statement)
                 conn.commit()
                 print(f"✅ Index check/creation completed ({idx + 1}/{len(safe_indexes)})")
             except Exception as e:
                 conn.rollback()
                 print(f"⚠️ INDEX skipped ({idx + 1}): {e}")
 
+        # =====================================================
+        # STATUS CHANGE NOTIFICATIONS (GET /status/{id}/wait)
+        # =====================================================
+        print("📣 Installing status change triggers")
+
+        try:
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION notify_order_status() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM NEW.status THEN
+                        PERFORM pg_notify('order_status', NEW.order_id);
+                    END IF;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            cur.execute("""
+                DROP TRIGGER IF EXISTS orders_status_notify ON orders;
+                CREATE TRIGGER orders_status_notify
+                AFTER UPDATE OF status ON orders
+                FOR EACH ROW EXECUTE FUNCTION notify_order_status();
+            """)
+            cur.execute("""
+                DROP TRIGGER IF EXISTS workflow_executions_status_notify ON workflow_executions;
+                CREATE TRIGGER workflow_executions_status_notify
+                AFTER INSERT OR UPDATE OF status ON workflow_executions
+                FOR EACH ROW EXECUTE FUNCTION notify_order_status();
+            """)
+            conn.commit()
+            print("✅ Status change triggers ready")
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ TRIGGER skipped: {e}")
+
+        # =====================================================
+        # CUSTOMER METRICS (GET /customers/{id}/summary)
+        # =====================================================
+        print("👤 Installing customer metrics trigger")
+
+        try:
+            cur.execute(TRACK_FUNCTION_SQL)
+            cur.execute("""
+                DROP TRIGGER IF EXISTS customer_metrics_track ON orders;
+                CREATE TRIGGER customer_metrics_track
+                AFTER INSERT OR DELETE OR UPDATE OF status, total_amount ON orders
+                FOR EACH ROW EXECUTE FUNCTION track_customer_metrics();
+            """)
+            conn.commit()
+
+            # Backfill customers that had orders before the trigger existed
+            after, corrected = "", 0
+            while after is not None:
+                after, count = reconcile_batch(cur, after, 1000)
+                conn.commit()
+                corrected += count
+            print(f"✅ Customer metrics ready ({corrected} customers backfilled)")
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ CUSTOMER METRICS skipped: {e}")
+
         # =====================================================
         # SAMPLE DATA
         # =====================================================
@@ -337,6 +869,7 @@ def lambda_handler(event, context):
                 "message": "Database initialized successfully",
                 "sample_data": insert_sample_data,
                 "dropped_existing": drop_existing,
+                "orders_partitioned": orders_partitioned,
                 "timestamp": datetime.utcnow().isoformat()
             })
         }
@@ -429,26 +962,210 @@ def insert_samples(cur, conn):
         """)
 
     # Sample orders
+    # NOT EXISTS instead of ON CONFLICT: partitioned orders only has a
+    # (order_id, created_at) key, so a rerun would otherwise duplicate rows
     cur.execute("""
         INSERT INTO orders (
             order_id, customer_id, total_amount, status, payment_status, transaction_id
         )
-        VALUES 
-            ('ORD001', 'CUST001', 1225.99, 'completed', 'success', 'TXN-001'),
-            ('ORD002', 'CUST002', 115.98, 'pending', 'pending', 'TXN-002')
-        ON CONFLICT (order_id) DO NOTHING;
+        SELECT v.* FROM (
+            VALUES 
+                ('ORD001', 'CUST001', 1225.99, 'completed', 'success', 'TXN-001'),
+                ('ORD002', 'CUST002', 115.98, 'pending', 'pending', 'TXN-002')
+        ) AS v(order_id, customer_id, total_amount, status, payment_status, transaction_id)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM orders o WHERE o.order_id = v.order_id
+        );
     """)
 
     # Sample order items
     cur.execute("""
-        INSERT INTO order_items (order_id, product_id, quantity, price)
-        VALUES 
-            ('ORD001', 'PROD001', 1, 1200.00),
-            ('ORD001', 'PROD002', 1, 25.99),
-            ('ORD002', 'PROD003', 1, 89.99),
-            ('ORD002', 'PROD002', 1, 25.99)
-        ON CONFLICT DO NOTHING;
+        INSERT INTO order_items (order_id, order_created_at, product_id, quantity, price)
+        SELECT o.order_id, o.created_at, v.product_id, v.quantity, v.price
+        FROM (
+            VALUES 
+                ('ORD001', 'PROD001', 1, 1200.00),
+                ('ORD001', 'PROD002', 1, 25.99),
+                ('ORD002', 'PROD003', 1, 89.99),
+                ('ORD002', 'PROD002', 1, 25.99)
+        ) AS v(order_id, product_id, quantity, price)
+        JOIN orders o ON o.order_id = v.order_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM order_items oi WHERE oi.order_id = v.order_id
+        );
+    """)
+
+    conn.commit()
+    print("✅ Sample data inserted successfully")
+
+
+# =====================================================
+# PARTITIONING
+# =====================================================
+def is_partitioned(cur, table_name):
+    """Return True if table_name is a declaratively partitioned table"""
+    cur.execute("""
+        SELECT relkind FROM pg_class
+        WHERE relname = %s AND relnamespace = 'public'::regnamespace;
+    """, (table_name,))
+    row = cur.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def create_partitioned_order_tables(cur):
+    """
+    Create orders and order_items as monthly range-partitioned tables.
+
+    Partition keys must be part of every unique constraint, so orders is
+    keyed on (order_id, created_at) and order_items carries the parent's
+    created_at as order_created_at. That keeps ON DELETE CASCADE working
+    and lets matching months of both tables be retired together. order_id
+    on its own is kept unique by the order_ids table (setup_order_partitions).
+    """
+    print("🧩 Creating partitioned order tables")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id VARCHAR(50) NOT NULL,
+            customer_id VARCHAR(50) NOT NULL,
+            total_amount DECIMAL(10,2) NOT NULL CHECK (total_amount >= 0),
+            status VARCHAR(50) DEFAULT 'pending',
+            payment_status VARCHAR(50),
+            transaction_id VARCHAR(100),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (order_id, created_at),
+            FOREIGN KEY (customer_id)
+                REFERENCES customers(customer_id)
+                ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at);
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS order_items (
+            id SERIAL,
+            order_id VARCHAR(50) NOT NULL,
+            order_created_at TIMESTAMP NOT NULL,
+            product_id VARCHAR(50) NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            price DECIMAL(10,2) NOT NULL CHECK (price >= 0),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, order_created_at),
+            FOREIGN KEY (order_id, order_created_at)
+                REFERENCES orders(order_id, created_at)
+                ON DELETE CASCADE,
+            FOREIGN KEY (product_id)
+                REFERENCES inventory(product_id)
+                ON DELETE CASCADE
+        ) PARTITION BY RANGE (order_created_at);
+    """)
+
+
+def setup_order_ids(cur):
+    """
+    Keep order_id globally unique on partitioned orders. The primary key
+    has to include created_at, so every order also claims its order_id in
+    order_ids; a second order with the same id fails on that key. IDs of
+    retired (archived or detached) months stay claimed.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS order_ids (
+            order_id VARCHAR(50) PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL
+        );
+
+        CREATE OR REPLACE FUNCTION claim_order_id() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO order_ids (order_id, created_at)
+                VALUES (NEW.order_id, NEW.created_at);
+            ELSE
+                DELETE FROM order_ids WHERE order_id = OLD.order_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS orders_claim_order_id ON orders;
+        CREATE TRIGGER orders_claim_order_id
+        AFTER INSERT OR DELETE ON orders
+        FOR EACH ROW EXECUTE FUNCTION claim_order_id();
     """)
 
+    # Orders written before the trigger existed
+    cur.execute("""
+        INSERT INTO order_ids (order_id, created_at)
+        SELECT order_id, MIN(created_at) FROM orders GROUP BY order_id
+        ON CONFLICT (order_id) DO NOTHING;
+    """)
+
+
+def setup_order_partitions(cur, conn, months_ahead):
+    """
+    Install create_order_partitions() and create the current and next
+    months_ahead monthly partitions.
+
+    partition_maintenance calls the same SQL function on a schedule, so
+    the naming scheme (orders_pYYYYMM / order_items_pYYYYMM) lives in one place.
+
+    There is no default partition: once it holds a row of a future month,
+    Postgres refuses to create that month's partition. An order outside
+    the pre-created window fails instead, so keep partition_maintenance
+    running with months_ahead >= 1.
+    """
+    print("🗓 Creating order partitions")
+    setup_order_ids(cur)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION create_order_partitions(months_ahead INTEGER)
+        RETURNS INTEGER AS $$
+        DECLARE
+            month_start DATE;
+            month_end DATE;
+            suffix TEXT;
+            created INTEGER := 0;
+        BEGIN
+            FOR i IN 0..months_ahead LOOP
+                month_start := (date_trunc('month', CURRENT_DATE)
+                                + make_interval(months => i))::DATE;
+                month_end := (month_start + INTERVAL '1 month')::DATE;
+                suffix := to_char(month_start, 'YYYYMM');
+
+                IF to_regclass('orders_p' || suffix) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+                        'orders_p' || suffix, month_start, month_end
+                    );
+                    created := created + 1;
+                END IF;
+
+                IF to_regclass('order_items_p' || suffix) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF order_items FOR VALUES FROM (%L) TO (%L)',
+                        'order_items_p' || suffix, month_start, month_end
+                    );
+                    created := created + 1;
+                END IF;
+            END LOOP;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cur.execute("SELECT create_order_partitions(%s);", (months_ahead,))
+    created = cur.fetchone()[0]
+
+    # Databases set up with a default partition: drop it while it is empty
+    for default_table in ("order_items_default", "orders_default"):
+        cur.execute("SELECT to_regclass(%s);", (default_table,))
+        if cur.fetchone()[0] is None:
+            continue
+        cur.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {})").format(sql.Identifier(default_table)))
+        if cur.fetchone()[0]:
+            print(f"⚠️ {default_table} holds rows; move them to monthly partitions and drop it")
+        else:
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(default_table)))
+            print(f"🗑 Dropped empty {default_table}")
+
     conn.commit()
-    print("✅ Sample data inserted successfully")
\ No newline at end of file
+    print(f"✅ Order partitions ready ({created} created)")
@@ -0,0 +1,105 @@
+import importlib
+import importlib.util
+import json
+import os
+from instrumentation import Metrics
+from workflow_payload import parse_payload
+
+# Environment variables
+FAST_PATH_MAX_ITEMS = int(os.environ.get('FAST_PATH_MAX_ITEMS', '10'))
+
+# Step handlers run in this process. Packaged next to this file as
+# <step>.py (see README.md); for local runs they are read from lambda/<step>/.
+STEPS = ('process_payment', 'update_inventory', 'send_notification')
+
+metrics = Metrics('order_fast_path')
+
+def load_step(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', name, 'lambda_function.py')
+        spec = importlib.util.spec_from_file_location(f'{name}_step', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+process_payment, update_inventory, send_notification = (load_step(name) for name in STEPS)
+
+def run_step(name, handler, event, context):
+    """Call a step handler in-process; it still emits its own metrics line"""
+    with metrics.timer(f'Step{name}'):
+        return handler.lambda_handler(event, context)
+
+def notify(context, payload, notification_type, **fields):
+    return run_step('SendNotification', send_notification, dict(
+        fields,
+        notification_type=notification_type,
+        order_id=payload['order_id'],
+        amount=payload['total_amount']
+    ), context)
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Order workflow fast path: payment, inventory and notification in one
+    invocation, with the same results and compensation as the per-step
+    states. Returns fastPath=skipped for orders the state machine should
+    send down the per-step path.
+    """
+    print("=== ORDER FAST PATH START ===")
+    print(f"Event received: {json.dumps(event, indent=2)}")
+
+    try:
+        payload = parse_payload(event)
+    except ValueError as e:
+        return {
+            'fastPath': 'failed',
+            'workflowStatus': 'failed',
+            'message': str(e)
+        }
+
+    order_id = payload['order_id']
+    if payload['items'] is None or len(payload['items']) > FAST_PATH_MAX_ITEMS:
+        print(f"Order {order_id} not eligible for the fast path")
+        return {
+            'fastPath': 'skipped',
+            'orderId': order_id,
+            'message': f'Fast path takes orders with 1 to {FAST_PATH_MAX_ITEMS} items'
+        }
+
+    result = {'fastPath': 'completed', 'orderId': order_id}
+
+    # 1. Payment
+    payment = run_step('ProcessPayment', process_payment, event, context)
+    result['payment'] = payment
+
+    if payment.get('paymentStatus') != 'success':
+        # Compensation: give the reserved stock back, tell the customer
+        result['inventory'] = run_step('UpdateInventory', update_inventory, dict(event, action='release'), context)
+        result['notification'] = notify(
+            context, payload, 'payment_failed', error_message=payment.get('message', '-')
+        )
+        result['workflowStatus'] = 'payment_failed'
+        return result
+
+    # 2. Inventory
+    inventory = run_step('UpdateInventory', update_inventory, dict(
+        event, transaction_id=payment.get('transaction_id')
+    ), context)
+    result['inventory'] = inventory
+
+    # 3. Notification
+    if inventory.get('inventoryStatus') != 'success':
+        result['notification'] = notify(
+            context, payload, 'system_error', error_message=inventory.get('message', '-')
+        )
+        result['workflowStatus'] = 'inventory_failed'
+    else:
+        result['notification'] = notify(
+            context, payload, 'order_confirmation', transaction_id=payment.get('transaction_id')
+        )
+        result['workflowStatus'] = 'completed'
+
+    print(f"=== ORDER FAST PATH END: {result['workflowStatus']} ===")
+    return result
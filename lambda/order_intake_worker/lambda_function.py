@@ -0,0 +1,284 @@
+import json
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import psycopg2
+from psycopg2.extras import execute_values
+from instrumentation import Metrics
+from order_events import order_event, write_order_events
+from order_intake import parse_intake_message
+from stock_reservations import reserve_stock
+from workflow_executions import execution_row, upsert_executions
+from workflow_payload import build_payload, workflow_item
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+S3_BUCKET = os.environ.get("S3_BUCKET")
+STATE_MACHINE_ARN = os.environ.get("STATE_MACHINE_ARN")
+STOCK_RESERVATION_ENABLED = os.environ.get("STOCK_RESERVATION_ENABLED", "true").lower() == "true"
+RESERVATION_TTL_MINUTES = int(os.environ.get("RESERVATION_TTL_MINUTES", "15"))
+# StartExecution calls in flight per batch
+WORKFLOW_START_CONCURRENCY = int(os.environ.get("WORKFLOW_START_CONCURRENCY", "4"))
+
+metrics = Metrics("order_intake_worker")
+s3_client = metrics.instrument_client(boto3.client("s3"))
+sfn_client = metrics.instrument_client(boto3.client("stepfunctions"))
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+def written_payloads(cur, order_ids):
+    """Workflow payloads of orders an earlier delivery already wrote"""
+    cur.execute("""
+        SELECT o.order_id, o.customer_id, o.total_amount, o.created_at,
+               oi.product_id, i.product_name, oi.quantity, oi.price
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.order_id
+        JOIN inventory i ON i.product_id = oi.product_id
+        WHERE o.order_id = ANY(%s)
+        ORDER BY o.order_id, oi.id
+    """, (list(order_ids),))
+    orders = {}
+    for order_id, customer_id, total_amount, created_at, product_id, name, quantity, price in cur.fetchall():
+        order = orders.setdefault(order_id, (customer_id, total_amount, created_at, []))
+        order[3].append(workflow_item(product_id, name, quantity, price))
+    return {
+        order_id: build_payload(order_id, customer_id, total_amount, items, created_at)
+        for order_id, (customer_id, total_amount, created_at, items) in orders.items()
+    }
+
+
+def write_orders(cur, orders):
+    """
+    Write the batch on the caller's transaction: reserve stock, insert all
+    new orders and their items with one statement each, and record
+    rejected orders in order_events.
+    Returns ([(message_id, workflow payload)] to start, rejected count).
+    """
+    order_ids = [order["order_id"] for _, order in orders]
+
+    # Redelivered messages: written already, only the workflow may be missing
+    cur.execute("""
+        SELECT o.order_id, e.order_id IS NOT NULL
+        FROM orders o
+        LEFT JOIN workflow_executions e ON e.order_id = o.order_id
+        WHERE o.order_id = ANY(%s)
+    """, (order_ids,))
+    written = dict(cur.fetchall())
+    unstarted = {order_id for order_id, started in written.items() if not started}
+
+    existing = written_payloads(cur, unstarted) if unstarted else {}
+    to_start = [
+        (message_id, existing[order["order_id"]])
+        for message_id, order in orders
+        if order["order_id"] in existing
+    ]
+
+    new_orders = {}
+    for message_id, order in orders:
+        if order["order_id"] not in written:
+            new_orders.setdefault(order["order_id"], (message_id, order))
+    if not new_orders:
+        return to_start, 0
+
+    product_ids = sorted({item["productId"] for _, order in new_orders.values() for item in order["items"]})
+    cur.execute("""
+        SELECT product_id, product_name, price, stock_shards
+        FROM inventory
+        WHERE product_id = ANY(%s)
+    """, (product_ids,))
+    products = {row[0]: row[1:] for row in cur.fetchall()}
+    cur.execute("SELECT customer_id FROM customers WHERE customer_id = ANY(%s)",
+                (list({order["customer_id"] for _, order in new_orders.values()}),))
+    customers = {row[0] for row in cur.fetchall()}
+
+    if STOCK_RESERVATION_ENABLED:
+        # Lock every regular product of the batch up front, in product_id
+        # order, so two batches cannot deadlock on each other's orders
+        cur.execute("""
+            SELECT product_id FROM inventory
+            WHERE product_id = ANY(%s) AND stock_shards = 0
+            ORDER BY product_id
+            FOR UPDATE
+        """, ([p for p in product_ids if p in products and not products[p][2]],))
+
+    order_rows = []
+    item_rows = []
+    rejected = []
+    for message_id, order in new_orders.values():
+        order_id = order["order_id"]
+        missing = sorted({item["productId"] for item in order["items"]} - set(products))
+        if order["customer_id"] not in customers or missing:
+            rejected.append(order_event(order_id, "intake_rejected", "order_intake_worker", detail={
+                "message": f"Products not found: {', '.join(missing)}" if missing
+                else f"Customer {order['customer_id']} not found"
+            }))
+            continue
+
+        if STOCK_RESERVATION_ENABLED:
+            # One order's shortage must not undo the rest of the batch
+            cur.execute("SAVEPOINT intake_order")
+            shortages = reserve_stock(
+                cur, order_id,
+                [(item["productId"], item["quantity"]) for item in order["items"]],
+                RESERVATION_TTL_MINUTES
+            )
+            if shortages:
+                cur.execute("ROLLBACK TO SAVEPOINT intake_order")
+                rejected.append(order_event(order_id, "intake_rejected", "order_intake_worker", detail={
+                    "message": "Insufficient stock",
+                    "shortages": shortages
+                }))
+                continue
+            cur.execute("RELEASE SAVEPOINT intake_order")
+
+        items = [
+            workflow_item(item["productId"], products[item["productId"]][0], item["quantity"], products[item["productId"]][1])
+            for item in order["items"]
+        ]
+        total_amount = sum(products[item["productId"]][1] * item["quantity"] for item in order["items"])
+        created_at = order["accepted_at"]
+        order_rows.append((order_id, order["customer_id"], total_amount, "pending", created_at))
+        item_rows.extend(
+            (order_id, created_at, item["productId"], item["quantity"], products[item["productId"]][1])
+            for item in order["items"]
+        )
+        to_start.append((message_id, build_payload(order_id, order["customer_id"], total_amount, items, created_at)))
+
+    if order_rows:
+        execute_values(cur, """
+            INSERT INTO orders (order_id, customer_id, total_amount, status, created_at)
+            VALUES %s
+        """, order_rows, page_size=len(order_rows))
+        execute_values(cur, """
+            INSERT INTO order_items (order_id, order_created_at, product_id, quantity, price)
+            VALUES %s
+        """, item_rows, page_size=len(item_rows))
+    write_order_events(cur, rejected)
+
+    return to_start, len(rejected)
+
+
+def start_workflow(payload):
+    """S3 backup and StartExecution for one order; None when already started"""
+    order_id = payload["orderId"]
+    s3_client.put_object(
+        Bucket=S3_BUCKET,
+        Key=f"orders/{order_id}.json",
+        Body=json.dumps({
+            "order_id": order_id,
+            "customer_id": payload["customerId"],
+            "items": payload["items"],
+            "total_amount": payload["totalAmount"],
+            "created_at": payload["timestamp"]
+        })
+    )
+    execution_name = f"order-{order_id}"
+    try:
+        started = sfn_client.start_execution(
+            stateMachineArn=STATE_MACHINE_ARN,
+            name=execution_name,
+            input=json.dumps(payload)
+        )
+    except sfn_client.exceptions.ExecutionAlreadyExists:
+        return None
+    return execution_row({
+        "executionArn": started["executionArn"],
+        "name": execution_name,
+        "status": "RUNNING",
+        "startDate": started["startDate"]
+    })
+
+
+def start_workflows(to_start):
+    """
+    Start the workflows with at most WORKFLOW_START_CONCURRENCY calls in
+    flight. Returns (execution rows, message ids that failed to start).
+    """
+    rows = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, WORKFLOW_START_CONCURRENCY)) as pool:
+        futures = [(message_id, pool.submit(start_workflow, payload)) for message_id, payload in to_start]
+        for message_id, future in futures:
+            try:
+                row = future.result()
+                if row is not None:
+                    rows.append(row)
+            except Exception as e:
+                print(f"❌ Could not start workflow for message {message_id}: {str(e)}")
+                failed.append(message_id)
+    return rows, failed
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    SQS consumer for queued order intake (order_intake.py). Each batch is
+    written in one transaction, then the workflows are started. Messages
+    that could not be written or started are returned in
+    batchItemFailures so SQS delivers only those again.
+    """
+    records = event.get("Records", [])
+    print(f"📥 ORDER INTAKE BATCH ({len(records)} messages)")
+
+    orders = []
+    failed = []
+    for record in records:
+        try:
+            orders.append((record["messageId"], parse_intake_message(record["body"])))
+        except (KeyError, TypeError, ValueError) as e:
+            # Retried until maxReceiveCount, then kept in the dead-letter queue
+            print(f"❌ Malformed message {record.get('messageId')}: {str(e)}")
+            failed.append(record.get("messageId"))
+    metrics.count("IntakeMessages", len(records))
+
+    if orders:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            try:
+                to_start, rejected = write_orders(cur, orders)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print("🔥 ORDER INTAKE BATCH FAILED")
+                print(traceback.format_exc())
+                failed.extend(message_id for message_id, _ in orders)
+                to_start, rejected = [], 0
+
+            rows, start_failures = start_workflows(to_start)
+            failed.extend(start_failures)
+
+            # Index the executions for GET /executions; execution_sync repairs misses
+            try:
+                upsert_executions(cur, rows)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Error indexing executions: {str(e)}")
+        finally:
+            cur.close()
+            conn.close()
+
+        metrics.count("OrdersRejected", rejected)
+        metrics.count("WorkflowsStarted", len(rows))
+
+    metrics.count("BatchItemFailures", len(failed))
+    print(f"🎉 ORDER INTAKE BATCH DONE ({len(records) - len(failed)} ok, {len(failed)} failed)")
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]}
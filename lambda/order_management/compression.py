@@ -0,0 +1,102 @@
+"""
+Content-Encoding negotiation for API Gateway proxy responses.
+
+Bodies at or above COMPRESSION_MIN_BYTES are compressed with Brotli (when
+the brotli package is installed) or gzip, whichever the client accepts,
+and returned base64-encoded with isBase64Encoded. The API's binary media
+types must include */* so API Gateway sends the bytes through; it then also
+delivers request bodies base64-encoded, which decode_request_body undoes.
+"""
+import base64
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+
+def decode_request_body(event):
+    """Event with a base64-encoded (binary media type) body decoded to text"""
+    if not event.get('isBase64Encoded') or not isinstance(event.get('body'), str):
+        return event
+    return dict(
+        event,
+        body=base64.b64decode(event['body']).decode('utf-8'),
+        isBase64Encoded=False
+    )
+
+
+def accepted_encodings(event):
+    """Parse Accept-Encoding into {encoding: q}, ignoring q=0 entries"""
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'accept-encoding'), '') or ''
+    encodings = {}
+    for part in value.split(','):
+        token, _, params = part.strip().partition(';')
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            encodings[token.strip().lower()] = q
+    return encodings
+
+
+def choose_encoding(encodings):
+    candidates = []
+    if brotli is not None:
+        candidates.append('br')
+    candidates.append('gzip')
+    best = None
+    for encoding in candidates:
+        q = encodings.get(encoding, encodings.get('*', 0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(event, result):
+    """Compress a proxy response in place when it is large enough and accepted"""
+    if not COMPRESSION_ENABLED or not isinstance(result, dict):
+        return result
+    body = result.get('body')
+    if not isinstance(body, str) or result.get('isBase64Encoded'):
+        return result
+
+    data = body.encode('utf-8')
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return result
+
+    encoding = choose_encoding(accepted_encodings(event))
+    if encoding is None:
+        return result
+
+    compressed = compress(data, encoding)
+    if len(compressed) >= len(data):
+        return result
+
+    headers = dict(result.get('headers') or {})
+    headers['Content-Encoding'] = encoding
+    headers['Vary'] = 'Accept-Encoding'
+    result['headers'] = headers
+    result['body'] = base64.b64encode(compressed).decode('ascii')
+    result['isBase64Encoded'] = True
+    return result
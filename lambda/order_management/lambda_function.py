@@ -1,9 +1,23 @@
+import base64
+import hashlib
 import json
 import os
+import select
+import time
 import boto3
 import psycopg2
-from datetime import datetime
+from botocore.config import Config
+from collections import OrderedDict
+from datetime import datetime, timedelta
 import uuid
+from instrumentation import Metrics
+from query_profiler import QueryProfiler
+from serialization import dumps, rows_payload
+from compression import compress_response, decode_request_body
+from stock_reservations import reserve_stock, release_reservations
+from workflow_executions import EXECUTION_STATUSES, execution_row, order_id_from_name, upsert_executions
+from workflow_payload import build_payload, parse_items, workflow_item
+from order_intake import intake_message, queue_client
 
 # Environment variables
 DB_HOST = os.environ['DB_HOST']
@@ -12,17 +26,149 @@ DB_USER = os.environ['DB_USER']
 DB_PASSWORD = os.environ['DB_PASSWORD']
 S3_BUCKET = os.environ['S3_BUCKET']
 STATE_MACHINE_ARN = os.environ['STATE_MACHINE_ARN']
+# Optional read replica for GET routes; falls back to DB_HOST when unset,
+# unreachable or lagging more than REPLICA_MAX_LAG_SECONDS
+DB_READER_HOST = os.environ.get('DB_READER_HOST')
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get('REPLICA_LAG_CHECK_SECONDS', '10'))
+REPLICA_RETRY_SECONDS = float(os.environ.get('REPLICA_RETRY_SECONDS', '30'))
+ORDER_CACHE_MAX_ENTRIES = int(os.environ.get('ORDER_CACHE_MAX_ENTRIES', '256'))
+ORDER_CACHE_TTL_SECONDS = float(os.environ.get('ORDER_CACHE_TTL_SECONDS', '30'))
+BULK_DELETE_BATCH_SIZE = int(os.environ.get('BULK_DELETE_BATCH_SIZE', '500'))
+BULK_DELETE_MAX_BATCHES = int(os.environ.get('BULK_DELETE_MAX_BATCHES', '20'))
+BULK_STATUS_MAX_ORDERS = int(os.environ.get('BULK_STATUS_MAX_ORDERS', '1000'))
+CUSTOMER_SEARCH_MAX_LIMIT = 50
+PRODUCT_PAGE_DEFAULT_LIMIT = 100
+PRODUCT_PAGE_MAX_LIMIT = 500
+EXECUTION_PAGE_DEFAULT_LIMIT = 50
+EXECUTION_PAGE_MAX_LIMIT = 100
+ORDER_PAGE_DEFAULT_LIMIT = 10
+ORDER_PAGE_MAX_LIMIT = 100
+# API Gateway cuts integrations off at 29 s
+STATUS_WAIT_MAX_SECONDS = float(os.environ.get('STATUS_WAIT_MAX_SECONDS', '25'))
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))
+STOCK_RESERVATION_ENABLED = os.environ.get('STOCK_RESERVATION_ENABLED', 'true').lower() == 'true'
+RESERVATION_TTL_MINUTES = int(os.environ.get('RESERVATION_TTL_MINUTES', '15'))
+# Optional Express variant of the order workflow, run synchronously for
+# small orders; slower or failed runs fall back to STATE_MACHINE_ARN
+EXPRESS_STATE_MACHINE_ARN = os.environ.get('EXPRESS_STATE_MACHINE_ARN')
+SYNC_WORKFLOW_MAX_ITEMS = int(os.environ.get('SYNC_WORKFLOW_MAX_ITEMS', '10'))
+SYNC_WORKFLOW_TIMEOUT_SECONDS = float(os.environ.get('SYNC_WORKFLOW_TIMEOUT_SECONDS', '8'))
+# sync: POST /orders writes the order and starts its workflow
+# queue: POST /orders enqueues to ORDER_QUEUE_URL for order_intake_worker
+INTAKE_MODE = os.environ.get('INTAKE_MODE', 'sync').lower()
+ORDER_QUEUE_URL = os.environ.get('ORDER_QUEUE_URL')
+PRODUCT_FIELDS = ['product_id', 'product_name', 'price', 'stock_quantity', 'description', 'category']
 
-s3_client = boto3.client('s3')
-sfn_client = boto3.client('stepfunctions')
+# Allowed order status transitions: current status -> statuses it may move to
+ORDER_STATUS_TRANSITIONS = {
+    'pending': {'processing', 'cancelled', 'failed'},
+    'processing': {'shipped', 'completed', 'cancelled', 'failed'},
+    'shipped': {'delivered', 'completed'},
+    'delivered': {'completed'},
+    'failed': {'pending'},
+    'cancelled': set(),
+    'completed': set()
+}
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
+metrics = Metrics('order_management')
+s3_client = metrics.instrument_client(boto3.client('s3'))
+sfn_client = metrics.instrument_client(boto3.client('stepfunctions'))
+# StartSyncExecution blocks until the workflow ends; the read timeout is
+# what bounds the wait, and a timed-out call must not be retried
+sfn_sync_client = metrics.instrument_client(boto3.client('stepfunctions', config=Config(
+    read_timeout=SYNC_WORKFLOW_TIMEOUT_SECONDS,
+    retries={'total_max_attempts': 1}
+)))
+events_client = metrics.instrument_client(boto3.client('events'))
+order_queue = queue_client(
+    ORDER_QUEUE_URL, lambda: metrics.instrument_client(boto3.client('sqs'))
+) if INTAKE_MODE == 'queue' else None
+
+# order_id -> (expires_at, order body); lives as long as the Lambda container
+order_cache = OrderedDict()
+
+# Optional inventory columns, looked up once per container
+inventory_columns = None
+
+# Reader health, shared by the invocations of this container
+replica_state = {'checked_at': 0.0, 'lag': None, 'down_until': 0.0}
+
+def get_db_connection(host=None):
+    with metrics.timer('DbConnect'):
+        return psycopg2.connect(
+            host=host or DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+def replica_lag_seconds(conn):
+    """Replay lag of a standby in seconds (0 when fully replayed, None if unknown)"""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+            END
+        """)
+        lag = cur.fetchone()[0]
+        return float(lag) if lag is not None else None
+    finally:
+        cur.close()
+
+def get_read_connection(event=None):
+    """
+    Connection for read-only routes. Uses DB_READER_HOST unless the client
+    asked for ?consistency=strong, the reader recently failed, or its lag
+    (checked at most every REPLICA_LAG_CHECK_SECONDS) is over the bound.
+    """
+    params = (event or {}).get('queryStringParameters') or {}
+    now = time.monotonic()
+    
+    if (not DB_READER_HOST
+            or params.get('consistency') == 'strong'
+            or now < replica_state['down_until']):
+        metrics.set_property('DbTarget', 'writer')
+        return get_db_connection()
+    
+    try:
+        conn = get_db_connection(DB_READER_HOST)
+    except psycopg2.OperationalError as e:
+        print(f"Reader unreachable, using writer: {str(e)}")
+        replica_state['down_until'] = now + REPLICA_RETRY_SECONDS
+        metrics.count('ReaderFallback')
+        metrics.set_property('DbTarget', 'writer')
+        return get_db_connection()
+    
+    try:
+        if now - replica_state['checked_at'] >= REPLICA_LAG_CHECK_SECONDS:
+            replica_state['lag'] = replica_lag_seconds(conn)
+            replica_state['checked_at'] = now
+            conn.rollback()
+    except psycopg2.Error as e:
+        print(f"Could not read replica lag: {str(e)}")
+        replica_state['lag'] = None
+        replica_state['checked_at'] = now
+        conn.rollback()
+    
+    lag = replica_state['lag']
+    if lag is not None and lag > REPLICA_MAX_LAG_SECONDS:
+        print(f"Reader lagging {lag:.1f}s (max {REPLICA_MAX_LAG_SECONDS}s), using writer")
+        conn.close()
+        metrics.count('ReaderFallback')
+        metrics.set_property('DbTarget', 'writer')
+        return get_db_connection()
+    
+    conn.set_session(readonly=True)
+    metrics.set_property('DbTarget', 'reader')
+    return conn
+
+metrics.profiler = QueryProfiler('order_management', connect=get_db_connection)
 
 def response(status_code, body):
     return {
@@ -30,18 +176,108 @@ def response(status_code, body):
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,Idempotency-Key',
             'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
         },
-        'body': json.dumps(body)
+        'body': dumps(body)
     }
 
+def wants_columnar(params):
+    # ?format=columnar returns {"columns": [...], "rows": [[...]]} for list endpoints
+    return (params.get('format') or '').lower() == 'columnar'
+
+def order_cache_get(order_id):
+    entry = order_cache.get(order_id)
+    if entry is None:
+        return None
+    expires_at, body = entry
+    if expires_at < time.monotonic():
+        del order_cache[order_id]
+        return None
+    order_cache.move_to_end(order_id)
+    return body
+
+def order_cache_put(order_id, body):
+    if ORDER_CACHE_MAX_ENTRIES <= 0:
+        return
+    order_cache[order_id] = (time.monotonic() + ORDER_CACHE_TTL_SECONDS, body)
+    order_cache.move_to_end(order_id)
+    while len(order_cache) > ORDER_CACHE_MAX_ENTRIES:
+        order_cache.popitem(last=False)
+
+def invalidate_order_cache(order_id):
+    order_cache.pop(order_id, None)
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_customers(query, limit, event=None):
+    """
+    GET /customers?q=...&limit=...
+    Typeahead search over name/email, served by the pg_trgm GIN indexes.
+    Prefix matches rank first, then by trigram similarity.
+    """
+    conn = get_read_connection(event)
+    cur = conn.cursor()
+    
+    try:
+        if query:
+            contains = f"%{escape_like(query)}%"
+            prefix = f"{escape_like(query)}%"
+            cur.execute("""
+                SELECT customer_id, customer_name, email
+                FROM customers
+                WHERE customer_name ILIKE %s OR email ILIKE %s
+                ORDER BY (customer_name ILIKE %s OR email ILIKE %s) DESC,
+                         similarity(customer_name, %s) DESC,
+                         customer_name
+                LIMIT %s
+            """, (contains, contains, prefix, prefix, query, limit + 1))
+        else:
+            cur.execute("""
+                SELECT customer_id, customer_name, email
+                FROM customers
+                ORDER BY customer_name
+                LIMIT %s
+            """, (limit + 1,))
+        
+        rows = cur.fetchall()
+        customers = [{
+            'customer_id': row[0],
+            'customer_name': row[1],
+            'email': row[2],
+            'label': f"{row[1]} ({row[0]})"
+        } for row in rows[:limit]]
+        
+        return response(200, {
+            'query': query,
+            'customers': customers,
+            'count': len(customers),
+            'has_more': len(rows) > limit
+        })
+        
+    except Exception as e:
+        print(f"Error searching customers: {str(e)}")
+        return response(500, {'message': 'Failed to search customers', 'error': str(e)})
+    finally:
+        cur.close()
+        conn.close()
+
 def list_customers(event):
     """
     GET /customers
-    Returns list of all customers for dropdown
+    Returns list of all customers for dropdown, or a bounded typeahead
+    search when q or limit is given
     """
-    conn = get_db_connection()
+    params = event.get('queryStringParameters', {}) or {}
+    if 'q' in params or 'limit' in params:
+        try:
+            limit = max(1, min(int(params.get('limit', 10)), CUSTOMER_SEARCH_MAX_LIMIT))
+        except ValueError:
+            return response(400, {'message': 'limit must be an integer'})
+        return search_customers(params.get('q', '').strip(), limit, event)
+    
+    conn = get_read_connection(event)
     cur = conn.cursor()
     
     try:
@@ -51,15 +287,8 @@ def list_customers(event):
             ORDER BY customer_name
         """)
         
-        customers = []
-        for row in cur.fetchall():
-            customers.append({
-                'customer_id': row[0],
-                'customer_name': row[1],
-                'email': row[2],
-                'phone': row[3],
-                'address': row[4]
-            })
+        columns = [col[0] for col in cur.description]
+        customers = rows_payload(columns, cur.fetchall(), wants_columnar(params))
         
         return response(200, {'customers': customers})
         
@@ -70,87 +299,195 @@ def list_customers(event):
         cur.close()
         conn.close()
 
-def list_products(event):
+def get_inventory_columns(cur):
+    global inventory_columns
+    if inventory_columns is None:
+        cur.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'inventory'
+            AND column_name IN ('category', 'search_vector', 'reserved_quantity', 'stock_shards')
+        """)
+        inventory_columns = {row[0] for row in cur.fetchall()}
+    return inventory_columns
+
+def stock_expression(columns):
     """
-    GET /products
-    Returns list of all products from inventory for dropdown
+    SQL for the orderable stock of an inventory row: reserved units are
+    excluded, hot products are summed over their shards
     """
-    conn = get_db_connection()
+    if 'stock_shards' in columns:
+        return """CASE WHEN inventory.stock_shards > 0 THEN (
+                SELECT COALESCE(SUM(s.stock_quantity), 0)::integer
+                FROM inventory_stock_shards s
+                WHERE s.product_id = inventory.product_id
+            ) ELSE inventory.stock_quantity - inventory.reserved_quantity END"""
+    if 'reserved_quantity' in columns:
+        return 'stock_quantity - reserved_quantity'
+    return 'stock_quantity'
+
+def encode_product_cursor(product_name, product_id):
+    raw = json.dumps([product_name, product_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_product_cursor(cursor):
+    product_name, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return product_name, product_id
+
+def get_customer_summary(customer_id, event):
+    """
+    GET /customers/{id}/summary
+    Order count, lifetime value and first/last order date, read from the
+    customer_metrics row (one row however many orders the customer has)
+    """
+    conn = get_read_connection(event)
     cur = conn.cursor()
     
     try:
-        # Pertama, cek apakah kolom category ada
         cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'inventory' 
-            AND column_name = 'category'
-        """)
-        has_category = cur.fetchone() is not None
-        
-        print(f"Database has category column: {has_category}")
-        
-        # Get query parameters for filtering
-        query_params = event.get('queryStringParameters', {}) or {}
-        category_filter = query_params.get('category')
-        in_stock_only = query_params.get('in_stock', 'true').lower() == 'true'
+            SELECT c.customer_id, c.customer_name, c.email,
+                   COALESCE(m.order_count, 0), COALESCE(m.lifetime_value, 0)::float8,
+                   m.first_order_at, m.last_order_at, m.updated_at
+            FROM customers c
+            LEFT JOIN customer_metrics m ON m.customer_id = c.customer_id
+            WHERE c.customer_id = %s
+        """, (customer_id,))
+        row = cur.fetchone()
+        if not row:
+            return response(404, {'message': 'Customer not found'})
         
-        # Build query dynamically berdasarkan kolom yang ada
-        if has_category:
-            query = """
-                SELECT product_id, product_name, price, stock_quantity, 
-                       COALESCE(description, '') as description,
-                       COALESCE(category, '') as category
-                FROM inventory
-                WHERE 1=1
-            """
-        else:
-            query = """
-                SELECT product_id, product_name, price, stock_quantity, 
-                       COALESCE(description, '') as description,
-                       '' as category
-                FROM inventory
-                WHERE 1=1
-            """
+        return response(200, {
+            'customer_id': row[0],
+            'customer_name': row[1],
+            'email': row[2],
+            'order_count': row[3],
+            'lifetime_value': row[4],
+            'first_order_at': row[5].isoformat() if row[5] else None,
+            'last_order_at': row[6].isoformat() if row[6] else None,
+            'metrics_updated_at': row[7].isoformat() if row[7] else None
+        })
+    except Exception as e:
+        print(f"Error reading customer summary: {str(e)}")
+        return response(500, {'message': 'Failed to get customer summary', 'error': str(e)})
+    finally:
+        cur.close()
+        conn.close()
+
+def list_products(event):
+    """
+    GET /products
+    Keyset-paginated product list ordered by (product_name, product_id).
+    Query params: limit, cursor (next_cursor from the previous page),
+    fields (comma-separated projection), q (full-text search),
+    category, in_stock.
+    """
+    # Get query parameters for filtering
+    query_params = event.get('queryStringParameters', {}) or {}
+    category_filter = query_params.get('category')
+    in_stock_only = query_params.get('in_stock', 'true').lower() == 'true'
+    search_text = (query_params.get('q') or '').strip()
+    cursor = query_params.get('cursor')
+    
+    try:
+        limit = max(1, min(int(query_params.get('limit', PRODUCT_PAGE_DEFAULT_LIMIT)), PRODUCT_PAGE_MAX_LIMIT))
+    except ValueError:
+        return response(400, {'message': 'limit must be an integer'})
+    
+    if query_params.get('fields'):
+        fields = [f.strip() for f in query_params['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+        if unknown:
+            return response(400, {
+                'message': f"Unknown fields: {', '.join(unknown)}",
+                'allowed_fields': PRODUCT_FIELDS
+            })
+    else:
+        fields = PRODUCT_FIELDS
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_product_cursor(cursor)
+        except Exception:
+            return response(400, {'message': 'Invalid cursor'})
+    
+    conn = get_read_connection(event)
+    cur = conn.cursor()
+    
+    try:
+        columns = get_inventory_columns(cur)
+        has_category = 'category' in columns
+        has_search = 'search_vector' in columns
+        stock = stock_expression(columns)
+        
+        # Sort keys are always selected so the next cursor can be built
+        select_exprs = {
+            'product_id': 'product_id',
+            'product_name': 'product_name',
+            'price': 'price::float8',
+            'stock_quantity': stock,
+            'description': "COALESCE(description, '')",
+            'category': "COALESCE(category, '')" if has_category else "''"
+        }
+        selected = ['product_id', 'product_name'] + [f for f in fields if f not in ('product_id', 'product_name')]
         
+        query = f"""
+            SELECT {', '.join(select_exprs[f] for f in selected)}
+            FROM inventory
+            WHERE 1=1
+        """
         params = []
         
         if in_stock_only:
-            query += " AND stock_quantity > 0"
+            query += f" AND {stock} > 0"
         
         if category_filter and has_category:
             query += " AND category = %s"
             params.append(category_filter)
         
-        query += " ORDER BY product_name"
+        if search_text:
+            if has_search:
+                query += " AND search_vector @@ websearch_to_tsquery('simple', %s)"
+                params.append(search_text)
+            else:
+                query += " AND (product_name ILIKE %s OR description ILIKE %s)"
+                params.extend([f"%{escape_like(search_text)}%"] * 2)
+        
+        if after:
+            query += " AND (product_name, product_id) > (%s, %s)"
+            params.extend(after)
         
-        print(f"Executing query: {query}")
-        print(f"With params: {params}")
+        query += " ORDER BY product_name, product_id LIMIT %s"
+        params.append(limit + 1)
         
         cur.execute(query, params)
+        rows = cur.fetchall()
         
-        products = []
-        for row in cur.fetchall():
-            product = {
-                'product_id': row[0],
-                'product_name': row[1],
-                'price': float(row[2]),
-                'stock_quantity': row[3],
-                'description': row[4],
-                'category': row[5] if has_category else ''
-            }
-            products.append(product)
+        # Sort keys lead the SELECT list; drop them unless they were requested
+        page = rows[:limit]
+        if selected != fields:
+            positions = [selected.index(f) for f in fields]
+            page = [tuple(row[i] for i in positions) for row in page]
+        products = rows_payload(fields, page, wants_columnar(query_params))
         
-        print(f"Found {len(products)} products")
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_product_cursor(last[1], last[0])
+        
+        print(f"Found {len(page)} products")
         
         return response(200, {
             'products': products,
-            'count': len(products),
+            'count': len(page),
+            'next_cursor': next_cursor,
             'metadata': {
                 'has_category_column': has_category,
+                'fields': fields,
                 'filters_applied': {
                     'category': category_filter,
-                    'in_stock_only': in_stock_only
+                    'in_stock_only': in_stock_only,
+                    'q': search_text or None
                 }
             }
         })
@@ -176,10 +513,15 @@ def get_product(product_id):
     cur = conn.cursor()
     
     try:
-        cur.execute("""
-            SELECT product_id, product_name, price, stock_quantity, description
-            FROM inventory
-            WHERE product_id = %s AND stock_quantity > 0
+        stock = stock_expression(get_inventory_columns(cur))
+        cur.execute(f"""
+            SELECT product_id, product_name, price, stock, description
+            FROM (
+                SELECT product_id, product_name, price, {stock} AS stock, description
+                FROM inventory
+                WHERE product_id = %s
+            ) p
+            WHERE stock > 0
         """, (product_id,))
         
         row = cur.fetchone()
@@ -201,7 +543,93 @@ def get_product(product_id):
         cur.close()
         conn.close()
 
+def get_header(event, name):
+    headers = event.get('headers') or {}
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
 def create_order(event):
+    """
+    POST /orders
+    With an Idempotency-Key header, the first completed response is stored
+    and replayed for retries of the same request instead of creating the
+    order again.
+    """
+    idempotency_key = get_header(event, 'Idempotency-Key')
+    if not idempotency_key:
+        return create_order_once(event)
+    
+    idempotency_key = idempotency_key.strip()[:255]
+    try:
+        request_hash = hashlib.sha256(
+            json.dumps(json.loads(event.get('body') or '{}'), sort_keys=True).encode('utf-8')
+        ).hexdigest()
+    except ValueError:
+        return response(400, {'message': 'Request body must be valid JSON'})
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        # Claim the key; an expired claim or stale in-flight attempt is taken over
+        cur.execute("""
+            INSERT INTO idempotency_keys (idempotency_key, request_hash, created_at)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (idempotency_key) DO UPDATE
+            SET request_hash = EXCLUDED.request_hash,
+                status_code = NULL,
+                response_body = NULL,
+                created_at = EXCLUDED.created_at,
+                completed_at = NULL
+            WHERE idempotency_keys.created_at < %s
+               OR (idempotency_keys.status_code IS NULL
+                   AND idempotency_keys.created_at < %s)
+            RETURNING idempotency_key
+        """, (
+            idempotency_key, request_hash, datetime.now(),
+            datetime.now() - timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+            datetime.now() - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+        ))
+        claimed = cur.fetchone() is not None
+        conn.commit()
+        
+        if not claimed:
+            cur.execute("""
+                SELECT request_hash, status_code, response_body
+                FROM idempotency_keys
+                WHERE idempotency_key = %s
+            """, (idempotency_key,))
+            stored_hash, status_code, response_body = cur.fetchone()
+            
+            if stored_hash != request_hash:
+                return response(422, {'message': 'Idempotency-Key was already used for a different request'})
+            if status_code is None:
+                return response(409, {'message': 'A request with this Idempotency-Key is still in progress'})
+            
+            print(f"Replaying stored response for Idempotency-Key {idempotency_key}")
+            replay = response(status_code, response_body)
+            replay['headers']['Idempotent-Replayed'] = 'true'
+            return replay
+        
+        result = create_order_once(event)
+        
+        if 200 <= result['statusCode'] < 300:
+            cur.execute("""
+                UPDATE idempotency_keys
+                SET status_code = %s, response_body = %s::jsonb, completed_at = %s
+                WHERE idempotency_key = %s
+            """, (result['statusCode'], result['body'], datetime.now(), idempotency_key))
+        else:
+            # Failed attempts are not cached so the client can retry them
+            cur.execute("DELETE FROM idempotency_keys WHERE idempotency_key = %s", (idempotency_key,))
+        conn.commit()
+        
+        return result
+    finally:
+        cur.close()
+        conn.close()
+
+def create_order_once(event):
     body = json.loads(event['body'])
     
     # Validate required fields
@@ -220,15 +648,17 @@ def create_order(event):
     if not isinstance(items, list) or len(items) == 0:
         return response(400, {'message': 'items must be a non-empty list'})
     
-    # Validate each item
-    for i, item in enumerate(items):
-        if 'product_id' not in item or 'quantity' not in item:
-            return response(400, {'message': f'Item {i} missing product_id or quantity'})
-        if item['quantity'] <= 0:
-            return response(400, {'message': f'Item {i} quantity must be positive'})
+    # Validate each item (same rules the workflow payload is checked against)
+    try:
+        parse_items(items)
+    except ValueError as e:
+        return response(400, {'message': str(e)})
     
     order_id = str(uuid.uuid4())
     
+    if INTAKE_MODE == 'queue':
+        return enqueue_order(order_id, customer_id, items)
+    
     conn = get_db_connection()
     cur = conn.cursor()
     
@@ -247,25 +677,38 @@ def create_order(event):
             total_amount += item_total
             
             # Simpan detail item untuk Step Functions
-            item_details.append({
-                'productId': item['product_id'],
-                'productName': product_name,
-                'quantity': item['quantity'],
-                'price': float(price)
-            })
+            item_details.append(workflow_item(item['product_id'], product_name, item['quantity'], price))
+        
+        # Hold the stock now so an order that cannot be fulfilled is rejected
+        # here instead of failing in update_inventory after payment
+        if STOCK_RESERVATION_ENABLED:
+            shortages = reserve_stock(
+                cur, order_id,
+                [(item['product_id'], item['quantity']) for item in items],
+                RESERVATION_TTL_MINUTES
+            )
+            if shortages:
+                conn.rollback()
+                return response(409, {
+                    'message': 'Insufficient stock',
+                    'shortages': shortages
+                })
         
         # Insert order
+        # order_items carries the order's created_at so both tables can be
+        # range-partitioned on the same month
+        created_at = datetime.now()
         cur.execute("""
             INSERT INTO orders (order_id, customer_id, total_amount, status, created_at)
             VALUES (%s, %s, %s, %s, %s)
-        """, (order_id, customer_id, total_amount, 'pending', datetime.now()))
+        """, (order_id, customer_id, total_amount, 'pending', created_at))
         
         # Insert order items
         for item in items:
             cur.execute("""
-                INSERT INTO order_items (order_id, product_id, quantity, price)
-                SELECT %s, %s, %s, price FROM inventory WHERE product_id = %s
-            """, (order_id, item['product_id'], item['quantity'], item['product_id']))
+                INSERT INTO order_items (order_id, order_created_at, product_id, quantity, price)
+                SELECT %s, %s, %s, %s, price FROM inventory WHERE product_id = %s
+            """, (order_id, created_at, item['product_id'], item['quantity'], item['product_id']))
         
         conn.commit()
         
@@ -293,17 +736,17 @@ def create_order(event):
                 'error': 'ARN appears to be an execution ARN, not a state machine ARN'
             })
         
-        # Start Step Functions workflow dengan format camelCase yang diharapkan
-        step_functions_input = {
-            'orderId': order_id,
-            'customerId': customer_id,
-            'totalAmount': float(total_amount),
-            'items': item_details,  # Format yang sesuai dengan Step Functions
-            'timestamp': datetime.now().isoformat()
-        }
+        # Start Step Functions workflow; the steps read items and prices from
+        # this payload (see step_function/README.md) instead of the database
+        step_functions_input = build_payload(order_id, customer_id, total_amount, item_details)
         
         print(f"Step Functions Input: {json.dumps(step_functions_input, indent=2)}")
         
+        if EXPRESS_STATE_MACHINE_ARN and len(item_details) <= SYNC_WORKFLOW_MAX_ITEMS:
+            processed = run_express_workflow(conn, cur, order_id, step_functions_input)
+            if processed:
+                return processed
+        
         execution_name = f"order-{order_id}"
         print(f"Starting execution with name: {execution_name}")
 
@@ -316,6 +759,19 @@ def create_order(event):
         execution_arn = execution_response['executionArn']
         print(f"Execution started: {execution_arn}")
         
+        # Index the execution for GET /executions; execution_sync repairs misses
+        try:
+            upsert_executions(cur, [execution_row({
+                'executionArn': execution_arn,
+                'name': execution_name,
+                'status': 'RUNNING',
+                'startDate': execution_response['startDate']
+            })])
+            conn.commit()
+        except Exception as index_error:
+            conn.rollback()
+            print(f"Error indexing execution: {index_error}")
+        
         return response(201, {
             'message': 'Order created successfully',
             'order_id': order_id,
@@ -348,32 +804,125 @@ def create_order(event):
         cur.close()
         conn.close()
 
+def run_express_workflow(conn, cur, order_id, workflow_input):
+    """
+    Run the Express variant of the workflow and wait for it, at most
+    SYNC_WORKFLOW_TIMEOUT_SECONDS. Returns the 201 response when it
+    succeeded and 402/409 with the recorded cause when it FAILED (payment
+    declined, stock gone; compensation already ran). Returns None when the
+    call errored (rejected, throttled or timed out) or the run TIMED_OUT,
+    so the caller starts the Standard workflow. The step handlers are
+    idempotent per order, so an Express run that is still going (or got
+    halfway) is not repeated by the Standard one.
+    """
+    execution_name = f"order-{order_id}"
+    try:
+        result = sfn_sync_client.start_sync_execution(
+            stateMachineArn=EXPRESS_STATE_MACHINE_ARN,
+            name=execution_name,
+            input=json.dumps(workflow_input)
+        )
+    except Exception as e:
+        # The order and its reservation are committed: never fail the request
+        # here, the Standard workflow takes over
+        print(f"Express workflow did not finish, falling back: {str(e)}")
+        metrics.count('ExpressFallback')
+        return None
+    
+    if result['status'] not in ('SUCCEEDED', 'FAILED'):
+        print(f"Express workflow {result['status']} ({result.get('error')}: {result.get('cause')}), falling back")
+        metrics.count('ExpressFallback')
+        return None
+    
+    succeeded = result['status'] == 'SUCCEEDED'
+    metrics.count('ExpressCompleted' if succeeded else 'ExpressFailed')
+    try:
+        output = json.loads(result.get('output') or 'null')
+    except ValueError:
+        output = result.get('output')
+    
+    # Express executions can't be described later; the index and the orders
+    # row (written by the steps) are what GET /status reads for them
+    try:
+        upsert_executions(cur, [execution_row({
+            'executionArn': result['executionArn'],
+            'name': execution_name,
+            'status': result['status'],
+            'startDate': result['startDate'],
+            'stopDate': result['stopDate']
+        })])
+        conn.commit()
+    except Exception as index_error:
+        conn.rollback()
+        print(f"Error indexing execution: {index_error}")
+    state = read_order_state(cur, order_id) or {}
+    
+    workflow = {
+        'mode': 'express',
+        'status': result['status'],
+        'order_status': state.get('order_status'),
+        'payment_status': state.get('payment_status'),
+        'transaction_id': state.get('transaction_id'),
+        'output': output
+    }
+    if not succeeded:
+        # Final: the Standard workflow must not charge or take stock again
+        print(f"Express workflow {result['status']} ({result.get('error')}: {result.get('cause')})")
+        workflow.update(error=result.get('error'), cause=result.get('cause'))
+        return response(402 if state.get('payment_status') == 'failed' else 409, {
+            'message': 'Order could not be processed',
+            'order_id': order_id,
+            'execution_arn': result['executionArn'],
+            'workflow': workflow
+        })
+    
+    return response(201, {
+        'message': 'Order created and processed',
+        'order_id': order_id,
+        'execution_arn': result['executionArn'],
+        'workflow': workflow
+    })
+
+def enqueue_order(order_id, customer_id, items):
+    """
+    Queued intake: order_intake_worker writes the order, reserves its stock
+    and starts the workflow. Until then GET /orders/{id} returns 404; an
+    order the worker rejects shows up in GET /orders/{id}/events.
+    """
+    sent = order_queue.send_message(
+        QueueUrl=ORDER_QUEUE_URL,
+        MessageBody=intake_message(order_id, customer_id, items)
+    )
+    print(f"Order {order_id} queued as message {sent['MessageId']}")
+    return response(202, {
+        'message': 'Order accepted',
+        'order_id': order_id,
+        'status': 'queued',
+        'note': 'The order is created asynchronously; poll GET /orders/{id}'
+    })
+
 def list_orders(event):
     params = event.get('queryStringParameters', {}) or {}
-    page = int(params.get('page', 1))
-    limit = int(params.get('limit', 10))
+    try:
+        page = max(1, int(params.get('page', 1)))
+        limit = max(1, min(int(params.get('limit', ORDER_PAGE_DEFAULT_LIMIT)), ORDER_PAGE_MAX_LIMIT))
+    except ValueError:
+        return response(400, {'message': 'page and limit must be integers'})
     offset = (page - 1) * limit
     
-    conn = get_db_connection()
+    conn = get_read_connection(event)
     cur = conn.cursor()
     
     try:
         cur.execute("""
-            SELECT order_id, customer_id, total_amount, status, created_at
+            SELECT order_id, customer_id, total_amount::float8 AS total_amount, status, created_at
             FROM orders
             ORDER BY created_at DESC
             LIMIT %s OFFSET %s
         """, (limit, offset))
         
-        orders = []
-        for row in cur.fetchall():
-            orders.append({
-                'order_id': row[0],
-                'customer_id': row[1],
-                'total_amount': float(row[2]),
-                'status': row[3],
-                'created_at': row[4].isoformat()
-            })
+        columns = [col[0] for col in cur.description]
+        orders = rows_payload(columns, cur.fetchall(), wants_columnar(params))
         
         cur.execute("SELECT COUNT(*) FROM orders")
         total = cur.fetchone()[0]
@@ -391,68 +940,198 @@ def list_orders(event):
         cur.close()
         conn.close()
 
-def get_order(order_id):
-    conn = get_db_connection()
+def get_order(order_id, event=None):
+    """
+    GET /orders/{id}
+    Order header and items (with product names) in one query.
+    Cached per container; update_order / delete_order invalidate, while
+    status changes made by the workflow Lambdas are bounded by the TTL.
+    """
+    cached = order_cache_get(order_id)
+    if cached is not None:
+        return response(200, cached)
+    
+    conn = get_read_connection(event)
     cur = conn.cursor()
     
     try:
         cur.execute("""
-            SELECT order_id, customer_id, total_amount, status, created_at
-            FROM orders
-            WHERE order_id = %s
+            SELECT o.order_id, o.customer_id, o.total_amount, o.status, o.created_at,
+                   o.payment_status, o.transaction_id, o.notification_status,
+                   o.last_event, o.last_event_at,
+                   COALESCE(
+                       json_agg(
+                           json_build_object(
+                               'product_id', oi.product_id,
+                               'product_name', i.product_name,
+                               'quantity', oi.quantity,
+                               'price', oi.price
+                           ) ORDER BY oi.id
+                       ) FILTER (WHERE oi.id IS NOT NULL),
+                       '[]'::json
+                   ) AS items
+            FROM orders o
+            LEFT JOIN order_items oi ON oi.order_id = o.order_id
+            LEFT JOIN inventory i ON i.product_id = oi.product_id
+            WHERE o.order_id = %s
+            GROUP BY o.order_id, o.customer_id, o.total_amount, o.status, o.created_at,
+                     o.payment_status, o.transaction_id, o.notification_status,
+                     o.last_event, o.last_event_at
         """, (order_id,))
         
         row = cur.fetchone()
         if not row:
             return response(404, {'message': 'Order not found'})
         
-        cur.execute("""
-            SELECT product_id, quantity, price
-            FROM order_items
-            WHERE order_id = %s
-        """, (order_id,))
-        
-        items = []
-        for item_row in cur.fetchall():
-            items.append({
-                'product_id': item_row[0],
-                'quantity': item_row[1],
-                'price': float(item_row[2])
-            })
-        
-        return response(200, {
+        order = {
             'order_id': row[0],
             'customer_id': row[1],
             'total_amount': float(row[2]),
             'status': row[3],
             'created_at': row[4].isoformat(),
-            'items': items
+            'payment_status': row[5],
+            'transaction_id': row[6],
+            'notification_status': row[7],
+            'last_event': row[8],
+            'last_event_at': row[9].isoformat() if row[9] else None,
+            'items': row[10]
+        }
+        order_cache_put(order_id, order)
+        
+        return response(200, order)
+    finally:
+        cur.close()
+        conn.close()
+
+def list_order_events(order_id, event):
+    """
+    GET /orders/{id}/events
+    Order history from order_events, oldest first
+    """
+    params = event.get('queryStringParameters', {}) or {}
+    conn = get_read_connection(event)
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("""
+            SELECT event_id, event_type, source, status, payment_status,
+                   transaction_id, notification_status, detail, created_at
+            FROM order_events
+            WHERE order_id = %s
+            ORDER BY event_id
+        """, (order_id,))
+        columns = [col[0] for col in cur.description]
+        rows = cur.fetchall()
+        
+        return response(200, {
+            'order_id': order_id,
+            'events': rows_payload(columns, rows, wants_columnar(params)),
+            'count': len(rows)
         })
     finally:
         cur.close()
         conn.close()
 
+def apply_status_transition(cur, order_ids, status):
+    """
+    Move order_ids to status in one set-based UPDATE, only from statuses
+    that ORDER_STATUS_TRANSITIONS allows. Returns {order_id: outcome}.
+    """
+    allowed_from = [
+        current for current, targets in ORDER_STATUS_TRANSITIONS.items()
+        if status in targets
+    ]
+    
+    cur.execute("""
+        UPDATE orders o
+        SET status = %s, updated_at = %s
+        FROM (
+            SELECT order_id, status
+            FROM orders
+            WHERE order_id = ANY(%s)
+            FOR UPDATE
+        ) prev
+        WHERE o.order_id = prev.order_id
+        AND prev.status = ANY(%s)
+        RETURNING o.order_id, prev.status
+    """, (status, datetime.now(), order_ids, allowed_from))
+    
+    outcomes = {}
+    for order_id, previous in cur.fetchall():
+        outcomes[order_id] = {'outcome': 'updated', 'from': previous, 'to': status}
+    
+    # Cancelled/failed orders no longer need the stock held for them
+    if outcomes and status in ('cancelled', 'failed'):
+        release_reservations(cur, list(outcomes), 'released')
+    
+    remaining = [order_id for order_id in order_ids if order_id not in outcomes]
+    if remaining:
+        cur.execute("""
+            SELECT order_id, status FROM orders WHERE order_id = ANY(%s)
+        """, (remaining,))
+        current = dict(cur.fetchall())
+        for order_id in remaining:
+            if order_id not in current:
+                outcomes[order_id] = {'outcome': 'not_found'}
+            elif current[order_id] == status:
+                outcomes[order_id] = {'outcome': 'unchanged', 'status': status}
+            else:
+                outcomes[order_id] = {
+                    'outcome': 'invalid_transition',
+                    'from': current[order_id],
+                    'to': status
+                }
+    
+    return outcomes
+
+def publish_status_notifications(order_ids, status):
+    """
+    Send "Order Status Change" events to EventBridge (routed to
+    send_notification), batching the 10-entry put_events limit.
+    """
+    entries = [{
+        'Source': 'lks.order.management',
+        'DetailType': 'Order Status Change',
+        'Detail': json.dumps({
+            'order_id': order_id,
+            'status': status.upper(),
+            'notification_type': f'order_{status}',
+            'timestamp': datetime.now().isoformat()
+        })
+    } for order_id in order_ids]
+    
+    failed = 0
+    for start in range(0, len(entries), 10):
+        result = events_client.put_events(Entries=entries[start:start + 10])
+        failed += result.get('FailedEntryCount', 0)
+    return len(entries) - failed
+
 def update_order(order_id, event):
     body = json.loads(event['body'])
     status = body.get('status')
     
     if not status:
         return response(400, {'message': 'Status is required'})
+    if status not in ORDER_STATUS_TRANSITIONS:
+        return response(400, {'message': f'Unknown status: {status}'})
     
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        cur.execute("""
-            UPDATE orders
-            SET status = %s, updated_at = %s
-            WHERE order_id = %s
-        """, (status, datetime.now(), order_id))
+        outcome = apply_status_transition(cur, [order_id], status)[order_id]
         
-        if cur.rowcount == 0:
+        if outcome['outcome'] == 'not_found':
             return response(404, {'message': 'Order not found'})
+        if outcome['outcome'] == 'invalid_transition':
+            conn.rollback()
+            return response(409, {
+                'message': f"Cannot change order status from {outcome['from']} to {status}",
+                'allowed': sorted(ORDER_STATUS_TRANSITIONS.get(outcome['from'], set()))
+            })
         
         conn.commit()
+        invalidate_order_cache(order_id)
         
         return response(200, {
             'message': 'Order updated successfully',
@@ -463,18 +1142,82 @@ def update_order(order_id, event):
         cur.close()
         conn.close()
 
+def bulk_update_order_status(event):
+    """
+    PUT /orders/status
+    Move many orders to one status. Invalid transitions are skipped and
+    reported per order; notify=true sends order_shipped notifications.
+    """
+    body = json.loads(event.get('body') or '{}')
+    status = body.get('status')
+    order_ids = body.get('order_ids')
+    notify = body.get('notify', False)
+    
+    if not status:
+        return response(400, {'message': 'Status is required'})
+    if status not in ORDER_STATUS_TRANSITIONS:
+        return response(400, {'message': f'Unknown status: {status}'})
+    if not isinstance(order_ids, list) or len(order_ids) == 0:
+        return response(400, {'message': 'order_ids must be a non-empty list'})
+    if len(order_ids) > BULK_STATUS_MAX_ORDERS:
+        return response(400, {'message': f'At most {BULK_STATUS_MAX_ORDERS} order_ids per request'})
+    
+    order_ids = list(dict.fromkeys(str(order_id) for order_id in order_ids))
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        outcomes = apply_status_transition(cur, order_ids, status)
+        conn.commit()
+        
+        updated_ids = [order_id for order_id in order_ids if outcomes[order_id]['outcome'] == 'updated']
+        for order_id in updated_ids:
+            invalidate_order_cache(order_id)
+        
+        notifications_sent = 0
+        if notify and status == 'shipped' and updated_ids:
+            try:
+                notifications_sent = publish_status_notifications(updated_ids, status)
+            except Exception as e:
+                print(f"Error sending status notifications: {str(e)}")
+        
+        summary = {}
+        for outcome in outcomes.values():
+            summary[outcome['outcome']] = summary.get(outcome['outcome'], 0) + 1
+        
+        return response(200, {
+            'message': f"{len(updated_ids)} of {len(order_ids)} orders updated",
+            'status': status,
+            'summary': summary,
+            'results': [dict(order_id=order_id, **outcomes[order_id]) for order_id in order_ids],
+            'notifications_sent': notifications_sent
+        })
+    except Exception as e:
+        conn.rollback()
+        print(f"Error in bulk_update_order_status: {str(e)}")
+        return response(500, {'message': 'Failed to update orders', 'error': str(e)})
+    finally:
+        cur.close()
+        conn.close()
+
 def delete_order(order_id):
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        cur.execute("DELETE FROM order_items WHERE order_id = %s", (order_id,))
+        # order_items rows go with it via ON DELETE CASCADE
         cur.execute("DELETE FROM orders WHERE order_id = %s", (order_id,))
         
         if cur.rowcount == 0:
             return response(404, {'message': 'Order not found'})
         
+        # Reservations have no FK to orders; give their stock back now
+        # instead of after the reaper's TTL
+        release_reservations(cur, [order_id])
+        
         conn.commit()
+        invalidate_order_cache(order_id)
         
         return response(200, {
             'message': 'Order deleted successfully',
@@ -484,6 +1227,107 @@ def delete_order(order_id):
         cur.close()
         conn.close()
 
+def bulk_delete_orders(event):
+    """
+    DELETE /orders
+    Delete orders matching a filter (status, older_than_days, order_ids)
+    in bounded batches, committing after each one so no single
+    transaction holds locks on, or writes WAL for, the whole set.
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+        if not isinstance(body, dict):
+            raise ValueError('body must be a JSON object')
+        statuses = body.get('status')
+        order_ids = body.get('order_ids')
+        older_than_days = body.get('older_than_days')
+        batch_size = min(int(body.get('batch_size', BULK_DELETE_BATCH_SIZE)), 5000)
+        max_batches = int(body.get('max_batches', BULK_DELETE_MAX_BATCHES))
+        older_than = None
+        if older_than_days is not None:
+            older_than = datetime.now() - timedelta(days=int(older_than_days))
+    except (ValueError, TypeError, OverflowError):
+        return response(400, {'message': 'Invalid request body: batch_size, max_batches and older_than_days must be integers'})
+    
+    if isinstance(statuses, str):
+        statuses = [statuses]
+    if statuses is not None and not (
+        isinstance(statuses, list) and all(isinstance(status, str) for status in statuses)
+    ):
+        return response(400, {'message': 'status must be a string or a list of strings'})
+    
+    conditions = []
+    params = []
+    if statuses:
+        conditions.append("status = ANY(%s)")
+        params.append(statuses)
+    if order_ids:
+        if not isinstance(order_ids, list):
+            return response(400, {'message': 'order_ids must be a list'})
+        conditions.append("order_id = ANY(%s)")
+        params.append([str(order_id) for order_id in order_ids])
+    if older_than is not None:
+        conditions.append("created_at < %s")
+        params.append(older_than)
+    
+    if not conditions:
+        return response(400, {'message': 'At least one filter is required: status, older_than_days or order_ids'})
+    if batch_size <= 0 or max_batches <= 0:
+        return response(400, {'message': 'batch_size and max_batches must be positive'})
+    
+    # (order_id, created_at) is the key on both plain and partitioned orders
+    query = f"""
+        DELETE FROM orders
+        WHERE (order_id, created_at) IN (
+            SELECT order_id, created_at
+            FROM orders
+            WHERE {' AND '.join(conditions)}
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING order_id
+    """
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        deleted = 0
+        batches = 0
+        has_more = False
+        while True:
+            cur.execute(query, params + [batch_size])
+            deleted_ids = [row[0] for row in cur.fetchall()]
+            if deleted_ids:
+                release_reservations(cur, deleted_ids)
+            conn.commit()
+            batches += 1
+            deleted += len(deleted_ids)
+            for order_id in deleted_ids:
+                invalidate_order_cache(order_id)
+            
+            if len(deleted_ids) < batch_size:
+                break
+            if batches >= max_batches:
+                has_more = True
+                break
+        
+        print(f"Bulk delete removed {deleted} orders in {batches} batches")
+        
+        return response(200, {
+            'message': 'Orders deleted successfully',
+            'deleted': deleted,
+            'batches': batches,
+            'has_more': has_more
+        })
+    except Exception as e:
+        conn.rollback()
+        print(f"Error in bulk_delete_orders: {str(e)}")
+        return response(500, {'message': 'Failed to delete orders', 'error': str(e)})
+    finally:
+        cur.close()
+        conn.close()
+
 def construct_execution_arn(order_id):
     """
     Construct execution ARN from order ID
@@ -526,39 +1370,82 @@ def construct_execution_arn(order_id):
         print(f"Error constructing execution ARN: {e}")
         return None
 
+def encode_execution_cursor(start_date, order_id):
+    raw = json.dumps([start_date.isoformat(), order_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_execution_cursor(cursor):
+    start_date, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return datetime.fromisoformat(start_date), order_id
+
 def list_executions(event):
     """
     GET /executions
-    List all Step Functions executions
+    Workflow executions from the workflow_executions index, newest first.
+    Query params: status (ALL or a Step Functions status), limit,
+    cursor (next_cursor from the previous page)
     """
+    # Handle CORS preflight
+    if event.get('httpMethod') == 'OPTIONS':
+        return response(200, {})
+    
+    params = event.get('queryStringParameters', {}) or {}
+    status_filter = params.get('status', 'ALL').upper()
+    cursor = params.get('cursor')
+    
+    if status_filter != 'ALL' and status_filter not in EXECUTION_STATUSES:
+        return response(400, {
+            'message': f'Unknown status: {status_filter}',
+            'allowed': ['ALL'] + list(EXECUTION_STATUSES)
+        })
     try:
-        # Handle CORS preflight
-        if event.get('httpMethod') == 'OPTIONS':
-            return response(200, {})
-        
-        params = event.get('queryStringParameters', {}) or {}
-        status_filter = params.get('status', 'ALL')
-        max_results = int(params.get('limit', 50))
-        
-        exec_list_response = sfn_client.list_executions(
-            stateMachineArn=STATE_MACHINE_ARN,
-            statusFilter=status_filter,
-            maxResults=max_results
-        )
-        
-        executions = []
-        for exec in exec_list_response.get('executions', []):
-            executions.append({
-                'execution_arn': exec.get('executionArn'),
-                'name': exec.get('name'),
-                'status': exec.get('status'),
-                'start_date': exec.get('startDate').isoformat() if exec.get('startDate') else None,
-                'stop_date': exec.get('stopDate').isoformat() if exec.get('stopDate') else None
-            })
+        limit = max(1, min(int(params.get('limit', EXECUTION_PAGE_DEFAULT_LIMIT)), EXECUTION_PAGE_MAX_LIMIT))
+    except ValueError:
+        return response(400, {'message': 'limit must be an integer'})
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_execution_cursor(cursor)
+        except Exception:
+            return response(400, {'message': 'Invalid cursor'})
+    
+    conn = get_read_connection(event)
+    cur = conn.cursor()
+    
+    try:
+        query = """
+            SELECT execution_arn, execution_name AS name, order_id, status, start_date, stop_date
+            FROM workflow_executions
+            WHERE 1=1
+        """
+        query_params = []
+        
+        if status_filter != 'ALL':
+            query += " AND status = %s"
+            query_params.append(status_filter)
+        
+        if after:
+            query += " AND (start_date, order_id) < (%s, %s)"
+            query_params.extend(after)
+        
+        query += " ORDER BY start_date DESC, order_id DESC LIMIT %s"
+        query_params.append(limit + 1)
+        
+        cur.execute(query, query_params)
+        columns = [col[0] for col in cur.description]
+        rows = cur.fetchall()
+        
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_execution_cursor(last[4], last[2])
         
         return response(200, {
-            'executions': executions,
-            'count': len(executions),
+            'executions': rows_payload(columns, page, wants_columnar(params)),
+            'count': len(page),
+            'next_cursor': next_cursor,
             'state_machine': STATE_MACHINE_ARN
         })
         
@@ -568,6 +1455,64 @@ def list_executions(event):
             'message': 'Failed to list executions',
             'error': str(e)
         })
+    finally:
+        cur.close()
+        conn.close()
+
+def find_execution_arn(order_id):
+    """Execution ARN of an order from the workflow_executions index"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT execution_arn FROM workflow_executions WHERE order_id = %s
+        """, (order_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Error reading execution index: {str(e)}")
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+def get_express_workflow_status(execution_arn, identifier):
+    """Express executions have no DescribeExecution: answer from the index"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT e.execution_name, e.status, e.start_date, e.stop_date,
+                   o.status, o.payment_status, o.transaction_id, o.last_event
+            FROM workflow_executions e
+            LEFT JOIN orders o ON o.order_id = e.order_id
+            WHERE e.execution_arn = %s
+        """, (execution_arn,))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+    
+    if not row:
+        return response(404, {
+            'message': 'Workflow execution not found',
+            'identifier': identifier
+        })
+    
+    name, status, start_date, stop_date, order_status, payment_status, transaction_id, last_event = row
+    return response(200, {
+        'execution_arn': execution_arn,
+        'execution_name': name,
+        'status': status,
+        'start_date': start_date.isoformat(),
+        'stop_date': stop_date.isoformat() if stop_date else None,
+        'input_identifier': identifier,
+        'mode': 'express',
+        'order_status': order_status,
+        'payment_status': payment_status,
+        'transaction_id': transaction_id,
+        'last_event': last_event
+    })
 
 def get_workflow_status(identifier):
     """
@@ -579,15 +1524,17 @@ def get_workflow_status(identifier):
     
     try:
         # Check if identifier is execution ARN
-        if identifier.startswith('arn:aws:states:') and 'execution:' in identifier:
+        if identifier.startswith('arn:aws:states:') and (':execution:' in identifier or ':express:' in identifier):
             execution_arn = identifier
             print(f"Using provided execution ARN: {execution_arn}")
         else:
             # It's an order ID, we need to find the execution
             order_id = identifier
             print(f"Searching for execution for order: {order_id}")
-            
-            # Method 1: List executions and find by name
+            execution_arn = find_execution_arn(order_id)
+        
+        if not execution_arn:
+            # Not indexed yet - Method 1: List executions and find by name
             state_machine_arn = STATE_MACHINE_ARN
             print(f"State Machine ARN: {state_machine_arn}")
             
@@ -639,6 +1586,9 @@ def get_workflow_status(identifier):
                 'hint': 'The workflow may not have been started yet or the order ID is incorrect'
             })
         
+        if ':express:' in execution_arn:
+            return get_express_workflow_status(execution_arn, identifier)
+        
         # Get execution details
         execution = sfn_client.describe_execution(executionArn=execution_arn)
         
@@ -690,11 +1640,101 @@ def get_workflow_status(identifier):
             'identifier': identifier
         })
 
+def read_order_state(cur, order_id):
+    cur.execute("""
+        SELECT o.status, e.status, e.execution_arn, o.updated_at, e.stop_date,
+               o.payment_status, o.transaction_id, o.last_event
+        FROM orders o
+        LEFT JOIN workflow_executions e ON e.order_id = o.order_id
+        WHERE o.order_id = %s
+    """, (order_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    (order_status, workflow_status, execution_arn, updated_at, stop_date,
+     payment_status, transaction_id, last_event) = row
+    return {
+        'order_id': order_id,
+        'order_status': order_status,
+        'workflow_status': workflow_status,
+        'execution_arn': execution_arn,
+        'updated_at': updated_at,
+        'stop_date': stop_date,
+        'payment_status': payment_status,
+        'transaction_id': transaction_id,
+        'last_event': last_event,
+        'version': f"{order_status}:{workflow_status or 'NONE'}"
+    }
+
+def wait_for_status(identifier, event):
+    """
+    GET /status/{id}/wait?since=<version>&timeout=<seconds>
+    Long-poll: returns as soon as the order or workflow status differs from
+    the version the client last saw, or after timeout with changed=false.
+    Waits on the order_status NOTIFY channel, so an idle wait runs no queries.
+    """
+    params = event.get('queryStringParameters', {}) or {}
+    since = params.get('since')
+    try:
+        timeout = max(0.0, min(float(params.get('timeout', STATUS_WAIT_MAX_SECONDS)), STATUS_WAIT_MAX_SECONDS))
+    except ValueError:
+        return response(400, {'message': 'timeout must be a number'})
+    
+    order_id = identifier
+    if identifier.startswith('arn:aws:states:'):
+        # ...:execution:<machine>:<name> or ...:express:<machine>:<name>:<id>
+        parts = identifier.split(':')
+        order_id = order_id_from_name(parts[-2] if len(parts) > 6 and parts[5] == 'express' else parts[-1])
+    
+    conn = get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    
+    try:
+        # LISTEN before reading so a change in between is not missed
+        cur.execute("LISTEN order_status")
+        state = read_order_state(cur, order_id)
+        if state is None:
+            return response(404, {'message': 'Order not found'})
+        
+        deadline = time.monotonic() + timeout
+        with metrics.timer('StatusWait'):
+            while state['version'] == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if select.select([conn], [], [], remaining) == ([], [], []):
+                    break
+                conn.poll()
+                relevant = any(notify.payload == order_id for notify in conn.notifies)
+                del conn.notifies[:]
+                if relevant:
+                    state = read_order_state(cur, order_id)
+        
+        state['changed'] = state['version'] != since
+        return response(200, state)
+    finally:
+        cur.close()
+        conn.close()
+
+@metrics.handler
 def lambda_handler(event, context):
+    # */* binary media type: API Gateway base64-encodes JSON bodies too
+    event = decode_request_body(event)
+    result = route_request(event, context)
+    body = result.get('body') if isinstance(result, dict) else None
+    result = compress_response(event, result)
+    if isinstance(result, dict) and result.get('isBase64Encoded') and isinstance(body, str):
+        metrics.size('UncompressedBody', len(body.encode('utf-8')))
+        metrics.set_property('ContentEncoding', result['headers'].get('Content-Encoding'))
+    return result
+
+def route_request(event, context):
     print(f"Event received: {json.dumps(event, indent=2)}")
     
     http_method = event.get('httpMethod', '')
     resource = event.get('resource', '')  # Gunakan resource, bukan path!
+    metrics.set_dimension('Route', f"{http_method} {resource}")
     
     print(f"DEBUG - Method: {http_method}, Resource: {resource}")
     
@@ -709,6 +1749,12 @@ def lambda_handler(event, context):
             print("Routing to list_customers")
             return list_customers(event)
         
+        elif resource == '/customers/{id}/summary' and http_method == 'GET':
+            print("Routing to get_customer_summary")
+            if not event.get('pathParameters') or 'id' not in event['pathParameters']:
+                return response(400, {'message': 'Customer ID is required'})
+            return get_customer_summary(event['pathParameters']['id'], event)
+        
         elif resource == '/products' and http_method == 'GET':
             print("Routing to list_products")
             return list_products(event)
@@ -720,13 +1766,27 @@ def lambda_handler(event, context):
         elif resource == '/orders' and http_method == 'POST':
             print("Routing to create_order")
             return create_order(event)
+        
+        elif resource == '/orders' and http_method == 'DELETE':
+            print("Routing to bulk_delete_orders")
+            return bulk_delete_orders(event)
+            
+        elif resource == '/orders/status' and http_method == 'PUT':
+            print("Routing to bulk_update_order_status")
+            return bulk_update_order_status(event)
             
         elif resource == '/orders/{id}' and http_method == 'GET':
             print("Routing to get_order")
             if not event.get('pathParameters') or 'id' not in event['pathParameters']:
                 return response(400, {'message': 'Order ID is required'})
             order_id = event['pathParameters']['id']
-            return get_order(order_id)
+            return get_order(order_id, event)
+        
+        elif resource == '/orders/{id}/events' and http_method == 'GET':
+            print("Routing to list_order_events")
+            if not event.get('pathParameters') or 'id' not in event['pathParameters']:
+                return response(400, {'message': 'Order ID is required'})
+            return list_order_events(event['pathParameters']['id'], event)
             
         elif resource == '/orders/{id}' and http_method == 'PUT':
             print("Routing to update_order")
@@ -749,13 +1809,19 @@ def lambda_handler(event, context):
             identifier = event['pathParameters']['id']
             return get_workflow_status(identifier)
         
+        elif resource == '/status/{id}/wait' and http_method == 'GET':
+            print("Routing to wait_for_status")
+            if not event.get('pathParameters') or 'id' not in event['pathParameters']:
+                return response(400, {'message': 'Order ID or Execution ARN is required'})
+            return wait_for_status(event['pathParameters']['id'], event)
+        
         elif resource == '/executions' and http_method == 'GET':
             print("Routing to list_executions")
             return list_executions(event)
         
         else:
             print(f"NO ROUTE MATCHED - Method: {http_method}, Resource: {resource}")
-            print(f"Available resources: /customers, /products, /orders, /orders/{{id}}, /status/{{id}}, /executions")
+            print(f"Available resources: /customers, /customers/{{id}}/summary, /products, /orders, /orders/{{id}}, /orders/{{id}}/events, /status/{{id}}, /status/{{id}}/wait, /executions")
             return response(400, {
                 'message': 'Invalid request',
                 'debug_info': {
@@ -763,13 +1829,18 @@ def lambda_handler(event, context):
                     'resource': resource,
                     'available_routes': [
                         'GET /customers',
+                        'GET /customers/{id}/summary',
                         'GET /products',
                         'GET /orders',
                         'POST /orders',
+                        'DELETE /orders',
+                        'PUT /orders/status',
                         'GET /orders/{id}',
+                        'GET /orders/{id}/events',
                         'PUT /orders/{id}',
                         'DELETE /orders/{id}',
                         'GET /status/{id}',
+                        'GET /status/{id}/wait',
                         'GET /executions'
                     ]
                 }
@@ -0,0 +1,51 @@
+"""
+JSON serialization for API responses.
+
+Uses orjson when it is installed and falls back to the stdlib json module.
+Both paths handle Decimal (as float) and date/datetime (ISO 8601), so
+handlers can pass database values through without converting each field.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=_default)
+
+
+def records(columns, rows):
+    """Map row tuples onto column names without per-field conversion"""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def rows_payload(columns, rows, columnar=False):
+    """
+    Row data for a response body. columnar=True returns
+    {"columns": [...], "rows": [[...], ...]}, which serializes the row
+    tuples as-is and skips building a dict per row.
+    """
+    if columnar:
+        return {'columns': list(columns), 'rows': rows}
+    return records(columns, rows)
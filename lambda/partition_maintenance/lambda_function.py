@@ -0,0 +1,225 @@
+import gzip
+import io
+import os
+import re
+import traceback
+from datetime import date, datetime
+
+import boto3
+import psycopg2
+from psycopg2 import sql
+from instrumentation import Metrics
+from customer_metrics import archive_orders
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+S3_BUCKET = os.environ.get("S3_BUCKET")
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_RETENTION_MONTHS = int(os.environ.get("PARTITION_RETENTION_MONTHS", "12"))
+# archive = export to S3 then drop, detach = keep as standalone tables
+PARTITION_ARCHIVE_MODE = os.environ.get("PARTITION_ARCHIVE_MODE", "archive")
+
+PARTITION_NAME = re.compile(r"^orders_p(\d{6})$")
+
+metrics = Metrics("partition_maintenance")
+s3_client = metrics.instrument_client(boto3.client("s3"))
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+def retention_cutoff(today, retention_months):
+    """First day of the oldest month that is kept"""
+    months = today.year * 12 + (today.month - 1) - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def list_monthly_partitions(cur):
+    """Return YYYYMM suffixes of the monthly partitions attached to orders"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'orders'::regclass
+        ORDER BY c.relname;
+    """)
+    suffixes = []
+    for (relname,) in cur.fetchall():
+        match = PARTITION_NAME.match(relname)
+        if match:
+            suffixes.append(match.group(1))
+    return suffixes
+
+
+def is_attached(cur, parent, child):
+    cur.execute("""
+        SELECT 1 FROM pg_inherits
+        WHERE inhparent = %s::regclass
+        AND inhrelid = to_regclass(%s);
+    """, (parent, child))
+    return cur.fetchone() is not None
+
+
+def detach_partition(cur, parent, child):
+    if is_attached(cur, parent, child):
+        cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+            sql.Identifier(parent), sql.Identifier(child)
+        ))
+
+
+def drop_foreign_keys_to(cur, table_name, referenced):
+    """Drop FKs that a detached order_items partition still holds on orders"""
+    cur.execute("""
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = to_regclass(%s)
+        AND confrelid = %s::regclass
+        AND contype = 'f';
+    """, (table_name, referenced))
+    for (conname,) in cur.fetchall():
+        cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(
+            sql.Identifier(table_name), sql.Identifier(conname)
+        ))
+
+
+def archive_table(cur, table_name):
+    """Export a detached partition to S3 as gzipped CSV and return the key"""
+    buffer = io.StringIO()
+    cur.copy_expert(
+        sql.SQL("COPY {} TO STDOUT WITH CSV HEADER").format(
+            sql.Identifier(table_name)
+        ).as_string(cur),
+        buffer
+    )
+    key = f"archive/orders/{table_name}.csv.gz"
+    s3_client.put_object(
+        Bucket=S3_BUCKET,
+        Key=key,
+        Body=gzip.compress(buffer.getvalue().encode("utf-8")),
+        ContentType="text/csv",
+        ContentEncoding="gzip"
+    )
+    return key
+
+
+def retire_partition(cur, conn, suffix, archive_mode):
+    """
+    Detach one month of order_items and orders.
+
+    order_items goes first: its detached copy keeps an FK on orders, which
+    would otherwise block detaching the referenced orders partition.
+    The orders are added to customer_metrics' archived baseline first.
+    """
+    items_table = f"order_items_p{suffix}"
+    orders_table = f"orders_p{suffix}"
+    result = {"month": suffix, "tables": []}
+
+    for parent, child in (("order_items", items_table), ("orders", orders_table)):
+        cur.execute("SELECT to_regclass(%s);", (child,))
+        if cur.fetchone()[0] is None:
+            continue
+
+        if parent == "orders" and is_attached(cur, parent, child):
+            # Committed with the detach: no delete trigger fires for these orders
+            archive_orders(cur, child)
+        detach_partition(cur, parent, child)
+        if parent == "order_items":
+            drop_foreign_keys_to(cur, child, "orders")
+        conn.commit()
+
+        if archive_mode == "archive":
+            key = archive_table(cur, child)
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(child)))
+            conn.commit()
+            result["tables"].append({"table": child, "archived_to": key})
+            print(f"📦 Archived {child} to s3://{S3_BUCKET}/{key}")
+        else:
+            result["tables"].append({"table": child, "detached": True})
+            print(f"🔌 Detached {child}")
+
+    return result
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Scheduled partition maintenance for orders / order_items.
+    Pre-creates future monthly partitions and retires months older than
+    the retention window. No-op when the tables are not partitioned.
+    """
+    print("🗓 PARTITION MAINTENANCE STARTED")
+
+    event = event or {}
+    months_ahead = int(event.get("months_ahead", PARTITION_MONTHS_AHEAD))
+    retention_months = int(event.get("retention_months", PARTITION_RETENTION_MONTHS))
+    archive_mode = event.get("archive_mode", PARTITION_ARCHIVE_MODE)
+
+    if archive_mode not in ("archive", "detach"):
+        return {
+            "status": "error",
+            "message": f"Invalid archive_mode: {archive_mode}"
+        }
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT relkind FROM pg_class
+            WHERE relname = 'orders' AND relnamespace = 'public'::regnamespace;
+        """)
+        row = cur.fetchone()
+        if not row or row[0] != 'p':
+            print("⏭ orders is not partitioned, nothing to do")
+            return {
+                "status": "skipped",
+                "message": "orders is not a partitioned table"
+            }
+
+        cur.execute("SELECT create_order_partitions(%s);", (months_ahead,))
+        created = cur.fetchone()[0]
+        conn.commit()
+        print(f"✅ Future partitions ready ({created} created)")
+
+        cutoff = retention_cutoff(datetime.utcnow().date(), retention_months)
+        cutoff_suffix = cutoff.strftime("%Y%m")
+        retired = []
+        for suffix in list_monthly_partitions(cur):
+            if suffix < cutoff_suffix:
+                retired.append(retire_partition(cur, conn, suffix, archive_mode))
+
+        print(f"🎉 PARTITION MAINTENANCE DONE ({len(retired)} months retired)")
+
+        return {
+            "status": "success",
+            "partitions_created": created,
+            "retention_cutoff": str(cutoff),
+            "archive_mode": archive_mode,
+            "retired": retired,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        conn.rollback()
+        print("🔥 PARTITION MAINTENANCE FAILED")
+        print(traceback.format_exc())
+        return {
+            "status": "error",
+            "message": f"Partition maintenance failed: {str(e)}"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
@@ -1,52 +1,130 @@
 import json
+import os
 import random
 import time
+from instrumentation import Metrics
+from order_events import lock_order, order_event, previous_event, write_order_events
+from workflow_payload import parse_payload
 
+# Environment variables (optional: without DB_HOST no order events are written)
+DB_HOST = os.environ.get('DB_HOST')
+DB_NAME = os.environ.get('DB_NAME')
+DB_USER = os.environ.get('DB_USER')
+DB_PASSWORD = os.environ.get('DB_PASSWORD')
+
+metrics = Metrics('process_payment')
+
+def get_db_connection():
+    # Imported here: the function ships without a DB driver when DB_HOST is unset
+    import psycopg2
+    with metrics.timer('DbConnect'):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+def charge(order_id, total_amount):
+    """Simulated payment gateway call"""
+    # Simulate payment processing delay
+    with metrics.timer('PaymentGateway'):
+        time.sleep(1)
+    
+    # Simulate payment success/failure
+    payment_success = random.random() < 0.9
+    
+    current_time = int(time.time())
+    
+    if payment_success:
+        payment_status = 'success'
+        transaction_id = f"TXN-{order_id[:8] if len(order_id) >= 8 else order_id}-{current_time}"
+        message = 'Payment processed successfully'
+    else:
+        payment_status = 'failed'
+        transaction_id = None
+        message = 'Payment processing failed'
+    
+    return {
+        'paymentStatus': payment_status,  # PERHATIKAN: camelCase
+        'transaction_id': transaction_id, # snake_case
+        'message': message,
+        'timestamp': current_time
+    }
+
+def payment_event(order_id, total_amount, response):
+    return order_event(
+        order_id,
+        'payment_succeeded' if response['paymentStatus'] == 'success' else 'payment_failed',
+        'process_payment',
+        detail={'amount': total_amount, 'message': response['message']},
+        payment_status=response['paymentStatus'],
+        transaction_id=response['transaction_id']
+    )
+
+def charge_once(order_id, total_amount):
+    """
+    Charge unless this order was already charged successfully. The order row
+    stays locked until the result is recorded, so a retried step or an
+    Express and a Standard run of the same order cannot both charge it.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        lock_order(cur, order_id)
+        previous = previous_event(cur, order_id, 'payment_succeeded')
+        if previous:
+            conn.rollback()
+            print(f"Order {order_id} already paid ({previous['transaction_id']})")
+            return {
+                'paymentStatus': 'success',
+                'transaction_id': previous['transaction_id'],
+                'message': 'Payment already processed',
+                'timestamp': int(previous['created_at'].timestamp())
+            }
+        
+        response = charge(order_id, total_amount)
+        try:
+            write_order_events(cur, [payment_event(order_id, total_amount, response)])
+            conn.commit()
+        except Exception as e:
+            # The charge happened; don't report it as failed
+            conn.rollback()
+            print(f"Error recording payment: {str(e)}")
+        return response
+    finally:
+        cur.close()
+        conn.close()
+
+@metrics.handler
 def lambda_handler(event, context):
     """
-    Simulate payment processing
+    Simulate payment processing. With DB_HOST the step is idempotent per
+    order: a repeated call returns the earlier successful payment.
     """
     try:
         print(f"=== PAYMENT PROCESSING START ===")
         print(f"Event received: {json.dumps(event, indent=2)}")
         
         # Extract data
-        order_id = event.get('order_id')
-        total_amount = event.get('total_amount', 0)
-        
-        print(f"Processing payment - Order ID: {order_id}, Amount: {total_amount}")
-        
-        if not order_id:
+        try:
+            payload = parse_payload(event)
+        except ValueError as e:
             return {
                 'paymentStatus': 'error',
-                'message': 'Order ID is required',
+                'message': str(e),
                 'timestamp': int(time.time())
             }
+        order_id = payload['order_id']
+        total_amount = payload['total_amount']
         
-        # Simulate payment processing delay
-        time.sleep(1)
-        
-        # Simulate payment success/failure
-        payment_success = random.random() < 0.9
-        
-        current_time = int(time.time())
-        order_id_str = str(order_id)
+        print(f"Processing payment - Order ID: {order_id}, Amount: {total_amount}")
         
-        if payment_success:
-            payment_status = 'success'
-            transaction_id = f"TXN-{order_id_str[:8] if len(order_id_str) >= 8 else order_id_str}-{current_time}"
-            message = 'Payment processed successfully'
+        if DB_HOST:
+            response = charge_once(order_id, total_amount)
         else:
-            payment_status = 'failed'
-            transaction_id = None
-            message = 'Payment processing failed'
-        
-        response = {
-            'paymentStatus': payment_status,  # PERHATIKAN: camelCase
-            'transaction_id': transaction_id, # snake_case
-            'message': message,
-            'timestamp': current_time
-        }
+            response = charge(order_id, total_amount)
         
         print(f"=== PAYMENT PROCESSING END ===")
         print(f"Returning response: {json.dumps(response, indent=2)}")
@@ -0,0 +1,86 @@
+import os
+import traceback
+from datetime import datetime
+
+import psycopg2
+from instrumentation import Metrics
+from stock_reservations import expire_reservations
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+REAPER_BATCH_SIZE = int(os.environ.get("REAPER_BATCH_SIZE", "500"))
+REAPER_MAX_BATCHES = int(os.environ.get("REAPER_MAX_BATCHES", "20"))
+
+metrics = Metrics("reservation_reaper")
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Scheduled cleanup of stock reservations whose order never reached
+    update_inventory (abandoned workflow, failed start). Expired rows give
+    their stock back to inventory.reserved_quantity.
+    """
+    print("⏳ RESERVATION REAPER STARTED")
+
+    event = event or {}
+    batch_size = int(event.get("batch_size", REAPER_BATCH_SIZE))
+    max_batches = int(event.get("max_batches", REAPER_MAX_BATCHES))
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        expired = 0
+        batches = 0
+        has_more = False
+        # Short transactions: each batch commits before the next one
+        while batches < max_batches:
+            count = expire_reservations(cur, batch_size)
+            conn.commit()
+            batches += 1
+            expired += count
+            if count < batch_size:
+                break
+        else:
+            has_more = True
+
+        metrics.count("ReservationsExpired", expired)
+        print(f"🎉 RESERVATION REAPER DONE ({expired} expired in {batches} batches)")
+
+        return {
+            "status": "success",
+            "expired": expired,
+            "batches": batches,
+            "has_more": has_more,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        conn.rollback()
+        print("🔥 RESERVATION REAPER FAILED")
+        print(traceback.format_exc())
+        return {
+            "status": "error",
+            "message": f"Reservation reaper failed: {str(e)}"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
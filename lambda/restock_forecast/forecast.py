@@ -0,0 +1,42 @@
+"""
+Sales velocity and stock thresholds for restock_forecast, vectorized over
+every product at once with numpy. No database access, so it can be tested
+and reused on its own.
+"""
+import numpy as np
+
+
+def forecast(product_ids, stock, sales, window_days,
+             lead_time_days=7, safety_days=7, min_critical=1, min_low=5):
+    """
+    product_ids: sorted array of ids; stock: stock per product (same order);
+    sales: [(product_id, day index within the window, units)]. Sales rows
+    for unknown products or days outside the window are ignored.
+
+    Returns a dict of arrays aligned with product_ids: units_sold,
+    daily_velocity, days_until_stockout (NaN without sales),
+    critical_threshold (velocity x lead time) and low_threshold
+    (velocity x (lead time + safety days)), each at least its minimum.
+    """
+    units = np.zeros((len(product_ids), window_days))
+    if sales and len(product_ids):
+        sold_ids, days, quantities = (np.array(column) for column in zip(*sales))
+        rows = np.searchsorted(product_ids, sold_ids)
+        known = (rows < len(product_ids)) & (product_ids[np.minimum(rows, len(product_ids) - 1)] == sold_ids)
+        days = days.astype(int)
+        known &= (days >= 0) & (days < window_days)
+        np.add.at(units, (rows[known], days[known]), quantities[known])
+
+    units_sold = units.sum(axis=1)
+    velocity = units_sold / window_days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_until_stockout = np.where(velocity > 0, stock / velocity, np.nan)
+    critical = np.maximum(np.ceil(velocity * lead_time_days), min_critical)
+    low = np.maximum(np.ceil(velocity * (lead_time_days + safety_days)), min_low)
+    return {
+        "units_sold": units_sold.astype(int),
+        "daily_velocity": velocity.round(3),
+        "days_until_stockout": days_until_stockout.round(1),
+        "critical_threshold": critical.astype(int),
+        "low_threshold": np.maximum(low, critical).astype(int)
+    }
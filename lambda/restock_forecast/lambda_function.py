@@ -0,0 +1,145 @@
+import os
+import traceback
+from datetime import datetime, timedelta
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+from instrumentation import Metrics
+from forecast import forecast
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+FORECAST_WINDOW_DAYS = int(os.environ.get("FORECAST_WINDOW_DAYS", "28"))
+# Days a restock takes to arrive; stock below that much demand is critical
+RESTOCK_LEAD_TIME_DAYS = float(os.environ.get("RESTOCK_LEAD_TIME_DAYS", "7"))
+# Extra days of cover on top of the lead time before stock counts as low
+RESTOCK_SAFETY_DAYS = float(os.environ.get("RESTOCK_SAFETY_DAYS", "7"))
+MIN_CRITICAL_THRESHOLD = int(os.environ.get("MIN_CRITICAL_THRESHOLD", "1"))
+MIN_LOW_THRESHOLD = int(os.environ.get("MIN_LOW_THRESHOLD", "5"))
+
+metrics = Metrics("restock_forecast")
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+def daily_sales(cur, start, end):
+    """(product_id, day index from start, units) of counted orders in [start, end)"""
+    # Range predicate on created_at so partitioned orders prune to the window
+    cur.execute("""
+        SELECT oi.product_id,
+               (o.created_at::date - %s::date) AS day,
+               SUM(oi.quantity)::integer AS units
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE o.created_at >= %s AND o.created_at < %s
+          AND COALESCE(o.status, 'pending') NOT IN ('cancelled', 'failed')
+        GROUP BY 1, 2
+    """, (start, start, end))
+    return cur.fetchall()
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Scheduled restock forecast: per-product daily sales velocity over the
+    last window_days, projected days until stockout, and the critical/low
+    thresholds update_inventory and generate_report use (stock_thresholds.py).
+    Every product is computed in one pass and written with one statement.
+    """
+    print("📈 RESTOCK FORECAST STARTED")
+
+    event = event or {}
+    window_days = int(event.get("window_days", FORECAST_WINDOW_DAYS))
+    end = datetime.now().date() + timedelta(days=1)
+    start = end - timedelta(days=window_days)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT product_id, stock_quantity FROM inventory")
+        # Sorted here, not by the database collation, for np.searchsorted
+        inventory = sorted(cur.fetchall())
+        if not inventory:
+            return {"status": "success", "products": 0}
+
+        product_ids = np.array([row[0] for row in inventory])
+        stock = np.array([row[1] for row in inventory], dtype=float)
+        sales = daily_sales(cur, start, end)
+
+        with metrics.timer("ForecastCompute"):
+            result = forecast(
+                product_ids, stock, sales, window_days,
+                lead_time_days=RESTOCK_LEAD_TIME_DAYS,
+                safety_days=RESTOCK_SAFETY_DAYS,
+                min_critical=MIN_CRITICAL_THRESHOLD,
+                min_low=MIN_LOW_THRESHOLD
+            )
+
+        rows = [
+            (
+                str(product_ids[i]), window_days, int(result["units_sold"][i]),
+                float(result["daily_velocity"][i]), int(stock[i]),
+                None if np.isnan(result["days_until_stockout"][i]) else float(result["days_until_stockout"][i]),
+                int(result["critical_threshold"][i]), int(result["low_threshold"][i])
+            )
+            for i in range(len(product_ids))
+        ]
+        execute_values(cur, """
+            INSERT INTO restock_forecast (
+                product_id, window_days, units_sold, daily_velocity, stock_quantity,
+                days_until_stockout, critical_threshold, low_threshold
+            )
+            VALUES %s
+            ON CONFLICT (product_id) DO UPDATE
+            SET window_days = EXCLUDED.window_days,
+                units_sold = EXCLUDED.units_sold,
+                daily_velocity = EXCLUDED.daily_velocity,
+                stock_quantity = EXCLUDED.stock_quantity,
+                days_until_stockout = EXCLUDED.days_until_stockout,
+                critical_threshold = EXCLUDED.critical_threshold,
+                low_threshold = EXCLUDED.low_threshold,
+                computed_at = CURRENT_TIMESTAMP
+        """, rows, page_size=1000)
+        conn.commit()
+
+        at_risk = int((stock < result["critical_threshold"]).sum())
+        metrics.count("ProductsForecast", len(rows))
+        metrics.count("ProductsCritical", at_risk)
+        print(f"🎉 RESTOCK FORECAST DONE ({len(rows)} products, {at_risk} critical)")
+
+        return {
+            "status": "success",
+            "products": len(rows),
+            "critical": at_risk,
+            "window_days": window_days,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        conn.rollback()
+        print("🔥 RESTOCK FORECAST FAILED")
+        print(traceback.format_exc())
+        return {
+            "status": "error",
+            "message": f"Restock forecast failed: {str(e)}"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
@@ -2,14 +2,77 @@ import json
 import os
 import boto3
 from datetime import datetime
+from instrumentation import Metrics
+from order_events import order_event, previous_event, record_order_events
+from workflow_payload import parse_payload
 
 # ==============================
 # AWS CLIENT
 # ==============================
-sns_client = boto3.client("sns")
+metrics = Metrics("send_notification")
+sns_client = metrics.instrument_client(boto3.client("sns"))
 SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
 
+# Optional: without DB_HOST no order events are written
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+
+
+def get_db_connection():
+    # Imported here: the function ships without a DB driver when DB_HOST is unset
+    import psycopg2
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+def record_notification(order_id, notification_type, notification_status, detail):
+    """Order history entry for notifications that belong to an order"""
+    if not DB_HOST or order_id in (None, "UNKNOWN") or notification_type == "low_stock":
+        return
+    record_order_events([order_event(
+        order_id,
+        f"notification_{notification_status}",
+        "send_notification",
+        detail=dict(detail, notification_type=notification_type),
+        notification_status=f"{notification_type}:{notification_status}"
+    )], get_db_connection)
+
 
+def previous_notification(order_id, notification_type):
+    """
+    Earlier successful notification of this type for the order, so a retried
+    step or a second workflow run does not notify the customer twice.
+    Lookup errors count as "not sent": better a duplicate than a lost message.
+    """
+    if not DB_HOST or order_id in (None, "UNKNOWN") or notification_type == "low_stock":
+        return None
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        previous = previous_event(
+            cur, order_id, "notification_sent",
+            notification_status=f"{notification_type}:sent"
+        )
+        cur.close()
+        return previous
+    except Exception as e:
+        print("⚠️ Could not check previous notifications:", str(e))
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+
+@metrics.handler
 def lambda_handler(event, context):
     """
     Send notifications via SNS
@@ -20,14 +83,37 @@ def lambda_handler(event, context):
     print(json.dumps(event, indent=2))
 
     try:
+        # EventBridge rules (e.g. Order Status Change) deliver the payload in "detail"
+        if "detail-type" in event and isinstance(event.get("detail"), dict):
+            event = event["detail"]
+
         # ==============================
         # COMMON FIELDS
         # ==============================
-        order_id = event.get("order_id", "UNKNOWN")
         notification_type = event.get("notification_type", "system_error")
         error_message = event.get("error_message", "-")
         amount = event.get("amount", 0)
         transaction_id = event.get("transaction_id", "N/A")
+        order_id = event.get("order_id", "UNKNOWN")
+
+        # Workflow payload passed through by the state machine
+        if "schemaVersion" in event:
+            payload = parse_payload(event)
+            order_id = payload["order_id"]
+            amount = event.get("amount", payload["total_amount"])
+            transaction_id = payload["transaction_id"] or transaction_id
+
+        previous = previous_notification(order_id, notification_type)
+        if previous:
+            print("↩️ Notification already sent:", previous["detail"].get("message_id"))
+            return {
+                "status": "success",
+                "order_id": order_id,
+                "notification_type": notification_type,
+                "message_id": previous["detail"].get("message_id"),
+                "duplicate": True,
+                "timestamp": datetime.utcnow().isoformat()
+            }
 
         # ==============================
         # BUILD MESSAGE
@@ -114,6 +200,7 @@ Immediate investigation is required.
         )
 
         print("✅ SNS message sent:", response["MessageId"])
+        record_notification(order_id, notification_type, "sent", {"message_id": response["MessageId"]})
 
         return {
             "status": "success",
@@ -125,6 +212,8 @@ Immediate investigation is required.
 
     except Exception as e:
         print("❌ Error sending notification:", str(e))
+        if "order_id" in locals():
+            record_notification(order_id, notification_type, "failed", {"error": str(e)})
 
         # IMPORTANT:
         # Jangan raise exception supaya Step Function tidak FAILED total
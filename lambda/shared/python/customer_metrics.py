@@ -0,0 +1,161 @@
+"""
+Lifetime metrics per customer (customer_metrics table): order count,
+lifetime value, first and last order date. The customer_metrics_track
+trigger on orders (installed by init_database) applies every insert,
+status/amount change and delete as a delta, so GET /customers/{id}/summary
+reads one row. customer_metrics_reconcile re-derives the rows from orders
+on a schedule to repair drift (e.g. last_order_at after a delete).
+Dropping an orders partition fires no delete triggers, so partition_maintenance
+first adds its orders to the customer's archived_* baseline (archive_orders)
+and reconciliation counts that baseline on top of the live orders.
+Cancelled and failed orders count as orders but not towards lifetime value.
+All functions run on the caller's cursor; the caller commits.
+"""
+
+from psycopg2 import sql
+
+UNCOUNTED_STATUSES = ('cancelled', 'failed')
+
+# Installed by init_database; keep in step with reconcile_batch
+TRACK_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION track_customer_metrics() RETURNS trigger AS $$
+    DECLARE
+        old_value NUMERIC := 0;
+        new_value NUMERIC := 0;
+    BEGIN
+        IF TG_OP <> 'INSERT' AND COALESCE(OLD.status, 'pending') NOT IN ('cancelled', 'failed') THEN
+            old_value := OLD.total_amount;
+        END IF;
+        IF TG_OP <> 'DELETE' AND COALESCE(NEW.status, 'pending') NOT IN ('cancelled', 'failed') THEN
+            new_value := NEW.total_amount;
+        END IF;
+
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO customer_metrics
+                (customer_id, order_count, lifetime_value, first_order_at, last_order_at)
+            VALUES (NEW.customer_id, 1, new_value, NEW.created_at, NEW.created_at)
+            ON CONFLICT (customer_id) DO UPDATE
+            SET order_count = customer_metrics.order_count + 1,
+                lifetime_value = customer_metrics.lifetime_value + EXCLUDED.lifetime_value,
+                first_order_at = LEAST(customer_metrics.first_order_at, EXCLUDED.first_order_at),
+                last_order_at = GREATEST(customer_metrics.last_order_at, EXCLUDED.last_order_at),
+                updated_at = CURRENT_TIMESTAMP;
+        ELSIF TG_OP = 'UPDATE' THEN
+            IF new_value <> old_value THEN
+                UPDATE customer_metrics
+                SET lifetime_value = lifetime_value + new_value - old_value,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE customer_id = NEW.customer_id;
+            END IF;
+        ELSE
+            -- first/last order dates are left for reconciliation
+            UPDATE customer_metrics
+            SET order_count = GREATEST(order_count - 1, 0),
+                lifetime_value = lifetime_value - old_value,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE customer_id = OLD.customer_id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def archive_orders(cur, table_name):
+    """
+    Add the orders of table_name, an orders partition about to be detached,
+    to the archived_* baseline of their customers. Run it in the transaction
+    that detaches the partition, so the orders are never counted twice or
+    lost. Returns the number of customers updated.
+    """
+    cur.execute(sql.SQL("""
+        INSERT INTO customer_metrics (
+            customer_id, archived_order_count, archived_lifetime_value,
+            archived_first_order_at, archived_last_order_at
+        )
+        SELECT customer_id,
+               COUNT(*)::integer,
+               COALESCE(SUM(total_amount) FILTER (
+                   WHERE COALESCE(status, 'pending') <> ALL(%s)
+               ), 0),
+               MIN(created_at),
+               MAX(created_at)
+        FROM {}
+        GROUP BY customer_id
+        ON CONFLICT (customer_id) DO UPDATE
+        SET archived_order_count = customer_metrics.archived_order_count + EXCLUDED.archived_order_count,
+            archived_lifetime_value = customer_metrics.archived_lifetime_value + EXCLUDED.archived_lifetime_value,
+            archived_first_order_at = LEAST(customer_metrics.archived_first_order_at, EXCLUDED.archived_first_order_at),
+            archived_last_order_at = GREATEST(customer_metrics.archived_last_order_at, EXCLUDED.archived_last_order_at),
+            updated_at = CURRENT_TIMESTAMP
+    """).format(sql.Identifier(table_name)), (list(UNCOUNTED_STATUSES),))
+    return cur.rowcount
+
+
+def reconcile_batch(cur, after_customer_id, batch_size):
+    """
+    Recompute the metrics of the next batch_size customers after
+    after_customer_id ('' to start) from orders plus the archived_*
+    baseline of retired partitions. Their metrics rows are locked first,
+    so orders created meanwhile wait instead of being overwritten.
+    Returns (last customer_id of the batch or None when done, rows corrected).
+    """
+    cur.execute("""
+        SELECT customer_id FROM customers
+        WHERE customer_id > %s
+        ORDER BY customer_id
+        LIMIT %s
+    """, (after_customer_id, batch_size))
+    customer_ids = [row[0] for row in cur.fetchall()]
+    if not customer_ids:
+        return None, 0
+
+    cur.execute("""
+        SELECT customer_id FROM customer_metrics
+        WHERE customer_id = ANY(%s)
+        ORDER BY customer_id
+        FOR UPDATE
+    """, (customer_ids,))
+
+    cur.execute("""
+        WITH live AS (
+            SELECT c.customer_id,
+                   COUNT(o.order_id)::integer AS order_count,
+                   COALESCE(SUM(o.total_amount) FILTER (
+                       WHERE COALESCE(o.status, 'pending') <> ALL(%s)
+                   ), 0) AS lifetime_value,
+                   MIN(o.created_at) AS first_order_at,
+                   MAX(o.created_at) AS last_order_at
+            FROM unnest(%s::varchar[]) AS c(customer_id)
+            LEFT JOIN orders o ON o.customer_id = c.customer_id
+            GROUP BY c.customer_id
+        ), actual AS (
+            SELECT l.customer_id,
+                   l.order_count + COALESCE(m.archived_order_count, 0) AS order_count,
+                   l.lifetime_value + COALESCE(m.archived_lifetime_value, 0) AS lifetime_value,
+                   LEAST(l.first_order_at, m.archived_first_order_at) AS first_order_at,
+                   GREATEST(l.last_order_at, m.archived_last_order_at) AS last_order_at
+            FROM live l
+            LEFT JOIN customer_metrics m ON m.customer_id = l.customer_id
+        ), drifted AS (
+            SELECT a.*
+            FROM actual a
+            LEFT JOIN customer_metrics m ON m.customer_id = a.customer_id
+            WHERE (m.order_count, m.lifetime_value, m.first_order_at, m.last_order_at)
+                  IS DISTINCT FROM
+                  (a.order_count, a.lifetime_value, a.first_order_at, a.last_order_at)
+        ), written AS (
+            INSERT INTO customer_metrics
+                (customer_id, order_count, lifetime_value, first_order_at, last_order_at, reconciled_at)
+            SELECT customer_id, order_count, lifetime_value, first_order_at, last_order_at, CURRENT_TIMESTAMP
+            FROM actual
+            ON CONFLICT (customer_id) DO UPDATE
+            SET order_count = EXCLUDED.order_count,
+                lifetime_value = EXCLUDED.lifetime_value,
+                first_order_at = EXCLUDED.first_order_at,
+                last_order_at = EXCLUDED.last_order_at,
+                reconciled_at = EXCLUDED.reconciled_at
+        )
+        SELECT COUNT(*)::integer FROM drifted
+    """, (list(UNCOUNTED_STATUSES), customer_ids))
+    return customer_ids[-1], cur.fetchone()[0]
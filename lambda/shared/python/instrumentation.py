@@ -0,0 +1,212 @@
+"""
+Per-invocation performance metrics for the order system Lambdas.
+
+Every Lambda creates one Metrics object at import time and wires it in:
+
+    metrics = Metrics('order_management')
+    metrics.instrument_client(s3_client)        # times every AWS API call
+
+    psycopg2.connect(..., cursor_factory=metrics.cursor_factory)  # times every query
+
+    @metrics.handler
+    def lambda_handler(event, context): ...
+
+At the end of each invocation one CloudWatch Embedded Metric Format (EMF)
+line is printed, so CloudWatch turns it into metrics without log parsing.
+"""
+import functools
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import psycopg2.extensions
+except ImportError:  # process_payment / send_notification ship without a DB driver
+    psycopg2 = None
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'LKS/OrderSystem')
+
+# boto3 service name -> metric prefix
+AWS_SERVICE_NAMES = {
+    's3': 'S3',
+    'stepfunctions': 'StepFunctions',
+    'sns': 'SNS',
+    'events': 'EventBridge',
+    'sqs': 'SQS'
+}
+
+
+def payload_size(payload):
+    """Size in bytes of a payload as it would go over the wire"""
+    if payload is None:
+        return 0
+    if isinstance(payload, (bytes, bytearray)):
+        return len(payload)
+    if isinstance(payload, str):
+        return len(payload.encode('utf-8'))
+    if isinstance(payload, dict) and isinstance(payload.get('body'), str):
+        return len(payload['body'].encode('utf-8'))
+    return len(json.dumps(payload, default=str).encode('utf-8'))
+
+
+if psycopg2 is not None:
+    class InstrumentedCursor(psycopg2.extensions.cursor):
+        """psycopg2 cursor that reports every round trip to its Metrics"""
+        metrics = None
+
+        def execute(self, query, vars=None):
+            start = time.perf_counter()
+            try:
+                result = super().execute(query, vars)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.metrics.add_time('Db', elapsed_ms)
+            self.metrics.count('DbRows', max(self.rowcount, 0))
+            if self.metrics.profiler is not None:
+                self.metrics.profiler.record(self, query, vars, elapsed_ms)
+            return result
+
+        def executemany(self, query, vars_list):
+            with self.metrics.timer('Db'):
+                return super().executemany(query, vars_list)
+
+        def copy_expert(self, sql, file, size=8192):
+            with self.metrics.timer('Db'):
+                return super().copy_expert(sql, file, size)
+else:
+    InstrumentedCursor = None
+
+
+class Metrics:
+    def __init__(self, function_name, namespace=METRICS_NAMESPACE):
+        self.function_name = function_name
+        self.namespace = namespace
+        self.cold_start = True
+        # optional query_profiler.QueryProfiler fed by the cursor factory
+        self.profiler = None
+        self.cursor_factory = None
+        if InstrumentedCursor is not None:
+            self.cursor_factory = type('InstrumentedCursor', (InstrumentedCursor,), {'metrics': self})
+        self.reset()
+
+    def reset(self):
+        self.timings = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.sizes = defaultdict(int)
+        self.dimensions = {'Function': self.function_name}
+        self.properties = {}
+
+    # ------------------------------
+    # Recording
+    # ------------------------------
+    @contextmanager
+    def timer(self, name):
+        """Add elapsed milliseconds to <name>Time and one to <name>Calls"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, (time.perf_counter() - start) * 1000)
+
+    def add_time(self, name, elapsed_ms):
+        self.timings[f'{name}Time'] += elapsed_ms
+        self.counts[f'{name}Calls'] += 1
+
+    def count(self, name, value=1):
+        self.counts[name] += value
+
+    def size(self, name, nbytes):
+        self.sizes[f'{name}Bytes'] += nbytes
+
+    def set_dimension(self, name, value):
+        self.dimensions[name] = str(value)
+
+    def set_property(self, name, value):
+        self.properties[name] = value
+
+    # ------------------------------
+    # AWS SDK hooks
+    # ------------------------------
+    def instrument_client(self, client):
+        """Time every API call a boto3 client makes, with request/response sizes"""
+        service = client.meta.service_model.service_name
+        prefix = AWS_SERVICE_NAMES.get(service, service.title().replace('-', ''))
+
+        def before_call(context, **kwargs):
+            context['metrics_start'] = time.perf_counter()
+
+        def request_created(request, **kwargs):
+            # streaming bodies (e.g. S3 uploads from a file) are not measured
+            if isinstance(request.body, (bytes, bytearray, str)):
+                self.size(f'{prefix}Request', payload_size(request.body))
+
+        def after_call(context, http_response, **kwargs):
+            start = context.pop('metrics_start', None)
+            if start is not None:
+                self.add_time(prefix, (time.perf_counter() - start) * 1000)
+            self.size(f'{prefix}Response', len(http_response.content or b''))
+
+        client.meta.events.register('before-call', before_call)
+        client.meta.events.register('request-created', request_created)
+        client.meta.events.register('after-call', after_call)
+        return client
+
+    # ------------------------------
+    # Invocation lifecycle
+    # ------------------------------
+    def handler(self, fn):
+        """Decorate a lambda_handler: reset, time, and flush one EMF line"""
+        @functools.wraps(fn)
+        def wrapper(event, context):
+            self.reset()
+            self.size('Event', payload_size(event))
+            start = time.perf_counter()
+            try:
+                result = fn(event, context)
+                self.size('Result', payload_size(result))
+                if isinstance(result, dict) and 'statusCode' in result:
+                    self.set_property('StatusCode', result['statusCode'])
+                return result
+            except Exception:
+                self.count('Errors')
+                raise
+            finally:
+                self.timings['DurationTime'] = (time.perf_counter() - start) * 1000
+                if self.profiler is not None:
+                    self.profiler.end_invocation()
+                self.flush(context)
+        return wrapper
+
+    def to_emf(self, context=None):
+        metrics = (
+            [{'Name': name, 'Unit': 'Milliseconds'} for name in self.timings] +
+            [{'Name': name, 'Unit': 'Count'} for name in self.counts] +
+            [{'Name': name, 'Unit': 'Bytes'} for name in self.sizes]
+        )
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [list(self.dimensions)],
+                    'Metrics': metrics
+                }]
+            },
+            'ColdStart': self.cold_start
+        }
+        if context is not None and hasattr(context, 'aws_request_id'):
+            record['RequestId'] = context.aws_request_id
+        record.update(self.properties)
+        record.update(self.dimensions)
+        record.update({name: round(value, 3) for name, value in self.timings.items()})
+        record.update(self.counts)
+        record.update(self.sizes)
+        return record
+
+    def flush(self, context=None):
+        if METRICS_ENABLED:
+            print(json.dumps(self.to_emf(context), default=str))
+        self.cold_start = False
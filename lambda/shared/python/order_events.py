@@ -0,0 +1,121 @@
+"""
+Append-only order history (order_events table) written by the workflow
+Lambdas. Each batch is one statement that appends the events and copies
+the latest state of every order onto its orders row (payment_status,
+transaction_id, notification_status, last_event), so status and audit
+views read PostgreSQL instead of the Step Functions execution history.
+"""
+import json
+
+EVENT_COLUMNS = ('order_id', 'event_type', 'source', 'status', 'payment_status',
+                 'transaction_id', 'notification_status', 'detail')
+
+
+def order_event(order_id, event_type, source, detail=None, **state):
+    """
+    One event row. state may carry status, payment_status, transaction_id
+    and notification_status; whatever is set is copied onto the order.
+    """
+    unknown = set(state) - set(EVENT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown order event fields: {', '.join(sorted(unknown))}")
+    row = dict(state, order_id=str(order_id), event_type=event_type, source=source,
+               detail=json.dumps(detail, default=str) if detail is not None else None)
+    return tuple(row.get(column) for column in EVENT_COLUMNS)
+
+
+def write_order_events(cur, events):
+    """Append events and update the orders rows on the caller's transaction"""
+    if not events:
+        return 0
+    # Not at module level: process_payment / send_notification import this
+    # module but ship without a DB driver when DB_HOST is unset
+    from psycopg2.extras import execute_values
+    execute_values(cur, """
+        WITH inserted AS (
+            INSERT INTO order_events (order_id, event_type, source, status, payment_status,
+                                      transaction_id, notification_status, detail)
+            VALUES %s
+            RETURNING event_id, order_id, event_type, status, payment_status,
+                      transaction_id, notification_status, created_at
+        ), latest AS (
+            SELECT order_id,
+                   (array_agg(event_type ORDER BY event_id DESC))[1] AS event_type,
+                   (array_agg(status ORDER BY event_id DESC) FILTER (WHERE status IS NOT NULL))[1] AS status,
+                   (array_agg(payment_status ORDER BY event_id DESC) FILTER (WHERE payment_status IS NOT NULL))[1] AS payment_status,
+                   (array_agg(transaction_id ORDER BY event_id DESC) FILTER (WHERE transaction_id IS NOT NULL))[1] AS transaction_id,
+                   (array_agg(notification_status ORDER BY event_id DESC) FILTER (WHERE notification_status IS NOT NULL))[1] AS notification_status,
+                   MAX(created_at) AS created_at
+            FROM inserted
+            GROUP BY order_id
+        )
+        UPDATE orders o
+        SET status = COALESCE(l.status, o.status),
+            payment_status = COALESCE(l.payment_status, o.payment_status),
+            transaction_id = COALESCE(l.transaction_id, o.transaction_id),
+            notification_status = COALESCE(l.notification_status, o.notification_status),
+            last_event = l.event_type,
+            last_event_at = l.created_at,
+            updated_at = l.created_at
+        FROM latest l
+        WHERE o.order_id = l.order_id
+    """, events, template='(%s, %s, %s, %s, %s, %s, %s, %s::jsonb)', page_size=len(events))
+    return len(events)
+
+
+def lock_order(cur, order_id):
+    """
+    Row-lock the order until the caller's transaction ends, so two runs of
+    the same step for one order (retry, Express and Standard workflow both
+    running) take turns. Returns False when the order does not exist.
+    """
+    cur.execute("SELECT 1 FROM orders WHERE order_id = %s FOR UPDATE", (str(order_id),))
+    return cur.fetchone() is not None
+
+
+def previous_event(cur, order_id, event_type, **state):
+    """
+    Latest event_type event of the order whose fields match state, as a
+    dict, or None. Step handlers use it to return the result of a step that
+    already ran instead of running it again.
+    """
+    unknown = set(state) - set(EVENT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown order event fields: {', '.join(sorted(unknown))}")
+    conditions = ''.join(f' AND {column} = %s' for column in state)
+    cur.execute(f"""
+        SELECT event_id, {', '.join(EVENT_COLUMNS)}, created_at
+        FROM order_events
+        WHERE order_id = %s AND event_type = %s{conditions}
+        ORDER BY event_id DESC
+        LIMIT 1
+    """, (str(order_id), event_type, *state.values()))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip(('event_id',) + EVENT_COLUMNS + ('created_at',), row))
+
+
+def record_order_events(events, connect):
+    """
+    Write events on a connection of their own. Never raises: the history
+    must not fail the workflow step that produced it.
+    """
+    if not events:
+        return 0
+    conn = None
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        written = write_order_events(cur, events)
+        conn.commit()
+        cur.close()
+        return written
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️ Error recording order events: {str(e)}")
+        return 0
+    finally:
+        if conn:
+            conn.close()
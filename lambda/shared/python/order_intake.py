@@ -0,0 +1,83 @@
+"""
+Queued order intake (INTAKE_MODE=queue in order_management): POST /orders
+validates the request and enqueues one message per order, and the
+order_intake_worker Lambda writes and starts them in batches.
+
+ORDER_QUEUE_URL is an SQS queue URL, or memory:// for the in-process
+MemoryQueue stand-in used by local runs and tests.
+"""
+import json
+import uuid
+from collections import deque
+from datetime import datetime
+
+from workflow_payload import parse_items
+
+MEMORY_QUEUE_URL = 'memory://'
+
+
+def intake_message(order_id, customer_id, items, accepted_at=None):
+    """Message body; accepted_at becomes the order's created_at"""
+    return json.dumps({
+        'orderId': str(order_id),
+        'customerId': customer_id,
+        'items': [
+            {'productId': item['productId'], 'quantity': item['quantity']}
+            for item in parse_items(items)
+        ],
+        'acceptedAt': (accepted_at or datetime.now()).isoformat()
+    })
+
+
+def parse_intake_message(body):
+    """Message body -> dict with order_id, customer_id, items, accepted_at"""
+    message = json.loads(body)
+    if not message.get('orderId') or not message.get('customerId'):
+        raise ValueError('Intake message needs orderId and customerId')
+    return {
+        'order_id': str(message['orderId']),
+        'customer_id': message['customerId'],
+        'items': parse_items(message.get('items')),
+        'accepted_at': datetime.fromisoformat(message['acceptedAt'])
+    }
+
+
+class MemoryQueue:
+    """
+    In-process queue with the part of the SQS client API the intake uses.
+    Messages live as long as the process; use receive_event() to feed
+    order_intake_worker.lambda_handler.
+    """
+    def __init__(self):
+        self.messages = deque()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        message_id = str(uuid.uuid4())
+        self.messages.append({'messageId': message_id, 'body': MessageBody})
+        return {'MessageId': message_id}
+
+    def receive_event(self, max_messages=10):
+        """Up to max_messages messages as an SQS Lambda event"""
+        records = []
+        while self.messages and len(records) < max_messages:
+            record = self.messages.popleft()
+            records.append(dict(record, eventSource='aws:sqs'))
+        return {'Records': records}
+
+    def requeue(self, event, batch_response):
+        """Put the reported batchItemFailures back, as SQS would"""
+        failed = {item['itemIdentifier'] for item in batch_response.get('batchItemFailures', [])}
+        for record in event['Records']:
+            if record['messageId'] in failed:
+                self.messages.append({'messageId': record['messageId'], 'body': record['body']})
+        return len(failed)
+
+
+memory_queue = MemoryQueue()
+
+
+def queue_client(queue_url, sqs_client_factory):
+    """MemoryQueue for memory://, otherwise sqs_client_factory()"""
+    if queue_url == MEMORY_QUEUE_URL:
+        return memory_queue
+    return sqs_client_factory()
@@ -0,0 +1,223 @@
+"""
+SQL query profiler fed by instrumentation.InstrumentedCursor.
+
+    metrics.profiler = QueryProfiler('order_management', connect=get_db_connection)
+
+Every execution is aggregated under its normalized SQL (literals and
+placeholders replaced with ?): calls, parameter count, total/max time and
+rows. A QUERY_SAMPLE_RATE fraction (default 1%) of the statements slower
+than QUERY_SLOW_MS is sampled with its plan -
+EXPLAIN (ANALYZE, BUFFERS) for read-only statements, plain EXPLAIN for
+writes so they are never executed twice - into an in-memory ring buffer
+and, when QUERY_SAMPLE_TABLE is set, into that table.
+
+A top-N report by cumulative time is logged whenever an invocation
+captured a sample and every QUERY_PROFILE_REPORT_EVERY invocations.
+"""
+import json
+import os
+import random
+import re
+from collections import deque
+from datetime import datetime
+
+import psycopg2.extensions
+from psycopg2 import sql
+
+QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', '200'))
+# Fraction of slow statements sampled; raise it (up to 1.0) while investigating
+QUERY_SAMPLE_RATE = float(os.environ.get('QUERY_SAMPLE_RATE', '0.01'))
+QUERY_SAMPLE_BUFFER = int(os.environ.get('QUERY_SAMPLE_BUFFER', '50'))
+QUERY_MAX_EXPLAINS = int(os.environ.get('QUERY_MAX_EXPLAINS', '3'))
+QUERY_SAMPLE_TABLE = os.environ.get('QUERY_SAMPLE_TABLE')
+QUERY_PROFILE_TOP_N = int(os.environ.get('QUERY_PROFILE_TOP_N', '10'))
+QUERY_PROFILE_REPORT_EVERY = int(os.environ.get('QUERY_PROFILE_REPORT_EVERY', '50'))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_WRITE_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def query_text(cursor, query):
+    if isinstance(query, sql.Composable):
+        return query.as_string(cursor)
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    return query
+
+
+def normalize_sql(query):
+    """Collapse a statement to its shape so executions can be grouped"""
+    query = _STRING.sub('?', query)
+    query = _PLACEHOLDER.sub('?', query)
+    query = _NUMBER.sub('?', query)
+    query = _IN_LIST.sub('(...)', query)
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+def is_read_only(query):
+    head = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+    return head in ('SELECT', 'WITH') and not _WRITE_KEYWORDS.search(query)
+
+
+def param_count(vars):
+    if isinstance(vars, (list, tuple, dict)):
+        return len(vars)
+    return 0
+
+
+class QueryProfiler:
+    def __init__(self, function_name, connect=None):
+        self.function_name = function_name
+        # used only to persist samples when QUERY_SAMPLE_TABLE is set
+        self.connect = connect
+        self.stats = {}
+        self.samples = deque(maxlen=QUERY_SAMPLE_BUFFER)
+        self.pending_samples = []
+        self.explains = 0
+        self.invocations = 0
+
+    def record(self, cursor, query, vars, elapsed_ms):
+        text = query_text(cursor, query)
+        key = normalize_sql(text)
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats[key] = {
+                'query': key,
+                'params': param_count(vars),
+                'calls': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'rows': 0
+            }
+        stat['calls'] += 1
+        stat['total_ms'] += elapsed_ms
+        stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+        stat['rows'] += max(cursor.rowcount, 0)
+
+        if (elapsed_ms >= QUERY_SLOW_MS
+                and self.explains < QUERY_MAX_EXPLAINS
+                and random.random() < QUERY_SAMPLE_RATE):
+            self.explains += 1
+            self.sample(cursor, text, key, vars, elapsed_ms)
+
+    def sample(self, cursor, text, key, vars, elapsed_ms):
+        analyze = is_read_only(text)
+        options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+        plan = None
+        # A plain cursor so the EXPLAIN itself is not profiled, inside a
+        # savepoint so a failing EXPLAIN cannot abort the caller's transaction
+        explain_cur = cursor.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+        in_transaction = not cursor.connection.autocommit
+        try:
+            if in_transaction:
+                explain_cur.execute("SAVEPOINT query_profiler")
+            explain_cur.execute(f"EXPLAIN ({options}) {text}", vars)
+            plan = explain_cur.fetchone()[0]
+            if in_transaction:
+                explain_cur.execute("RELEASE SAVEPOINT query_profiler")
+        except Exception as e:
+            print(f"Query profiler EXPLAIN failed: {str(e)}")
+            if in_transaction:
+                try:
+                    explain_cur.execute("ROLLBACK TO SAVEPOINT query_profiler")
+                except Exception:
+                    pass
+        finally:
+            explain_cur.close()
+
+        sample = {
+            'function': self.function_name,
+            'query': key,
+            'duration_ms': round(elapsed_ms, 3),
+            'rows': max(cursor.rowcount, 0),
+            'analyzed': analyze,
+            'plan': plan,
+            'captured_at': datetime.utcnow().isoformat()
+        }
+        self.samples.append(sample)
+        self.pending_samples.append(sample)
+
+    def report(self, top_n=QUERY_PROFILE_TOP_N):
+        """Top-N normalized statements by cumulative time in this container"""
+        ranked = sorted(self.stats.values(), key=lambda s: s['total_ms'], reverse=True)
+        return [dict(stat,
+                     total_ms=round(stat['total_ms'], 3),
+                     max_ms=round(stat['max_ms'], 3),
+                     avg_ms=round(stat['total_ms'] / stat['calls'], 3))
+                for stat in ranked[:top_n]]
+
+    def end_invocation(self):
+        self.invocations += 1
+        new_samples, self.pending_samples = self.pending_samples, []
+        self.explains = 0
+
+        if new_samples or self.invocations % QUERY_PROFILE_REPORT_EVERY == 0:
+            print(json.dumps({
+                'type': 'query_profile',
+                'function': self.function_name,
+                'invocations': self.invocations,
+                'top_queries': self.report(),
+                'slow_samples': new_samples
+            }, default=str))
+
+        if new_samples and QUERY_SAMPLE_TABLE and self.connect is not None:
+            self.persist(new_samples)
+
+    def persist(self, samples):
+        try:
+            conn = self.connect()
+            try:
+                cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+                for sample in samples:
+                    cur.execute(sql.SQL("""
+                        INSERT INTO {} (function_name, query, duration_ms, row_count, analyzed, plan, captured_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """).format(sql.Identifier(QUERY_SAMPLE_TABLE)), (
+                        sample['function'], sample['query'], sample['duration_ms'],
+                        sample['rows'], sample['analyzed'],
+                        json.dumps(sample['plan']) if sample['plan'] is not None else None,
+                        sample['captured_at']
+                    ))
+                conn.commit()
+                cur.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Query profiler could not persist samples: {str(e)}")
+
+
+def report_from_table(cur, top_n=QUERY_PROFILE_TOP_N, table=QUERY_SAMPLE_TABLE or 'query_samples'):
+    """Top-N sampled statements by cumulative sampled time across all Lambdas"""
+    cur.execute(sql.SQL("""
+        SELECT function_name, query, COUNT(*) AS samples,
+               SUM(duration_ms) AS total_ms, MAX(duration_ms) AS max_ms,
+               MAX(captured_at) AS last_seen
+        FROM {}
+        GROUP BY function_name, query
+        ORDER BY total_ms DESC
+        LIMIT %s
+    """).format(sql.Identifier(table)), (top_n,))
+    columns = [col[0] for col in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+if __name__ == '__main__':
+    # python query_profiler.py [top_n]  -- report over QUERY_SAMPLE_TABLE
+    import sys
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.environ.get('DB_HOST'),
+        database=os.environ.get('DB_NAME'),
+        user=os.environ.get('DB_USER'),
+        password=os.environ.get('DB_PASSWORD')
+    )
+    try:
+        rows = report_from_table(conn.cursor(), int(sys.argv[1]) if len(sys.argv) > 1 else QUERY_PROFILE_TOP_N)
+        print(json.dumps(rows, indent=2, default=str))
+    finally:
+        conn.close()
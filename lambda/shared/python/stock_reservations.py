@@ -0,0 +1,220 @@
+"""
+Stock reservations: hold stock for an order from creation until the
+workflow confirms (update_inventory), releases (payment failed, order
+cancelled) or the reservation expires (reservation_reaper).
+
+inventory.reserved_quantity is the sum of active ('reserved') rows in
+stock_reservations, so available stock is stock_quantity - reserved_quantity.
+Hot products (stock_shards.py) are the exception: their reservations take
+the stock out of a shard and remember it in shard_id, and the inventory
+row is only refreshed by stock_rebalancer.
+All functions run on the caller's cursor; the caller commits.
+"""
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from stock_shards import available_stock, sharded_products, take_stock
+
+
+def aggregate_items(items):
+    """(product_id, quantity) pairs -> {product_id: total quantity}"""
+    totals = {}
+    for product_id, quantity in items:
+        totals[product_id] = totals.get(product_id, 0) + int(quantity)
+    return totals
+
+
+def reserve_stock(cur, order_id, items, ttl_minutes):
+    """
+    Reserve stock for every (product_id, quantity) in items, all or nothing.
+    Returns a list of shortages; when it is non-empty nothing usable was
+    reserved and the caller must roll back.
+    """
+    totals = aggregate_items(items)
+    sharded = sharded_products(cur, totals)
+    product_ids = sorted(p for p in totals if p not in sharded)
+    expires_at = datetime.now() + timedelta(minutes=ttl_minutes)
+    reservations = []
+    shortages = []
+
+    if product_ids:
+        # Lock in product_id order so concurrent orders cannot deadlock
+        cur.execute("""
+            SELECT product_id, stock_quantity - reserved_quantity
+            FROM inventory
+            WHERE product_id = ANY(%s)
+            ORDER BY product_id
+            FOR UPDATE
+        """, (product_ids,))
+        available = dict(cur.fetchall())
+
+        shortages = [
+            {
+                'product_id': product_id,
+                'requested': totals[product_id],
+                'available': available.get(product_id, 0)
+            }
+            for product_id in product_ids
+            if available.get(product_id, 0) < totals[product_id]
+        ]
+        if shortages:
+            return shortages
+
+        cur.execute("""
+            UPDATE inventory i
+            SET reserved_quantity = i.reserved_quantity + r.quantity
+            FROM unnest(%s::varchar[], %s::integer[]) AS r(product_id, quantity)
+            WHERE i.product_id = r.product_id
+        """, (product_ids, [totals[product_id] for product_id in product_ids]))
+        reservations.extend(
+            (order_id, product_id, totals[product_id], None, expires_at)
+            for product_id in product_ids
+        )
+
+    for product_id in sorted(sharded):
+        taken = take_stock(cur, product_id, totals[product_id])
+        if taken is None:
+            return [{
+                'product_id': product_id,
+                'requested': totals[product_id],
+                'available': available_stock(cur, product_id)
+            }]
+        reservations.extend(
+            (order_id, product_id, quantity, shard_id, expires_at)
+            for shard_id, quantity in taken
+        )
+
+    execute_values(cur, """
+        INSERT INTO stock_reservations (order_id, product_id, quantity, shard_id, expires_at)
+        VALUES %s
+    """, reservations)
+    return []
+
+
+def confirm_reservations(cur, order_id):
+    """
+    Turn an order's active reservations into a stock decrement.
+    Returns [(product_id, product_name, previous_stock, new_stock, quantity)],
+    empty when the order has no active reservation.
+    """
+    # Sharded products already gave the stock up at reservation time, only
+    # the inventory row of regular products is touched here
+    cur.execute("""
+        WITH confirmed AS (
+            UPDATE stock_reservations
+            SET status = 'confirmed', updated_at = CURRENT_TIMESTAMP
+            WHERE order_id = %s AND status = 'reserved'
+            RETURNING product_id, quantity, shard_id
+        ), totals AS (
+            SELECT product_id, SUM(quantity)::integer AS quantity
+            FROM confirmed
+            WHERE shard_id IS NULL
+            GROUP BY product_id
+        ), settled AS (
+            UPDATE inventory i
+            SET stock_quantity = i.stock_quantity - t.quantity,
+                reserved_quantity = i.reserved_quantity - t.quantity,
+                updated_at = CURRENT_TIMESTAMP
+            FROM totals t
+            WHERE i.product_id = t.product_id
+            RETURNING i.product_id, i.product_name,
+                      i.stock_quantity + t.quantity AS previous_stock,
+                      i.stock_quantity AS new_stock, t.quantity
+        ), sharded AS (
+            SELECT c.product_id, i.product_name, SUM(c.quantity)::integer AS quantity,
+                   (SELECT COALESCE(SUM(s.stock_quantity), 0)::integer
+                    FROM inventory_stock_shards s
+                    WHERE s.product_id = c.product_id) AS new_stock
+            FROM confirmed c
+            JOIN inventory i ON i.product_id = c.product_id
+            WHERE c.shard_id IS NOT NULL
+            GROUP BY c.product_id, i.product_name
+        )
+        SELECT product_id, product_name, previous_stock, new_stock, quantity FROM settled
+        UNION ALL
+        SELECT product_id, product_name, new_stock + quantity, new_stock, quantity FROM sharded
+    """, (order_id,))
+    return cur.fetchall()
+
+
+def has_confirmed_reservations(cur, order_id):
+    cur.execute("""
+        SELECT 1 FROM stock_reservations
+        WHERE order_id = %s AND status = 'confirmed'
+        LIMIT 1
+    """, (order_id,))
+    return cur.fetchone() is not None
+
+
+def restore_stock_ctes(source):
+    """
+    CTE bodies giving the stock of the reservations returned by the
+    source CTE back: to the inventory row for regular products, to the
+    shard for hot products.
+    """
+    return """
+            UPDATE inventory i
+            SET reserved_quantity = i.reserved_quantity - t.quantity
+            FROM (
+                SELECT product_id, SUM(quantity)::integer AS quantity
+                FROM {source}
+                WHERE shard_id IS NULL
+                GROUP BY product_id
+            ) t
+            WHERE i.product_id = t.product_id
+            RETURNING i.product_id
+        ), restored_shards AS (
+            UPDATE inventory_stock_shards s
+            SET stock_quantity = s.stock_quantity + t.quantity
+            FROM (
+                SELECT product_id, shard_id, SUM(quantity)::integer AS quantity
+                FROM {source}
+                WHERE shard_id IS NOT NULL
+                GROUP BY product_id, shard_id
+            ) t
+            WHERE s.product_id = t.product_id AND s.shard_id = t.shard_id
+            RETURNING s.product_id
+""".format(source=source)
+
+
+def release_reservations(cur, order_ids, status='released'):
+    """Give back the stock held by the active reservations of order_ids"""
+    cur.execute("""
+        WITH released AS (
+            UPDATE stock_reservations
+            SET status = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE order_id = ANY(%s) AND status = 'reserved'
+            RETURNING product_id, quantity, shard_id
+        ), restored AS (
+            {restore}
+        )
+        SELECT COUNT(DISTINCT product_id)::integer FROM released
+    """.format(restore=restore_stock_ctes('released')), (status, list(order_ids)))
+    return cur.fetchone()[0]
+
+
+def expire_reservations(cur, batch_size):
+    """
+    Expire up to batch_size overdue reservations. Returns how many
+    reservations were expired.
+    """
+    cur.execute("""
+        WITH expired AS (
+            UPDATE stock_reservations
+            SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+            WHERE reservation_id IN (
+                SELECT reservation_id
+                FROM stock_reservations
+                WHERE status = 'reserved' AND expires_at < CURRENT_TIMESTAMP
+                ORDER BY expires_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING product_id, quantity, shard_id
+        ), restored AS (
+            {restore}
+        )
+        SELECT COUNT(*)::integer FROM expired
+    """.format(restore=restore_stock_ctes('expired')), (batch_size,))
+    return cur.fetchone()[0]
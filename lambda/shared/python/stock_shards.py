@@ -0,0 +1,223 @@
+"""
+Sharded stock counters for hot products.
+
+A product with inventory.stock_shards > 0 keeps its orderable stock in
+inventory_stock_shards instead of the inventory row, split across N rows.
+Orders take stock from a random shard with SKIP LOCKED, so concurrent
+orders for the same product no longer queue on one row lock.
+stock_rebalancer evens the shards out and refreshes the inventory row
+(stock_quantity = shards + active reservations) for reports.
+All functions run on the caller's cursor; the caller commits.
+"""
+from psycopg2.extras import execute_values
+
+
+def even_split(total, shards):
+    """Spread total over shards counters, remainder on the first ones"""
+    return [total // shards + (1 if i < total % shards else 0) for i in range(shards)]
+
+
+def sharded_products(cur, product_ids):
+    """Subset of product_ids that are in sharded mode (no row lock taken)"""
+    cur.execute("""
+        SELECT product_id FROM inventory
+        WHERE product_id = ANY(%s) AND stock_shards > 0
+    """, (list(product_ids),))
+    return {row[0] for row in cur.fetchall()}
+
+
+def available_stock(cur, product_id):
+    cur.execute("""
+        SELECT COALESCE(SUM(stock_quantity), 0)::integer
+        FROM inventory_stock_shards
+        WHERE product_id = %s
+    """, (product_id,))
+    return cur.fetchone()[0]
+
+
+def take_stock(cur, product_id, quantity):
+    """
+    Take quantity units of product_id from its shards.
+    Returns [(shard_id, quantity)] taken, or None when there is not enough.
+    """
+    # Fast path: one random unlocked shard that can cover the whole quantity
+    cur.execute("""
+        UPDATE inventory_stock_shards
+        SET stock_quantity = stock_quantity - %s
+        WHERE (product_id, shard_id) = (
+            SELECT product_id, shard_id
+            FROM inventory_stock_shards
+            WHERE product_id = %s AND stock_quantity >= %s
+            ORDER BY random()
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING shard_id
+    """, (quantity, product_id, quantity))
+    row = cur.fetchone()
+    if row:
+        return [(row[0], quantity)]
+
+    # Slow path: stock is spread thin or every shard is busy, drain several
+    cur.execute("""
+        SELECT shard_id, stock_quantity
+        FROM inventory_stock_shards
+        WHERE product_id = %s
+        ORDER BY shard_id
+        FOR UPDATE
+    """, (product_id,))
+    shards = cur.fetchall()
+    if sum(stock for _, stock in shards) < quantity:
+        return None
+
+    taken = []
+    remaining = quantity
+    for shard_id, stock in sorted(shards, key=lambda shard: -shard[1]):
+        if remaining == 0:
+            break
+        part = min(stock, remaining)
+        if part:
+            taken.append((shard_id, part))
+            remaining -= part
+    cur.execute("""
+        UPDATE inventory_stock_shards s
+        SET stock_quantity = s.stock_quantity - t.quantity
+        FROM unnest(%s::integer[], %s::integer[]) AS t(shard_id, quantity)
+        WHERE s.product_id = %s AND s.shard_id = t.shard_id
+    """, ([shard_id for shard_id, _ in taken], [part for _, part in taken], product_id))
+    return taken
+
+
+def shard_product(cur, product_id, shards):
+    """
+    Switch product_id to sharded mode (or change its shard count).
+    Stock held by active reservations stays reserved; it is attached to
+    shard 0 so a release puts it back into the shards.
+    Returns the orderable stock now spread over the shards, or None when
+    the product does not exist.
+    """
+    cur.execute("""
+        SELECT stock_quantity - reserved_quantity, stock_shards
+        FROM inventory
+        WHERE product_id = %s
+        FOR UPDATE
+    """, (product_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    available, current_shards = row
+    if current_shards > 0:
+        cur.execute("""
+            SELECT COALESCE(SUM(stock_quantity), 0)::integer
+            FROM (
+                SELECT stock_quantity FROM inventory_stock_shards
+                WHERE product_id = %s
+                FOR UPDATE
+            ) locked
+        """, (product_id,))
+        available = cur.fetchone()[0]
+
+    cur.execute("DELETE FROM inventory_stock_shards WHERE product_id = %s", (product_id,))
+    execute_values(cur, """
+        INSERT INTO inventory_stock_shards (product_id, shard_id, stock_quantity)
+        VALUES %s
+    """, [(product_id, shard_id, stock)
+          for shard_id, stock in enumerate(even_split(available, shards))])
+    cur.execute("""
+        UPDATE stock_reservations SET shard_id = 0
+        WHERE product_id = %s AND status = 'reserved'
+        AND (shard_id IS NULL OR shard_id >= %s)
+    """, (product_id, shards))
+    cur.execute("""
+        UPDATE inventory SET stock_shards = %s, updated_at = CURRENT_TIMESTAMP
+        WHERE product_id = %s
+    """, (shards, product_id))
+    refresh_inventory(cur, [product_id])
+    return available
+
+
+def unshard_product(cur, product_id):
+    """Fold the shards back into the inventory row"""
+    cur.execute("""
+        SELECT stock_shards FROM inventory
+        WHERE product_id = %s AND stock_shards > 0
+        FOR UPDATE
+    """, (product_id,))
+    if not cur.fetchone():
+        return False
+    cur.execute("""
+        SELECT shard_id FROM inventory_stock_shards
+        WHERE product_id = %s
+        ORDER BY shard_id
+        FOR UPDATE
+    """, (product_id,))
+    refresh_inventory(cur, [product_id])
+    cur.execute("""
+        UPDATE stock_reservations SET shard_id = NULL
+        WHERE product_id = %s AND status = 'reserved'
+    """, (product_id,))
+    cur.execute("DELETE FROM inventory_stock_shards WHERE product_id = %s", (product_id,))
+    cur.execute("""
+        UPDATE inventory SET stock_shards = 0, updated_at = CURRENT_TIMESTAMP
+        WHERE product_id = %s
+    """, (product_id,))
+    return True
+
+
+def rebalance_product(cur, product_id):
+    """
+    Even out the shards of one product so the fast path keeps finding a
+    shard that can cover an order. Returns the number of shards changed.
+    """
+    cur.execute("""
+        SELECT shard_id, stock_quantity
+        FROM inventory_stock_shards
+        WHERE product_id = %s
+        ORDER BY shard_id
+        FOR UPDATE
+    """, (product_id,))
+    shards = cur.fetchall()
+    if not shards:
+        return 0
+    targets = even_split(sum(stock for _, stock in shards), len(shards))
+    changed = [
+        (shard_id, target)
+        for (shard_id, stock), target in zip(shards, targets)
+        if stock != target
+    ]
+    if changed:
+        cur.execute("""
+            UPDATE inventory_stock_shards s
+            SET stock_quantity = t.stock_quantity
+            FROM unnest(%s::integer[], %s::integer[]) AS t(shard_id, stock_quantity)
+            WHERE s.product_id = %s AND s.shard_id = t.shard_id
+        """, ([shard_id for shard_id, _ in changed],
+              [target for _, target in changed], product_id))
+    return len(changed)
+
+
+def refresh_inventory(cur, product_ids):
+    """
+    Write shard totals back to the inventory row:
+    stock_quantity = shards + active reservations, reserved_quantity = active reservations
+    """
+    cur.execute("""
+        UPDATE inventory i
+        SET stock_quantity = totals.available + totals.reserved,
+            reserved_quantity = totals.reserved,
+            updated_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT p.product_id,
+                   (SELECT COALESCE(SUM(s.stock_quantity), 0)
+                    FROM inventory_stock_shards s
+                    WHERE s.product_id = p.product_id)::integer AS available,
+                   (SELECT COALESCE(SUM(r.quantity), 0)
+                    FROM stock_reservations r
+                    WHERE r.product_id = p.product_id AND r.status = 'reserved')::integer AS reserved
+            FROM unnest(%s::varchar[]) AS p(product_id)
+        ) totals
+        WHERE i.product_id = totals.product_id
+        AND (i.stock_quantity, i.reserved_quantity)
+            IS DISTINCT FROM (totals.available + totals.reserved, totals.reserved)
+    """, (list(product_ids),))
+    return cur.rowcount
@@ -0,0 +1,28 @@
+"""
+Per-product stock thresholds from the restock_forecast table, written by
+the restock_forecast Lambda from each product's sales velocity. Products
+without a forecast row fall back to the fixed thresholds used before.
+A product is critical below critical_threshold (update_inventory alerts at
+or below it) and low below low_threshold.
+All functions run on the caller's cursor.
+"""
+
+DEFAULT_CRITICAL_THRESHOLD = 10
+DEFAULT_LOW_THRESHOLD = 50
+
+
+def critical_thresholds(cur, product_ids):
+    """{product_id: critical threshold} for product_ids, in one query"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    cur.execute("""
+        SELECT product_id, critical_threshold
+        FROM restock_forecast
+        WHERE product_id = ANY(%s)
+    """, (product_ids,))
+    thresholds = dict(cur.fetchall())
+    return {
+        product_id: thresholds.get(product_id, DEFAULT_CRITICAL_THRESHOLD)
+        for product_id in product_ids
+    }
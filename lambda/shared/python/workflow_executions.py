@@ -0,0 +1,69 @@
+"""
+Step Functions execution index (workflow_executions table): one row per
+order with its execution ARN, status and timestamps. Written by
+order_management when a workflow starts and kept current by execution_sync,
+so GET /executions is a SQL query instead of a ListExecutions call.
+All functions run on the caller's cursor; the caller commits.
+"""
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+EXECUTION_STATUSES = ('RUNNING', 'SUCCEEDED', 'FAILED', 'TIMED_OUT', 'ABORTED', 'PENDING_REDRIVE')
+
+
+def order_id_from_name(name):
+    """Executions are started as order-<order_id>"""
+    return name[len('order-'):] if name.startswith('order-') else name
+
+
+def to_timestamp(value):
+    """datetime from boto3, or epoch milliseconds from EventBridge, as naive UTC"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value / 1000)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def execution_row(execution):
+    """ListExecutions / DescribeExecution / status-change event detail -> table row"""
+    return (
+        order_id_from_name(execution['name']),
+        execution['executionArn'],
+        execution['name'],
+        execution['status'],
+        to_timestamp(execution.get('startDate')),
+        to_timestamp(execution.get('stopDate'))
+    )
+
+
+def upsert_executions(cur, rows):
+    """
+    Insert or update execution rows. A RUNNING row never overwrites a
+    finished one and an older execution never replaces a newer one, so a
+    late event or a stale sync page can't move an order backwards.
+    Returns the number of rows written.
+    """
+    if not rows:
+        return 0
+    execute_values(cur, """
+        INSERT INTO workflow_executions
+            (order_id, execution_arn, execution_name, status, start_date, stop_date)
+        VALUES %s
+        ON CONFLICT (order_id) DO UPDATE
+        SET execution_arn = EXCLUDED.execution_arn,
+            execution_name = EXCLUDED.execution_name,
+            status = EXCLUDED.status,
+            start_date = COALESCE(EXCLUDED.start_date, workflow_executions.start_date),
+            stop_date = EXCLUDED.stop_date,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE (workflow_executions.status, workflow_executions.execution_arn, workflow_executions.stop_date)
+              IS DISTINCT FROM (EXCLUDED.status, EXCLUDED.execution_arn, EXCLUDED.stop_date)
+        AND (EXCLUDED.start_date > workflow_executions.start_date
+             OR (EXCLUDED.execution_arn = workflow_executions.execution_arn
+                 AND (workflow_executions.status = 'RUNNING' OR EXCLUDED.status <> 'RUNNING')))
+    """, rows, page_size=len(rows))
+    return cur.rowcount
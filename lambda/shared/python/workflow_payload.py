@@ -0,0 +1,129 @@
+"""
+Order workflow input (Step Functions StartExecution payload). Built by
+order_management and read by every step Lambda, so the items, prices and
+amount travel with the execution and no step re-reads them from the
+database. Version 1 payloads always carry items; payloads without
+schemaVersion are the older ad-hoc shape and are read leniently (see
+legacy_items). Invalid payloads raise ValueError.
+"""
+from datetime import datetime
+
+SCHEMA_VERSION = 1
+
+
+def _first(event, *keys):
+    for key in keys:
+        if event.get(key) is not None:
+            return event[key]
+    return None
+
+
+def workflow_item(product_id, product_name, quantity, price):
+    return {
+        'productId': product_id,
+        'productName': product_name,
+        'quantity': quantity,
+        'price': float(price)
+    }
+
+
+def parse_items(items):
+    """Validated copy of the items list"""
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty list')
+    parsed = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'Item {i} must be an object')
+        product_id = _first(item, 'productId', 'product_id')
+        if not isinstance(product_id, str) or not product_id:
+            raise ValueError(f'Item {i} missing product ID')
+        quantity = item.get('quantity')
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError(f'Item {i} quantity must be a positive integer')
+        price = item.get('price', 0)
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+            raise ValueError(f'Item {i} price must be a non-negative number')
+        parsed.append(workflow_item(
+            product_id, _first(item, 'productName', 'product_name') or product_id, quantity, price
+        ))
+    return parsed
+
+
+def legacy_items(items):
+    """
+    Items of a payload without schemaVersion, read the way the steps always
+    did: nothing is rejected. An item without a product ID keeps productId
+    None and the steps skip it; a missing quantity counts as 0.
+    """
+    if not isinstance(items, list):
+        return []
+    return [
+        {
+            'productId': _first(item, 'productId', 'product_id'),
+            'productName': _first(item, 'productName', 'product_name', 'productId', 'product_id'),
+            'quantity': item.get('quantity', 0),
+            'price': item.get('price', 0)
+        }
+        for item in items
+        if isinstance(item, dict)
+    ]
+
+
+def _amount(item):
+    """price * quantity of a legacy item, 0 when either is not a number"""
+    try:
+        return float(item['price']) * float(item['quantity'])
+    except (TypeError, ValueError):
+        return 0
+
+
+def build_payload(order_id, customer_id, total_amount, items, timestamp=None):
+    """Current-version payload for StartExecution"""
+    return {
+        'schemaVersion': SCHEMA_VERSION,
+        'orderId': str(order_id),
+        'customerId': customer_id,
+        'totalAmount': float(total_amount),
+        'items': parse_items(items),
+        'timestamp': (timestamp or datetime.now()).isoformat()
+    }
+
+
+def parse_payload(event):
+    """
+    Normalized view of a step's input: schema_version, order_id,
+    customer_id, total_amount, transaction_id and items. items is None
+    only for legacy payloads that did not pass them.
+    Accepts camelCase and the snake_case keys the state machine maps.
+    """
+    if not isinstance(event, dict):
+        raise ValueError('Workflow payload must be an object')
+    version = event.get('schemaVersion', 0)
+    if isinstance(version, bool) or not isinstance(version, int) or not 0 <= version <= SCHEMA_VERSION:
+        raise ValueError(f'Unsupported workflow payload schemaVersion: {version}')
+
+    order_id = _first(event, 'orderId', 'order_id')
+    if order_id in (None, ''):
+        raise ValueError('Order ID is required')
+
+    items = event.get('items')
+    if version >= 1:
+        items = parse_items(items)
+    elif items:
+        items = legacy_items(items)
+    else:
+        items = None
+
+    total_amount = _first(event, 'totalAmount', 'total_amount')
+    if total_amount is None and items:
+        total_amount = sum(_amount(item) for item in items)
+
+    return {
+        'schema_version': version,
+        'order_id': str(order_id),
+        'customer_id': _first(event, 'customerId', 'customer_id'),
+        'total_amount': total_amount if total_amount is not None else 0,
+        'transaction_id': event.get('transaction_id'),
+        'items': items
+    }
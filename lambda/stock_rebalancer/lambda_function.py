@@ -0,0 +1,131 @@
+import os
+import traceback
+from datetime import datetime
+
+import psycopg2
+from psycopg2 import errors
+from instrumentation import Metrics
+from stock_shards import rebalance_product, refresh_inventory, shard_product, unshard_product
+
+# ==============================
+# ENV VARIABLES
+# ==============================
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+STOCK_SHARD_COUNT = int(os.environ.get("STOCK_SHARD_COUNT", "8"))
+# Don't queue behind orders holding a shard; the next run retries
+REBALANCE_LOCK_TIMEOUT_MS = int(os.environ.get("REBALANCE_LOCK_TIMEOUT_MS", "2000"))
+
+metrics = Metrics("stock_rebalancer")
+
+
+def get_db_connection():
+    with metrics.timer("DbConnect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
+
+
+def set_hot(cur, conn, product_id, shards):
+    available = shard_product(cur, product_id, shards)
+    if available is None:
+        conn.rollback()
+        return {"status": "error", "message": f"Product {product_id} not found"}
+    conn.commit()
+    print(f"🔥 {product_id} sharded into {shards} counters ({available} units)")
+    return {"status": "success", "product_id": product_id, "shards": shards, "available": available}
+
+
+def set_regular(cur, conn, product_id):
+    if not unshard_product(cur, product_id):
+        conn.rollback()
+        return {"status": "error", "message": f"Product {product_id} is not sharded"}
+    conn.commit()
+    print(f"🧊 {product_id} back to a single stock row")
+    return {"status": "success", "product_id": product_id, "shards": 0}
+
+
+def rebalance_all(cur, conn):
+    cur.execute("SELECT product_id FROM inventory WHERE stock_shards > 0 ORDER BY product_id")
+    product_ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+
+    rebalanced = []
+    skipped = []
+    # One short transaction per product
+    for product_id in product_ids:
+        try:
+            cur.execute("SET LOCAL lock_timeout = %s", (REBALANCE_LOCK_TIMEOUT_MS,))
+            changed = rebalance_product(cur, product_id)
+            refresh_inventory(cur, [product_id])
+            conn.commit()
+            if changed:
+                rebalanced.append({"product_id": product_id, "shards_changed": changed})
+        except errors.LockNotAvailable:
+            conn.rollback()
+            skipped.append(product_id)
+
+    metrics.count("ShardsRebalanced", sum(r["shards_changed"] for r in rebalanced))
+    return {
+        "status": "success",
+        "hot_products": len(product_ids),
+        "rebalanced": rebalanced,
+        "skipped": skipped,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@metrics.handler
+def lambda_handler(event, context):
+    """
+    Sharded stock counters for hot products.
+    Scheduled run: even out every hot product's shards and refresh its
+    inventory row. Manual run:
+      {"action": "enable", "product_id": "PROD001", "shards": 8}
+      {"action": "disable", "product_id": "PROD001"}
+    """
+    print("⚖️ STOCK REBALANCER STARTED")
+
+    event = event or {}
+    action = event.get("action", "rebalance")
+    product_id = event.get("product_id")
+
+    if action not in ("rebalance", "enable", "disable"):
+        return {"status": "error", "message": f"Invalid action: {action}"}
+    if action != "rebalance" and not product_id:
+        return {"status": "error", "message": "product_id is required"}
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        if action == "enable":
+            shards = int(event.get("shards", STOCK_SHARD_COUNT))
+            if shards < 1:
+                return {"status": "error", "message": "shards must be positive"}
+            return set_hot(cur, conn, product_id, shards)
+        if action == "disable":
+            return set_regular(cur, conn, product_id)
+
+        result = rebalance_all(cur, conn)
+        print(f"🎉 STOCK REBALANCER DONE ({len(result['rebalanced'])} products rebalanced)")
+        return result
+
+    except Exception as e:
+        conn.rollback()
+        print("🔥 STOCK REBALANCER FAILED")
+        print(traceback.format_exc())
+        return {
+            "status": "error",
+            "message": f"Stock rebalancer failed: {str(e)}"
+        }
+
+    finally:
+        cur.close()
+        conn.close()
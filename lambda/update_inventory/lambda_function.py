@@ -3,6 +3,13 @@ import os
 import psycopg2
 import boto3
 from datetime import datetime
+from instrumentation import Metrics
+from query_profiler import QueryProfiler
+from stock_reservations import confirm_reservations, has_confirmed_reservations, release_reservations
+from stock_shards import available_stock, sharded_products, take_stock
+from stock_thresholds import critical_thresholds
+from order_events import lock_order, order_event, previous_event, write_order_events
+from workflow_payload import parse_payload, workflow_item
 
 # Environment variables
 DB_HOST = os.environ.get('DB_HOST')
@@ -10,93 +17,175 @@ DB_NAME = os.environ.get('DB_NAME')
 DB_USER = os.environ.get('DB_USER')
 DB_PASSWORD = os.environ.get('DB_PASSWORD')
 
-eventbridge = boto3.client('events')
+metrics = Metrics('update_inventory')
+eventbridge = metrics.instrument_client(boto3.client('events'))
 
 def get_db_connection():
-    return psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
+    with metrics.timer('DbConnect'):
+        return psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            cursor_factory=metrics.cursor_factory
+        )
 
+metrics.profiler = QueryProfiler('update_inventory', connect=get_db_connection)
+
+def fail(conn, cur, order_id, message):
+    """Roll back the step and record the failure on the same connection"""
+    conn.rollback()
+    try:
+        write_order_events(cur, [order_event(
+            order_id, 'inventory_failed', 'update_inventory', detail={'message': message}
+        )])
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error recording inventory failure: {str(e)}")
+    return {
+        'inventoryStatus': 'failed',
+        'message': message
+    }
+
+def fetch_order_items(cur, order_id):
+    """Items of a legacy payload that did not pass them"""
+    cur.execute("""
+        SELECT oi.product_id, i.product_name, oi.quantity, i.price
+        FROM order_items oi
+        JOIN inventory i ON oi.product_id = i.product_id
+        WHERE oi.order_id = %s
+    """, (order_id,))
+    return [workflow_item(*row) for row in cur.fetchall()]
+
+def unconfirmed_items(items, confirmed):
+    """
+    The part of items that confirm_reservations did not cover: the reaper
+    expires reservation rows one by one, so an order can come back with
+    only some of its products (or shards of a product) still reserved.
+    """
+    remaining = {}
+    for product_id, _, _, _, quantity in confirmed:
+        remaining[product_id] = remaining.get(product_id, 0) + quantity
+    pending = []
+    for item in items:
+        product_id = item.get('productId')
+        if not remaining.get(product_id):
+            pending.append(item)
+            continue
+        covered = min(remaining[product_id], item.get('quantity', 0))
+        remaining[product_id] -= covered
+        if item.get('quantity', 0) > covered:
+            pending.append(dict(item, quantity=item['quantity'] - covered))
+    return pending
+
+def low_stock_alerts_for(cur, updated_products):
+    """Updated products at or below their critical threshold (stock_thresholds.py)"""
+    thresholds = critical_thresholds(cur, {product['product_id'] for product in updated_products})
+    return [
+        {
+            'product_id': product['product_id'],
+            'product_name': product['product_name'],
+            'current_stock': product['new_stock'],
+            'threshold': thresholds[product['product_id']]
+        }
+        for product in updated_products
+        if product['new_stock'] <= thresholds[product['product_id']]
+    ]
+
+def release_order(conn, cur, order_id):
+    """Compensation step: payment failed, give the reserved stock back"""
+    released = release_reservations(cur, [order_id])
+    write_order_events(cur, [order_event(
+        order_id, 'inventory_released', 'update_inventory',
+        detail={'released_products': released}
+    )])
+    conn.commit()
+    print(f"Released reservations for order {order_id} ({released} products)")
+    return {
+        'inventoryStatus': 'released',
+        'message': 'Reserved stock released',
+        'released_products': released
+    }
+
+@metrics.handler
 def lambda_handler(event, context):
     print(f"=== INVENTORY UPDATE START ===")
     print(f"Event received: {json.dumps(event, indent=2)}")
     
-    # Extract data - handle nested structure
-    order_id = event.get('order_id')
-    transaction_id = None
-    items = []
-    
-    # Try to get from event directly
-    if 'orderId' in event:
-        order_id = event['orderId']
-        transaction_id = event.get('transaction_id')
-        items = event.get('items', [])
-    elif 'order_id' in event:
-        order_id = event['order_id']
-        transaction_id = event.get('transaction_id')
-        items = event.get('items', [])
-    
-    print(f"Extracted - order_id: {order_id}, transaction_id: {transaction_id}, items count: {len(items)}")
-    
-    if not order_id:
+    try:
+        payload = parse_payload(event)
+    except ValueError as e:
         return {
             'inventoryStatus': 'failed',
-            'message': 'Order ID is required'
+            'message': str(e)
         }
-
-    order_id = str(order_id)
     
-    # If items are empty, fetch from database
-    if not items:
-        try:
-            print(f"Fetching items from database for order_id: {order_id}")
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            cur.execute("""
-                SELECT oi.product_id, oi.quantity, i.product_name, i.price
-                FROM order_items oi
-                JOIN inventory i ON oi.product_id = i.product_id
-                WHERE oi.order_id = %s
-            """, (order_id,))
-            
-            items = []
-            for row in cur.fetchall():
-                items.append({
-                    'productId': row[0],
-                    'productName': row[2],
-                    'quantity': row[1],
-                    'price': float(row[3])
-                })
-            
-            cur.close()
-            conn.close()
-            
-            print(f"Fetched {len(items)} items from database")
-            
-            if not items:
-                return {
-                    'inventoryStatus': 'failed',
-                    'message': 'No items found for this order'
-                }
-        except Exception as e:
-            print(f"Error fetching order items: {str(e)}")
-            return {
-                'inventoryStatus': 'failed',
-                'message': f'Error fetching items: {str(e)}'
-            }
+    order_id = payload['order_id']
+    items = payload['items']
+    print(f"Extracted - order_id: {order_id}, schema version: {payload['schema_version']}, "
+          f"items count: {len(items) if items is not None else 'not passed'}")
     
+    # One connection and one transaction for the whole step
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        updated_products = []
-        low_stock_alerts = []
+        if event.get('action') == 'release':
+            return release_order(conn, cur, order_id)
+        
+        # Retried step, or the Express and Standard workflow both ran it:
+        # return the recorded result instead of taking the stock again
+        lock_order(cur, order_id)
+        previous = previous_event(cur, order_id, 'inventory_updated')
+        if previous:
+            conn.rollback()
+            print(f"Inventory already updated for order {order_id}")
+            return {
+                'inventoryStatus': 'success',
+                'message': 'Inventory already updated',
+                'updated_products': previous['detail'].get('updated_products', []),
+                'low_stock_alerts': previous['detail'].get('low_stock_alerts', [])
+            }
         
-        for item in items:
+        updated_products = []
+
+        # Stock reserved at order creation: confirm it in one statement
+        confirmed = confirm_reservations(cur, order_id)
+        for product_id, product_name, previous_stock, new_stock, quantity in confirmed:
+            updated_products.append({
+                'product_id': product_id,
+                'product_name': product_name,
+                'previous_stock': previous_stock,
+                'new_stock': new_stock,
+                'quantity_sold': quantity
+            })
+
+        if not confirmed and has_confirmed_reservations(cur, order_id):
+            # Retried step: the stock was already taken
+            conn.rollback()
+            print(f"Inventory already updated for order {order_id}")
+            return {
+                'inventoryStatus': 'success',
+                'message': 'Inventory already updated',
+                'updated_products': [],
+                'low_stock_alerts': []
+            }
+
+        # Legacy payloads without items: read them on this transaction
+        if items is None:
+            items = fetch_order_items(cur, order_id)
+            print(f"Fetched {len(items)} items from database")
+            if not items and not confirmed:
+                return fail(conn, cur, order_id, 'No items found for this order')
+
+        # Items without a reservation (disabled, or expired by the reaper,
+        # possibly only some of the order's rows) check stock here
+        pending_items = unconfirmed_items(items, confirmed)
+        sharded = sharded_products(
+            cur, [item['productId'] for item in pending_items if item.get('productId')]
+        ) if pending_items else set()
+        for item in pending_items:
             product_id = item.get('productId')
             quantity = item.get('quantity', 0)
             
@@ -104,9 +193,26 @@ def lambda_handler(event, context):
                 print(f"Product ID not found for item: {item}")
                 continue
             
+            # Hot product: take from a shard instead of locking the inventory row
+            if product_id in sharded:
+                product_name = item.get('productName', product_id)
+                if take_stock(cur, product_id, quantity) is None:
+                    error_msg = f'Insufficient stock for product {product_name}. Available: {available_stock(cur, product_id)}, Requested: {quantity}'
+                    print(error_msg)
+                    return fail(conn, cur, order_id, error_msg)
+                new_stock = available_stock(cur, product_id)
+                updated_products.append({
+                    'product_id': product_id,
+                    'product_name': product_name,
+                    'previous_stock': new_stock + quantity,
+                    'new_stock': new_stock,
+                    'quantity_sold': quantity
+                })
+                continue
+            
             # Check current stock
             cur.execute("""
-                SELECT stock_quantity, product_name
+                SELECT stock_quantity, reserved_quantity, product_name
                 FROM inventory
                 WHERE product_id = %s
                 FOR UPDATE
@@ -117,17 +223,13 @@ def lambda_handler(event, context):
                 print(f"Product {product_id} not found in inventory")
                 continue
             
-            current_stock, product_name = result
+            current_stock, reserved_stock, product_name = result
             
-            # Check if sufficient stock
-            if current_stock < quantity:
-                conn.rollback()
-                error_msg = f'Insufficient stock for product {product_name}. Available: {current_stock}, Requested: {quantity}'
+            # Check if sufficient stock (stock held for other orders is not available)
+            if current_stock - reserved_stock < quantity:
+                error_msg = f'Insufficient stock for product {product_name}. Available: {current_stock - reserved_stock}, Requested: {quantity}'
                 print(error_msg)
-                return {
-                    'inventoryStatus': 'failed',
-                    'message': error_msg
-                }
+                return fail(conn, cur, order_id, error_msg)
             
             # Update inventory
             new_stock = current_stock - quantity
@@ -145,21 +247,16 @@ def lambda_handler(event, context):
                 'new_stock': new_stock,
                 'quantity_sold': quantity
             })
-            
-            # Check for low stock
-            if new_stock <= 10:
-                low_stock_alerts.append({
-                    'product_id': product_id,
-                    'product_name': product_name,
-                    'current_stock': new_stock
-                })
         
-        # Update order status
-        cur.execute("""
-            UPDATE orders
-            SET status = 'processing', updated_at = %s
-            WHERE order_id = %s
-        """, (datetime.now(), str(order_id)))
+        # Low stock against each product's forecast threshold, one lookup for all
+        low_stock_alerts = low_stock_alerts_for(cur, updated_products)
+        
+        # Update order status (history entry + latest state on the orders row)
+        write_order_events(cur, [order_event(
+            order_id, 'inventory_updated', 'update_inventory',
+            detail={'updated_products': updated_products, 'low_stock_alerts': low_stock_alerts},
+            status='processing'
+        )])
         
         conn.commit()
         
@@ -175,6 +272,7 @@ def lambda_handler(event, context):
                                 'product_id': alert['product_id'],
                                 'product_name': alert['product_name'],
                                 'current_stock': alert['current_stock'],
+                                'threshold': alert['threshold'],
                                 'timestamp': datetime.now().isoformat()
                             })
                         }]
@@ -192,14 +290,10 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
-        conn.rollback()
         print(f"Error updating inventory: {str(e)}")
         import traceback
         traceback.print_exc()
-        return {
-            'inventoryStatus': 'failed',
-            'message': f'Inventory update error: {str(e)}'
-        }
+        return fail(conn, cur, order_id, f'Inventory update error: {str(e)}')
     finally:
         cur.close()
         conn.close()
\ No newline at end of file
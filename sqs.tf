@@ -0,0 +1,28 @@
+# Order intake queue (INTAKE_MODE=queue)
+resource "aws_sqs_queue" "order_intake_dlq" {
+  name                      = "lks-sqs-order-intake-dlq"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "order_intake" {
+  name                       = "lks-sqs-order-intake"
+  visibility_timeout_seconds = 180 # at least 6x the worker timeout
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.order_intake_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+# Worker: batches of up to 50, at most 2 batches in parallel
+resource "aws_lambda_event_source_mapping" "order_intake_worker" {
+  event_source_arn                   = aws_sqs_queue.order_intake.arn
+  function_name                      = "lks-lambda-order-intake-worker"
+  batch_size                         = 50
+  maximum_batching_window_in_seconds = 1
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = 2
+  }
+}
@@ -75,6 +75,194 @@ resource "aws_lambda_permission" "allow_eventbridge_low_stock" {
   source_arn    = aws_cloudwatch_event_rule.low_stock.arn
 }
 
+# 4. Partition Maintenance (Rate - every 1 day)
+resource "aws_cloudwatch_event_rule" "partition_maintenance" {
+  name                = "lks-eventbridge-partition-maintenance"
+  description         = "Pre-create and retire monthly order partitions"
+  schedule_expression = "rate(1 day)"
+}
+
+# Target Lambda
+resource "aws_cloudwatch_event_target" "partition_maintenance_target" {
+  rule      = aws_cloudwatch_event_rule.partition_maintenance.name
+  target_id = "PartitionMaintenanceLambda"
+  arn       = aws_lambda_function.partition_maintenance.arn
+}
+
+# Permission
+resource "aws_lambda_permission" "allow_eventbridge_partition_maintenance" {
+  statement_id  = "AllowEventBridgePartitionMaintenance"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.partition_maintenance.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.partition_maintenance.arn
+}
+
+# 5. Reservation Reaper (Rate - every 5 minutes)
+resource "aws_cloudwatch_event_rule" "reservation_reaper" {
+  name                = "lks-eventbridge-reservation-reaper"
+  description         = "Expire stock reservations of abandoned orders"
+  schedule_expression = "rate(5 minutes)"
+}
+
+# Target Lambda
+resource "aws_cloudwatch_event_target" "reservation_reaper_target" {
+  rule      = aws_cloudwatch_event_rule.reservation_reaper.name
+  target_id = "ReservationReaperLambda"
+  arn       = aws_lambda_function.reservation_reaper.arn
+}
+
+# Permission
+resource "aws_lambda_permission" "allow_eventbridge_reservation_reaper" {
+  statement_id  = "AllowEventBridgeReservationReaper"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.reservation_reaper.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.reservation_reaper.arn
+}
+
+# 6. Stock Rebalancer (Rate - every 1 minute)
+resource "aws_cloudwatch_event_rule" "stock_rebalancer" {
+  name                = "lks-eventbridge-stock-rebalancer"
+  description         = "Rebalance sharded stock counters of hot products"
+  schedule_expression = "rate(1 minute)"
+}
+
+# Target Lambda
+resource "aws_cloudwatch_event_target" "stock_rebalancer_target" {
+  rule      = aws_cloudwatch_event_rule.stock_rebalancer.name
+  target_id = "StockRebalancerLambda"
+  arn       = aws_lambda_function.stock_rebalancer.arn
+}
+
+# Permission
+resource "aws_lambda_permission" "allow_eventbridge_stock_rebalancer" {
+  statement_id  = "AllowEventBridgeStockRebalancer"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.stock_rebalancer.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.stock_rebalancer.arn
+}
+
+# 7. Workflow Execution Index (Event Pattern + Rate - every 15 minutes)
+resource "aws_cloudwatch_event_rule" "execution_status" {
+  name        = "lks-eventbridge-execution-status"
+  description = "Capture order workflow execution status changes"
+
+  event_pattern = jsonencode({
+    source = ["aws.states"],
+    detail-type = ["Step Functions Execution Status Change"],
+    detail = {
+      stateMachineArn = [data.aws_sfn_state_machine.order_workflow.arn]
+    }
+  })
+}
+
+resource "aws_cloudwatch_event_rule" "execution_sync" {
+  name                = "lks-eventbridge-execution-sync"
+  description         = "Reconcile the workflow execution index"
+  schedule_expression = "rate(15 minutes)"
+}
+
+# Target Lambda
+resource "aws_cloudwatch_event_target" "execution_status_target" {
+  rule      = aws_cloudwatch_event_rule.execution_status.name
+  target_id = "ExecutionStatusLambda"
+  arn       = aws_lambda_function.execution_sync.arn
+}
+
+resource "aws_cloudwatch_event_target" "execution_sync_target" {
+  rule      = aws_cloudwatch_event_rule.execution_sync.name
+  target_id = "ExecutionSyncLambda"
+  arn       = aws_lambda_function.execution_sync.arn
+}
+
+# Permission
+resource "aws_lambda_permission" "allow_eventbridge_execution_status" {
+  statement_id  = "AllowEventBridgeExecutionStatus"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.execution_sync.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.execution_status.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_execution_sync" {
+  statement_id  = "AllowEventBridgeExecutionSync"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.execution_sync.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.execution_sync.arn
+}
+
+# 8. Customer Metrics Reconcile (Rate - every 1 day)
+resource "aws_cloudwatch_event_rule" "customer_metrics_reconcile" {
+  name                = "lks-eventbridge-customer-metrics-reconcile"
+  description         = "Re-derive customer lifetime metrics from orders"
+  schedule_expression = "rate(1 day)"
+}
+
+# Target Lambda
+resource "aws_cloudwatch_event_target" "customer_metrics_reconcile_target" {
+  rule      = aws_cloudwatch_event_rule.customer_metrics_reconcile.name
+  target_id = "CustomerMetricsReconcileLambda"
+  arn       = aws_lambda_function.customer_metrics_reconcile.arn
+}
+
+# Permission
+resource "aws_lambda_permission" "allow_eventbridge_customer_metrics_reconcile" {
+  statement_id  = "AllowEventBridgeCustomerMetricsReconcile"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.customer_metrics_reconcile.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.customer_metrics_reconcile.arn
+}
+
+# 9. Restock Forecast (Rate - every 1 day)
+resource "aws_cloudwatch_event_rule" "restock_forecast" {
+  name                = "lks-eventbridge-restock-forecast"
+  description         = "Recompute per-product sales velocity and stock thresholds"
+  schedule_expression = "rate(1 day)"
+}
+
+# Target Lambda
+resource "aws_cloudwatch_event_target" "restock_forecast_target" {
+  rule      = aws_cloudwatch_event_rule.restock_forecast.name
+  target_id = "RestockForecastLambda"
+  arn       = aws_lambda_function.restock_forecast.arn
+}
+
+# Permission
+resource "aws_lambda_permission" "allow_eventbridge_restock_forecast" {
+  statement_id  = "AllowEventBridgeRestockForecast"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.restock_forecast.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.restock_forecast.arn
+}
+
+# 10. Idempotency Key Purge (Rate - every 1 day)
+resource "aws_cloudwatch_event_rule" "idempotency_purge" {
+  name                = "lks-eventbridge-idempotency-purge"
+  description         = "Purge expired POST /orders idempotency keys"
+  schedule_expression = "rate(1 day)"
+}
+
+# Target Lambda
+resource "aws_cloudwatch_event_target" "idempotency_purge_target" {
+  rule      = aws_cloudwatch_event_rule.idempotency_purge.name
+  target_id = "IdempotencyPurgeLambda"
+  arn       = aws_lambda_function.idempotency_purge.arn
+}
+
+# Permission
+resource "aws_lambda_permission" "allow_eventbridge_idempotency_purge" {
+  statement_id  = "AllowEventBridgeIdempotencyPurge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.idempotency_purge.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.idempotency_purge.arn
+}
+
 # LAMBDA REFERENCES (DATA / RESOURCE)
 # Jika Lambda dibuat di file lain → pakai data source
 data "aws_lambda_function" "generate_report" {
@@ -89,6 +277,10 @@ data "aws_lambda_function" "low_stock_check" {
   function_name = "lks-lambda-low-stock-check"
 }
 
+data "aws_sfn_state_machine" "order_workflow" {
+  name = "OrderProcessingStateMachine"
+}
+
 
 ###SubnetGroup###
 resource "aws_db_subnet_group" "private_sb" {
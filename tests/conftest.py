@@ -0,0 +1,35 @@
+"""
+Unit tests for the DB-free parts of the Lambda functions.
+
+    pip install pytest pandas numpy
+    python -m pytest -q tests
+
+Every function lives in lambda/<name>/lambda_function.py, so modules are
+loaded by path under a unique name. Tests of modules whose top-level
+imports need boto3 / psycopg2 are skipped when those are not installed.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LAMBDA_DIR = os.path.join(ROOT, 'lambda')
+
+sys.path.insert(0, os.path.join(LAMBDA_DIR, 'shared', 'python'))
+
+
+def load_module(function_name, module='lambda_function', requires=()):
+    """Import lambda/<function_name>/<module>.py, skipping on missing requires"""
+    for dependency in requires:
+        pytest.importorskip(dependency)
+    function_dir = os.path.join(LAMBDA_DIR, function_name)
+    if function_dir not in sys.path:
+        sys.path.insert(0, function_dir)
+    name = f'{function_name}_{module}'
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(function_dir, f'{module}.py'))
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules[name])
+    return sys.modules[name]
@@ -0,0 +1,54 @@
+import base64
+import gzip
+import json
+
+from conftest import load_module
+
+compression = load_module('order_management', 'compression')
+
+
+def event(accept_encoding=None):
+    return {'headers': {'Accept-Encoding': accept_encoding} if accept_encoding is not None else {}}
+
+
+def proxy_response(size=4096):
+    return {'statusCode': 200, 'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'rows': ['x' * 10] * (size // 10)})}
+
+
+def test_accepted_encodings_parses_q_values():
+    assert compression.accepted_encodings(event('gzip;q=0.5, br, identity;q=0, deflate;q=abc')) == {
+        'gzip': 0.5, 'br': 1.0
+    }
+
+
+def test_choose_encoding_prefers_higher_q():
+    assert compression.choose_encoding({'gzip': 1.0, 'br': 0.5}) == 'gzip'
+    assert compression.choose_encoding({'deflate': 1.0}) is None
+    assert compression.choose_encoding({'*': 1.0}) in ('br', 'gzip')
+
+
+def test_gzip_response_round_trip(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    original = proxy_response()
+    body = original['body']
+    result = compression.compress_response(event('gzip'), dict(original))
+    assert result['isBase64Encoded'] is True
+    assert result['headers']['Content-Encoding'] == 'gzip'
+    assert result['headers']['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(base64.b64decode(result['body'])).decode('utf-8') == body
+
+
+def test_small_or_unaccepted_bodies_are_left_alone():
+    small = proxy_response(size=100)
+    assert 'isBase64Encoded' not in compression.compress_response(event('gzip'), dict(small))
+    assert 'isBase64Encoded' not in compression.compress_response(event(), proxy_response())
+
+
+def test_decode_request_body():
+    encoded = {'body': base64.b64encode(b'{"customer_id": "CUST001"}').decode('ascii'), 'isBase64Encoded': True}
+    decoded = compression.decode_request_body(encoded)
+    assert json.loads(decoded['body']) == {'customer_id': 'CUST001'}
+    assert decoded['isBase64Encoded'] is False
+    plain = {'body': '{}', 'isBase64Encoded': False}
+    assert compression.decode_request_body(plain) is plain
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from conftest import load_module
+
+forecast = load_module('restock_forecast', 'forecast', requires=('numpy',)).forecast
+
+PRODUCTS = np.array(['PROD001', 'PROD002', 'PROD003'])
+STOCK = np.array([100.0, 3.0, 40.0])
+
+
+def test_velocity_and_stockout():
+    result = forecast(PRODUCTS, STOCK, [('PROD001', 0, 28), ('PROD001', 27, 28), ('PROD002', 5, 7)], 28)
+    assert list(result['units_sold']) == [56, 7, 0]
+    assert list(result['daily_velocity']) == [2.0, 0.25, 0.0]
+    assert result['days_until_stockout'][0] == 50.0
+    assert result['days_until_stockout'][1] == 12.0
+
+
+def test_zero_velocity_has_no_stockout_date():
+    result = forecast(PRODUCTS, STOCK, [], 28)
+    assert np.isnan(result['days_until_stockout']).all()
+    assert list(result['units_sold']) == [0, 0, 0]
+
+
+def test_unknown_products_and_days_outside_window_are_ignored():
+    sales = [('AAA', 0, 5), ('ZZZ', 1, 5), ('PROD0015', 2, 5), ('PROD003', 28, 9), ('PROD003', -1, 9), ('PROD003', 3, 14)]
+    result = forecast(PRODUCTS, STOCK, sales, 28)
+    assert list(result['units_sold']) == [0, 0, 14]
+
+
+def test_matches_sorted_ids_not_input_order():
+    ids = np.array(['A', 'B', 'C'])
+    result = forecast(ids, np.array([10.0, 10.0, 10.0]), [('C', 0, 3), ('A', 1, 1)], 2)
+    assert list(result['units_sold']) == [1, 0, 3]
+
+
+def test_thresholds_scale_with_velocity():
+    # 2 units/day: 7 days lead time -> 14, plus 7 safety days -> 28
+    result = forecast(PRODUCTS, STOCK, [('PROD001', 0, 56)], 28, lead_time_days=7, safety_days=7)
+    assert result['critical_threshold'][0] == 14
+    assert result['low_threshold'][0] == 28
+
+
+def test_threshold_floors():
+    result = forecast(PRODUCTS, STOCK, [('PROD002', 0, 1)], 28, min_critical=2, min_low=6)
+    assert list(result['critical_threshold']) == [2, 2, 2]
+    assert list(result['low_threshold']) == [6, 6, 6]
+
+
+def test_low_threshold_never_below_critical():
+    result = forecast(PRODUCTS, STOCK, [('PROD001', 0, 280)], 28, lead_time_days=7, safety_days=0, min_low=1)
+    assert result['low_threshold'][0] >= result['critical_threshold'][0]
+
+
+def test_no_products():
+    result = forecast(np.array([], dtype=str), np.array([]), [('PROD001', 0, 1)], 28)
+    assert len(result['units_sold']) == 0
+
+
+@pytest.mark.parametrize('window_days', [1, 7, 90])
+def test_window_length(window_days):
+    result = forecast(PRODUCTS, STOCK, [('PROD001', 0, window_days)], window_days)
+    assert result['daily_velocity'][0] == 1.0
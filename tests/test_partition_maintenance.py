@@ -0,0 +1,17 @@
+from datetime import date
+
+import pytest
+
+from conftest import load_module
+
+partition_maintenance = load_module('partition_maintenance', requires=('boto3', 'psycopg2'))
+
+
+@pytest.mark.parametrize('today, months, cutoff', [
+    (date(2024, 6, 15), 12, date(2023, 6, 1)),
+    (date(2024, 1, 1), 1, date(2023, 12, 1)),
+    (date(2024, 3, 31), 0, date(2024, 3, 1)),
+    (date(2024, 12, 31), 24, date(2022, 12, 1)),
+])
+def test_retention_cutoff(today, months, cutoff):
+    assert partition_maintenance.retention_cutoff(today, months) == cutoff
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+from conftest import load_module
+
+report_engine = load_module('generate_report', 'report_engine', requires=('pandas', 'numpy'))
+
+COLUMNS = [
+    'order_id', 'status', 'total_amount', 'quantity', 'price', 'product_id',
+    'product_name', 'stock_quantity', 'critical_threshold', 'low_threshold', 'days_until_stockout'
+]
+
+
+def facts(*rows):
+    """Facts frame the way read_sql_query returns it: no type inference on NULLs"""
+    return pd.DataFrame(list(rows), columns=COLUMNS, dtype=object)
+
+
+def inventory_only():
+    return facts(
+        [None, None, None, None, None, 'P1', 'Laptop', 5, None, None, None],
+        [None, None, None, None, None, 'P2', 'Mouse', 80, 20, 40, 12.5]
+    )
+
+
+def with_orders():
+    return facts(
+        ['o1', 'completed', 30.0, 2, 15.0, 'P1', 'Laptop', 5, None, None, None],
+        ['o1', 'completed', 30.0, None, None, 'P3', None, None, None, None, None],
+        ['o2', 'cancelled', 80.0, 1, 80.0, 'P2', 'Mouse', 80, 20, 40, 12.5]
+    )
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Fresh SECTIONS / METRICS with sections shaped like generate_report's"""
+    monkeypatch.setattr(report_engine, 'SECTIONS', [])
+    monkeypatch.setattr(report_engine, 'METRICS', [])
+
+    @report_engine.section('Top Products', summary_key='top_products', summary_rows=5)
+    def top_products(views):
+        return views['lines'].groupby('product_name', as_index=False).agg(
+            total_revenue=('revenue', 'sum')
+        ).nlargest(10, 'total_revenue')
+
+    @report_engine.section('Inventory Status', summary_key='low_stock_items',
+                           summary_filter=lambda df: df['stock_status'] != 'Normal')
+    def inventory_status(views):
+        return views['inventory'].assign(stock_status=lambda df: report_engine.stock_status(
+            df['stock_quantity'], df['critical_threshold'], df['low_threshold']
+        ))
+
+    @report_engine.metric('total_revenue')
+    def total_revenue(views, sheets):
+        return float(views['orders']['total_amount'].sum())
+
+
+def test_build_views_empty_day_is_numeric():
+    views = report_engine.build_views(inventory_only())
+    assert views['orders'].empty and views['lines'].empty
+    assert views['lines']['revenue'].dtype.kind == 'f'
+    assert views['orders']['total_amount'].dtype.kind == 'f'
+    assert list(views['inventory']['critical_threshold']) == [10, 20]
+    assert list(views['inventory']['low_threshold']) == [50, 40]
+
+
+def test_run_report_empty_day(registry):
+    sheets, summary = report_engine.run_report(inventory_only())
+    assert sheets['Top Products'].empty
+    assert summary['top_products'] == []
+    assert summary['total_revenue'] == 0.0
+    assert [item['stock_status'] for item in summary['low_stock_items']] == ['Critical']
+
+
+def test_run_report_no_rows_at_all(registry):
+    sheets, summary = report_engine.run_report(facts())
+    assert all(df.empty for df in sheets.values())
+    assert summary['total_revenue'] == 0.0
+
+
+def test_run_report_with_orders(registry):
+    sheets, summary = report_engine.run_report(with_orders())
+    assert summary['top_products'] == [
+        {'product_name': 'Mouse', 'total_revenue': 80.0},
+        {'product_name': 'Laptop', 'total_revenue': 30.0}
+    ]
+    # One row per order even when the order has several lines
+    assert summary['total_revenue'] == 110.0
+    assert [item['product_name'] for item in summary['low_stock_items']] == ['Laptop']
+
+
+def test_stock_status_per_product_thresholds():
+    status = report_engine.stock_status(
+        pd.Series([5, 30, 30, 100]), pd.Series([10, 10, 40, 10]), pd.Series([50, 50, 60, 50])
+    )
+    assert list(status) == ['Critical', 'Low', 'Critical', 'Normal']
+
+
+def test_generate_report_sections_empty_day():
+    generate_report = load_module('generate_report', requires=('boto3', 'psycopg2', 'openpyxl'))
+    sheets, summary = generate_report.run_report(inventory_only())
+    assert set(sheets) == {'Daily Summary', 'Top Products', 'Inventory Status'}
+    assert summary['total_orders'] == 0
+    assert summary['top_products'] == []
@@ -0,0 +1,50 @@
+import pytest
+
+from workflow_payload import build_payload, parse_payload
+
+
+def test_build_and_parse_round_trip():
+    payload = build_payload('ORD1', 'CUST001', 51.98, [{'productId': 'PROD002', 'quantity': 2, 'price': 25.99}])
+    parsed = parse_payload(payload)
+    assert parsed['schema_version'] == 1
+    assert parsed['order_id'] == 'ORD1'
+    assert parsed['total_amount'] == 51.98
+    assert parsed['items'] == [
+        {'productId': 'PROD002', 'productName': 'PROD002', 'quantity': 2, 'price': 25.99}
+    ]
+
+
+def test_snake_case_keys():
+    parsed = parse_payload({'order_id': 7, 'total_amount': 10, 'transaction_id': 'TXN-1'})
+    assert parsed['order_id'] == '7'
+    assert parsed['transaction_id'] == 'TXN-1'
+    assert parsed['items'] is None
+
+
+@pytest.mark.parametrize('event, message', [
+    ({'schemaVersion': 2, 'orderId': '1'}, 'schemaVersion'),
+    ({'schemaVersion': 1}, 'Order ID'),
+    ({'schemaVersion': 1, 'orderId': '1', 'items': []}, 'non-empty'),
+    ({'schemaVersion': 1, 'orderId': '1', 'items': [{'quantity': 1}]}, 'missing product ID'),
+    ({'schemaVersion': 1, 'orderId': '1', 'items': [{'productId': 'P', 'quantity': 0}]}, 'positive integer'),
+    ({'schemaVersion': 1, 'orderId': '1', 'items': [{'productId': 'P', 'quantity': 1, 'price': -1}]}, 'non-negative'),
+])
+def test_version_1_is_validated(event, message):
+    with pytest.raises(ValueError, match=message):
+        parse_payload(event)
+
+
+def test_legacy_items_are_read_leniently():
+    parsed = parse_payload({'order_id': '1', 'items': [
+        {'quantity': 2},
+        {'product_id': 'P', 'quantity': 1, 'price': 'n/a'},
+        {'productId': 'Q', 'quantity': 2, 'price': 3}
+    ]})
+    assert [item['productId'] for item in parsed['items']] == [None, 'P', 'Q']
+    # Only the item with numeric price and quantity counts towards the total
+    assert parsed['total_amount'] == 6.0
+
+
+def test_not_an_object():
+    with pytest.raises(ValueError):
+        parse_payload(['orderId'])